@@ -1,20 +1,75 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 from . import config, models, schemas, database
+from .services.cache import TTLCache
+from .services.change_feed import change_feed
+from .services.rate_limit import TokenBucketLimiter, acquire_all
 
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# Password hashing is deliberately expensive, so it runs on a few dedicated
+# threads instead of whichever request thread asked. At most
+# PASSWORD_HASH_QUEUE jobs wait for them; beyond that callers get a 503.
+_kdf_pool = ThreadPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix="password-kdf")
+_kdf_slots = threading.BoundedSemaphore(config.PASSWORD_HASH_WORKERS + config.PASSWORD_HASH_QUEUE)
+
+login_ip_limiter = TokenBucketLimiter(config.LOGIN_IP_RATE_PER_MINUTE / 60, config.LOGIN_IP_BURST)
+login_username_limiter = TokenBucketLimiter(config.LOGIN_USERNAME_RATE_PER_MINUTE / 60, config.LOGIN_USERNAME_BURST)
+
+
+def _submit_kdf(fn, *args):
+    if not _kdf_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password checks in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    future = _kdf_pool.submit(fn, *args)
+    future.add_done_callback(lambda _: _kdf_slots.release())
+    return future
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _submit_kdf(pwd_context.verify, plain_password, hashed_password).result()
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return _submit_kdf(pwd_context.hash, password).result()
+
+async def verify_password_async(plain_password, hashed_password):
+    return await asyncio.wrap_future(_submit_kdf(pwd_context.verify, plain_password, hashed_password))
+
+async def get_password_hash_async(password):
+    return await asyncio.wrap_future(_submit_kdf(pwd_context.hash, password))
+
+def login_username_key(username: str, client_ip: Optional[str]):
+    # Per client as well: others must not be able to lock a user out by guessing
+    return (username.lower(), client_ip)
+
+def check_login_rate(username: Optional[str], client_ip: Optional[str]):
+    """Take a token from the client's bucket and its bucket for the username, both or neither, or raise 429."""
+    requests = []
+    if client_ip is not None:
+        requests.append((login_ip_limiter, client_ip))
+    if username is not None:
+        requests.append((login_username_limiter, login_username_key(username, client_ip)))
+    wait = acquire_all(requests)
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(max(1, int(wait + 0.999)))},
+        )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -26,21 +81,99 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, config.SECRET_KEY, algorithm=config.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
+# Token signature -> (token, epoch, user generation, detached User). Entries
+# never outlive the token's own expiry.
+_user_cache = TTLCache(ttl_seconds=config.AUTH_USER_CACHE_TTL_SECONDS, maxsize=config.AUTH_USER_CACHE_MAXSIZE)
+
+# Bumped whenever a user row changes, which makes their cached entries stale
+_user_generations = {}
+_generations_lock = threading.Lock()
+# Bumped when any user may have changed. Like the generations, it also
+# catches entries stored by a lookup that began before the invalidation.
+_epoch = 0
+
+
+def invalidate_user(username: Optional[str] = None):
+    """Drop cached authentications for one user, or for everybody."""
+    global _epoch
+    if username is None:
+        with _generations_lock:
+            _epoch += 1
+        _user_cache.clear()
+        return
+    with _generations_lock:
+        _user_generations[username] = _user_generations.get(username, 0) + 1
+
+
+@event.listens_for(database.SessionLocal, "after_flush")
+def _invalidate_flushed_users(session: Session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.User):
+            history = inspect(obj).attrs.username.history
+            for username in {obj.username, *history.deleted}:
+                invalidate_user(username)
+
+
+def _on_users_changed(change):
+    # Also for this worker's own writes: the flush above ran before commit
+    if change["keys"] is None:
+        invalidate_user()
+        return
+    for username in change["keys"]:
+        invalidate_user(username)
+
+
+change_feed.on_change("users", _on_users_changed)
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _authenticate(token: str) -> models.User:
+    """Decode the token and load its user. Blocking; runs in the threadpool."""
     try:
         payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    epoch, generation = _epoch, _user_generations.get(username, 0)
+    db = database.SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.username == username).first()
+        if user is None:
+            raise _credentials_exception()
+        db.expunge(user)
+    finally:
+        db.close()
+
+    # The signature identifies the token; the full token is compared on lookup
+    ttl = min(config.AUTH_USER_CACHE_TTL_SECONDS, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        _user_cache.set(token.rsplit(".", 1)[-1], (token, epoch, generation, user), ttl_seconds=ttl)
     return user
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    The user behind a bearer token.
+
+    Repeat requests with the same token are answered from an in-process
+    cache for up to AUTH_USER_CACHE_TTL_SECONDS (never past the token's
+    expiry), so they cost a dictionary lookup. Misses decode the JWT and
+    query the database in the threadpool, off the event loop. Cached entries
+    are dropped when the user's row changes.
+    """
+    cached = _user_cache.get(token.rsplit(".", 1)[-1])
+    if cached is not None:
+        cached_token, epoch, generation, user = cached
+        if cached_token == token and epoch == _epoch and generation == _user_generations.get(user.username, 0):
+            return user
+    return await run_in_threadpool(_authenticate, token)
@@ -3,3 +3,67 @@ import os
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-only-change-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+AUTH_USER_CACHE_MAXSIZE = int(os.getenv("AUTH_USER_CACHE_MAXSIZE", "4096"))
+
+# Database connection pools (per engine)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))  # -1 never recycles
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+STARTUP_READY_WAIT_SECONDS = float(os.getenv("STARTUP_READY_WAIT_SECONDS", "30"))  # Early requests wait this long, then 503
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))  # First retry of failed startup stages, then doubling
+STARTUP_RETRY_MAX_SECONDS = float(os.getenv("STARTUP_RETRY_MAX_SECONDS", "120"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))  # Reads go to the primary above this
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "2"))
+CHANGE_NOTIFY_ENABLED = os.getenv("CHANGE_NOTIFY_ENABLED", "true").lower() in ("1", "true", "yes")  # Cross-worker cache invalidation
+
+# Cached dependency checks behind /health/ready
+HEALTH_REFRESH_SECONDS = float(os.getenv("HEALTH_REFRESH_SECONDS", "10"))
+
+# Threads pinging devices for /monitoring/status and /monitoring/health, shared by all requests
+MONITORING_PING_WORKERS = int(os.getenv("MONITORING_PING_WORKERS", "16"))
+
+# Password hashing pool and login rate limits
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "1"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "8"))  # Waiting checks before 503
+LOGIN_IP_RATE_PER_MINUTE = float(os.getenv("LOGIN_IP_RATE_PER_MINUTE", "30"))
+LOGIN_IP_BURST = float(os.getenv("LOGIN_IP_BURST", "10"))
+LOGIN_USERNAME_RATE_PER_MINUTE = float(os.getenv("LOGIN_USERNAME_RATE_PER_MINUTE", "10"))
+LOGIN_USERNAME_BURST = float(os.getenv("LOGIN_USERNAME_BURST", "5"))
+
+# configuration_logs partitioning and retention
+LOG_RETENTION_MONTHS = int(os.getenv("LOG_RETENTION_MONTHS", "12"))  # 0 keeps logs forever
+LOG_PARTITION_MONTHS_AHEAD = int(os.getenv("LOG_PARTITION_MONTHS_AHEAD", "2"))
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "archive", "logs"))
+LOG_MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("LOG_MAINTENANCE_INTERVAL_SECONDS", str(24 * 3600)))
+
+# RouterOS read caches
+DEVICE_INFO_CACHE_TTL_SECONDS = float(os.getenv("DEVICE_INFO_CACHE_TTL_SECONDS", "30"))
+
+# Per-device circuit breakers on RouterOS connections
+ROUTEROS_CIRCUIT_WINDOW = int(os.getenv("ROUTEROS_CIRCUIT_WINDOW", "10"))  # Recent connection attempts considered
+ROUTEROS_CIRCUIT_MIN_CALLS = int(os.getenv("ROUTEROS_CIRCUIT_MIN_CALLS", "3"))  # Failures needed before opening
+ROUTEROS_CIRCUIT_FAILURE_RATE = float(os.getenv("ROUTEROS_CIRCUIT_FAILURE_RATE", "0.5"))
+ROUTEROS_CIRCUIT_OPEN_SECONDS = float(os.getenv("ROUTEROS_CIRCUIT_OPEN_SECONDS", "30"))
+
+# Concurrent RouterOS API sessions per device (listen subscriptions excluded)
+ROUTEROS_MAX_SESSIONS_PER_DEVICE = int(os.getenv("ROUTEROS_MAX_SESSIONS_PER_DEVICE", "2"))
+ROUTEROS_SESSION_WAIT_SECONDS = float(os.getenv("ROUTEROS_SESSION_WAIT_SECONDS", "30"))  # Then the call fails
+
+# RouterOS listen subscriptions (table mirrors)
+ROUTEROS_SUBSCRIPTION_PATHS = [p.strip() for p in os.getenv("ROUTEROS_SUBSCRIPTION_PATHS", "/interface,/ip/address,/interface/bridge").split(",") if p.strip()]
+ROUTEROS_SUBSCRIPTION_HEARTBEAT_SECONDS = float(os.getenv("ROUTEROS_SUBSCRIPTION_HEARTBEAT_SECONDS", "30"))
+ROUTEROS_SUBSCRIPTION_MAX_BACKOFF_SECONDS = float(os.getenv("ROUTEROS_SUBSCRIPTION_MAX_BACKOFF_SECONDS", "60"))
+
+# Fleet inventory collector
+INVENTORY_INTERVAL_SECONDS = int(os.getenv("INVENTORY_INTERVAL_SECONDS", "900"))  # 0 disables scheduled collection
+INVENTORY_COLLECT_WORKERS = int(os.getenv("INVENTORY_COLLECT_WORKERS", "8"))
+
+# RouterOS script execution
+SCRIPT_JOB_TIMEOUT_SECONDS = float(os.getenv("SCRIPT_JOB_TIMEOUT_SECONDS", "60"))
+SCRIPT_JOB_POLL_INTERVAL_SECONDS = float(os.getenv("SCRIPT_JOB_POLL_INTERVAL_SECONDS", "0.2"))
+SCRIPT_INSTALL_CACHE_TTL_SECONDS = float(os.getenv("SCRIPT_INSTALL_CACHE_TTL_SECONDS", "3600"))
+SCRIPT_FLEET_CONCURRENCY = int(os.getenv("SCRIPT_FLEET_CONCURRENCY", "8"))
+SCRIPT_FLEET_JOBS_KEPT = int(os.getenv("SCRIPT_FLEET_JOBS_KEPT", "100"))
@@ -1,14 +1,65 @@
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from . import config
+from .services.db_pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_engine
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://user:password@db:5432/networkweaver")
 
-engine = create_engine(DATABASE_URL)
+def _async_url(url: str) -> str:
+    """The same database with its asyncio driver (asyncpg for PostgreSQL)."""
+    parsed = make_url(url)
+    async_drivers = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+    if parsed.get_backend_name() in async_drivers:
+        parsed = parsed.set(drivername=async_drivers[parsed.get_backend_name()])
+    return parsed.render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+def _pool_options(url: str, label: str, poolclass) -> dict:
+    # SQLite uses a pool without size limits
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_logging_name": label,  # Also the "engine" label of the pool metrics
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": config.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+# The sync engine serves RouterOS-bound routes and background threads; the
+# async engine serves DB-only routes straight from the event loop.
+engine = create_engine(DATABASE_URL, **_pool_options(DATABASE_URL, "sync", InstrumentedQueuePool))
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_pool_options(ASYNC_DATABASE_URL, "async", InstrumentedAsyncQueuePool))
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
+# Optional streaming replica for read-only routes (see services/replica.py)
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+replica_engine = None
+async_replica_engine = None
+if REPLICA_DATABASE_URL:
+    ASYNC_REPLICA_DATABASE_URL = _async_url(REPLICA_DATABASE_URL)
+    replica_engine = create_engine(REPLICA_DATABASE_URL, **_pool_options(REPLICA_DATABASE_URL, "replica", InstrumentedQueuePool))
+    async_replica_engine = create_async_engine(
+        ASYNC_REPLICA_DATABASE_URL, **_pool_options(ASYNC_REPLICA_DATABASE_URL, "async_replica", InstrumentedAsyncQueuePool)
+    )
+    instrument_engine(replica_engine, "replica")
+    instrument_engine(async_replica_engine.sync_engine, "async_replica")
 
-# Retry loop to wait for DB to be ready
 def wait_for_db(max_retries=30, wait_seconds=2):
+    """Block until the database accepts connections. Called after startup, not on import."""
     import time
     from sqlalchemy.exc import OperationalError
     
@@ -16,24 +67,53 @@ def wait_for_db(max_retries=30, wait_seconds=2):
     while retries > 0:
         try:
             with engine.connect() as connection:
-                print("Database connection successful.")
+                logger.info("Database connection successful.")
                 return
         except OperationalError as e:
             retries -= 1
-            print(f"Database not ready, waiting... ({retries} retries left)")
+            logger.warning(f"Database not ready, waiting... ({retries} retries left)")
             time.sleep(wait_seconds)
             if retries == 0:
                 raise e
 
-wait_for_db()
-
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Async sessions wrap SessionLocal's session class, so the flush listeners
+# registered on SessionLocal (log rollups, auth cache) apply to them too.
+# Objects stay readable after commit, as there is no lazy loading here.
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, sync_session_class=SessionLocal.class_,
+    autoflush=False, expire_on_commit=False
+)
+
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine else None
+AsyncReplicaSessionLocal = async_sessionmaker(
+    async_replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+) if async_replica_engine else None
+
+def require_ready():
+    """Wait for startup readiness (see services/startup.py) or raise 503."""
+    # Imported here because startup imports this module
+    from .services.startup import startup
+    if not startup.ready and not startup.wait_ready(config.STARTUP_READY_WAIT_SECONDS):
+        raise HTTPException(status_code=503, detail="Database is not ready yet", headers={"Retry-After": "5"})
+
+async def require_ready_async():
+    from .services.startup import startup
+    if not startup.ready:
+        await run_in_threadpool(require_ready)
+
 def get_db():
+    require_ready()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    await require_ready_async()
+    async with AsyncSessionLocal() as db:
+        yield db
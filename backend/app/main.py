@@ -1,33 +1,39 @@
-from fastapi import FastAPI
-from .database import engine, Base
-from .database import engine, Base, SessionLocal
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from .routers import configuration, auth, devices, routeros, monitoring, prometheus_metrics
-from .routers.routeros import resources
-from .services.prometheus_sync import sync_prometheus_targets
+from .routers.routeros import resources, device_info
+from .routers.routeros.connection import RouterOSCircuitOpenError
+from .services.routeros_subscriptions import subscriptions
+from .services.startup import startup
+from .services.health import health_monitor
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Create tables (In production, use Alembic)
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(title="NetworkWeaver API")
 
 @app.on_event("startup")
 def startup_event():
-    """Sync Prometheus targets on startup"""
-    try:
-        db = SessionLocal()
-        try:
-            result = sync_prometheus_targets(db)
-            if result["success"]:
-                logger.info(f"Startup: Synced {result['targets_count']} Prometheus targets")
-            else:
-                logger.error(f"Startup: Failed to sync Prometheus targets: {result.get('error')}")
-        finally:
-            db.close()
-    except Exception as e:
-        logger.error(f"Startup sync error: {e}")
+    """
+    Start the deferred startup stages (DB wait, schema, log partitions,
+    Prometheus targets, rollups, collectors) without blocking the server.
+    Progress is reported by /health.
+    """
+    startup.start()
+    health_monitor.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    subscriptions.stop_all()
+
+@app.exception_handler(RouterOSCircuitOpenError)
+def circuit_open_handler(request: Request, exc: RouterOSCircuitOpenError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))},
+    )
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -42,6 +48,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(configuration.router)
@@ -49,26 +56,62 @@ app.include_router(auth.router)
 app.include_router(devices.router)
 app.include_router(routeros.router)
 app.include_router(resources.router)
+app.include_router(device_info.router)
 app.include_router(monitoring.router)
 app.include_router(prometheus_metrics.router)
 from .routers import logs
 app.include_router(logs.router)
+from .routers import inventory
+app.include_router(inventory.router)
 
 # Explicitly import and include scripts router 
 from .routers.routeros import scripts
 app.include_router(scripts.router, prefix="/routeros/scripts")
+from .routers.routeros import quick_setup
+app.include_router(quick_setup.router)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to NetworkWeaver API"}
 
+@app.get("/health/live")
+def liveness():
+    """Liveness probe: the process is serving requests. No I/O."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness():
+    """
+    Readiness probe, answered from the health monitor's cached checks
+    without any I/O. 503 until startup finished and the database and
+    targets directory checks pass; stale pollers only show in /health.
+    """
+    status = health_monitor.status()
+    return JSONResponse(jsonable_encoder(status), status_code=200 if status["ready"] else 503)
+
 @app.get("/health")
 def health_check():
-    try:
-        from sqlalchemy import text
-        # Check DB connection
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        return {"status": "ok", "database": "connected"}
-    except Exception as e:
-        return {"status": "error", "database": str(e)}
+    """
+    Startup stages and cached dependency checks; never touches the database.
+
+    Status is "starting" until the required startup stages succeeded (or
+    "retrying" once a first attempt failed), then "ok" while the cached
+    checks pass ("degraded" while an informational one such as a background
+    poller does not), otherwise "error".
+    """
+    status = health_monitor.status()
+    readiness = startup.summary()
+    database = status.get("checks", {}).get("database", {})
+    if not readiness["ready"]:
+        overall = readiness["status"]
+    elif not status["ready"]:
+        overall = "error"
+    else:
+        overall = "degraded" if status.get("degraded") else "ok"
+    return {
+        "status": overall,
+        "database": "connected" if database.get("ok") else database.get("error", "not checked yet"),
+        "startup": readiness,
+        "degraded": status.get("degraded", []),
+        "checks": status.get("checks"),
+    }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, Index, UniqueConstraint, DDL, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -28,11 +28,87 @@ class Device(Base):
 class ConfigurationLog(Base):
     __tablename__ = "configuration_logs"
 
-    log_id = Column(Integer, primary_key=True, index=True)
+    log_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     device_id = Column(Integer, ForeignKey("devices.id"))
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    # Partition key. PostgreSQL requires it in the primary key of a partitioned table.
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
     action_type = Column(String)
     status = Column(String)
     details = Column(Text)
 
     device = relationship("Device", back_populates="logs")
+
+    # Per-device history is always read newest-first; keyset pages are
+    # ordered by (timestamp, log_id), so they walk the second index.
+    # Monthly partitions are managed by services/log_partitions.py.
+    __table_args__ = (
+        Index("ix_configuration_logs_device_id_timestamp", "device_id", "timestamp"),
+        Index("ix_configuration_logs_timestamp_log_id", "timestamp", "log_id"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+# Rows with no monthly partition yet land here instead of failing the insert
+event.listen(
+    ConfigurationLog.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS configuration_logs_default PARTITION OF configuration_logs DEFAULT").execute_if(dialect="postgresql")
+)
+
+class ConfigurationLogRollup(Base):
+    """Hourly log counts, kept up to date by services/log_rollups.py as logs are written."""
+    __tablename__ = "configuration_log_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    hour = Column(DateTime, nullable=False)
+    device_id = Column(Integer, nullable=True)  # No FK: counts outlive deleted devices
+    action_type = Column(String)
+    status = Column(String)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "hour", "device_id", "action_type", "status",
+            name="uq_configuration_log_rollups_bucket",
+            postgresql_nulls_not_distinct=True
+        ),
+    )
+
+class InventoryItem(Base):
+    """
+    One row of a device table (interface, address, pool, ...) as last seen by
+    the inventory collector in services/inventory.py. The columns fleet-wide
+    queries filter on are lifted out of `attributes` and indexed.
+    """
+    __tablename__ = "inventory_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(Integer, ForeignKey("devices.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=False)  # Identifies the item within its device and kind
+    name = Column(String)
+    interface = Column(String)
+    address = Column(String)
+    running = Column(Boolean)
+    disabled = Column(Boolean)
+    attributes = Column(JSON, nullable=False)
+    checksum = Column(String, nullable=False)
+    first_seen = Column(DateTime, default=datetime.utcnow)
+    last_changed = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("device_id", "kind", "key", name="uq_inventory_items_device_kind_key"),
+        Index("ix_inventory_items_kind_name", "kind", "name"),
+        Index("ix_inventory_items_kind_interface", "kind", "interface"),
+        Index("ix_inventory_items_kind_address", "kind", "address"),
+    )
+
+class InventoryCollection(Base):
+    """Outcome of the latest inventory collection per device."""
+    __tablename__ = "inventory_collections"
+
+    device_id = Column(Integer, ForeignKey("devices.id", ondelete="CASCADE"), primary_key=True)
+    collected_at = Column(DateTime, default=datetime.utcnow)
+    status = Column(String)
+    error = Column(Text)
+    items = Column(Integer, default=0)
+    changed = Column(Integer, default=0)
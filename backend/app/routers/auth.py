@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from .. import database, models, schemas, auth, config
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/auth",
@@ -10,26 +14,21 @@ router = APIRouter(
 )
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    
-    print(f"DEBUG: Login attempt for username: {form_data.username}")
-    if user:
-        print(f"DEBUG: User found in DB. ID: {user.id}, Role: {user.role}")
-        print(f"DEBUG: Stored hash prefix: {user.password_hash[:20] if user.password_hash else 'None'}")
-        verification = auth.verify_password(form_data.password, user.password_hash)
-        print(f"DEBUG: Password verification result: {verification}")
-    else:
-        print("DEBUG: User NOT found in DB")
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_async_db)):
+    # Rate limits come first so rejected attempts cost no hashing
+    client_ip = request.client.host if request.client else None
+    auth.check_login_rate(form_data.username, client_ip)
+    user = await db.scalar(select(models.User).where(models.User.username == form_data.username))
 
-    if not user or not auth.verify_password(form_data.password, user.password_hash):
-        print("DEBUG: Raising 401 Unauthorized")
+    if not user or not user.password_hash or not await auth.verify_password_async(form_data.password, user.password_hash):
+        logger.info(f"Failed login for username {form_data.username}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    auth.login_username_limiter.reset(auth.login_username_key(form_data.username, client_ip))
     access_token_expires = timedelta(minutes=config.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
@@ -37,14 +36,15 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+async def register_user(request: Request, user: schemas.UserCreate, db: AsyncSession = Depends(database.get_async_db)):
+    auth.check_login_rate(None, request.client.host if request.client else None)
+    db_user = await db.scalar(select(models.User).where(models.User.username == user.username))
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await auth.get_password_hash_async(user.password)
     new_user = models.User(username=user.username, password_hash=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
+from typing import Optional
 from .. import models, schemas
 from ..database import get_db
+from ..services.log_queries import filter_logs, paginate_logs, encode_cursor
 import routeros_api
 import traceback
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/config",
@@ -18,11 +23,13 @@ def deploy_configuration(request: schemas.ConfigRequest, db: Session = Depends(g
         raise HTTPException(status_code=404, detail="Device not found")
 
     # 2. Get Connection
-    from .routeros.connection import get_routeros_connection
+    from .routeros.connection import RouterOSCircuitOpenError, get_routeros_connection
+    from .routeros.device_info import invalidate_device_info
     
     status = "Failed"
     details = ""
     action_type = request.template_name
+    connection = None
 
     try:
         connection, api = get_routeros_connection(device)
@@ -397,13 +404,24 @@ def deploy_configuration(request: schemas.ConfigRequest, db: Session = Depends(g
         else:
             raise ValueError(f"Unknown template: {request.template_name}")
 
-        connection.disconnect()
         status = "Success"
 
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py); nothing was attempted, so there is nothing to log
     except Exception as e:
         status = "Failed"
         details = str(e)
         print(traceback.format_exc())
+    finally:
+        # Also on failure: the connection holds one of the device's session slots
+        if connection:
+            try:
+                connection.disconnect()
+            except Exception as e:
+                logger.warning(f"Error disconnecting from device {device.name}: {e}")
+
+    # Interfaces, pools, services etc. may have changed either way
+    invalidate_device_info(device.id)
 
     # 4. Log the action (Step 7 in diagram)
     new_log = models.ConfigurationLog(
@@ -422,6 +440,15 @@ def deploy_configuration(request: schemas.ConfigRequest, db: Session = Depends(g
     return {"status": "Success", "message": details}
 
 @router.get("/history", response_model=list[schemas.ConfigLogResponse])
-def get_config_history(limit: int = 50, db: Session = Depends(get_db)):
-    logs = db.query(models.ConfigurationLog).order_by(models.ConfigurationLog.timestamp.desc()).limit(limit).all()
+def get_config_history(
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=1000),
+    before: Optional[str] = Query(default=None, description="Cursor '<timestamp>,<log_id>' from a previous X-Next-Cursor header"),
+    device_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    query = filter_logs(db.query(models.ConfigurationLog), device_id=device_id)
+    logs = paginate_logs(query, before, limit).all()
+    if len(logs) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(logs[-1].timestamp, logs[-1].log_id)
     return logs
@@ -1,13 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from .. import models, schemas, auth
-from ..database import get_db
+from ..database import get_async_db
+from ..services.replica import get_async_read_db
 from typing import List
 import subprocess
 import platform
 import socket
 import logging
-from ..services.prometheus_sync import sync_prometheus_targets
+from ..services.prometheus_sync import sync_prometheus_targets_async
 
 logger = logging.getLogger(__name__)
 
@@ -66,14 +69,14 @@ def check_port(host: str, port: int, timeout: int = 2) -> tuple[bool, str]:
         return False, f"Port check failed: {str(e)}"
 
 @router.get("/", response_model=List[schemas.Device])
-def read_devices(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    devices = db.query(models.Device).offset(skip).limit(limit).all()
+async def read_devices(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_read_db)):
+    devices = (await db.scalars(select(models.Device).offset(skip).limit(limit))).all()
     return devices
 
 @router.post("/", response_model=schemas.Device)
-def create_device(
+async def create_device(
     device: schemas.DeviceCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     validate_connectivity: bool = Query(default=True, description="Validate device connectivity before creation")
 ):
     """
@@ -88,14 +91,14 @@ def create_device(
         validation_errors = []
         
         # Check ping
-        ping_ok, ping_msg = check_ping(device.ip_address, timeout=2)
+        ping_ok, ping_msg = await run_in_threadpool(check_ping, device.ip_address, timeout=2)
         if not ping_ok:
             validation_errors.append(f"Ping check failed: {ping_msg}")
             logger.warning(f"Device {device.name} at {device.ip_address} failed ping check")
         
         # Check API port if device has RouterOS credentials
         if device.api_port:
-            port_ok, port_msg = check_port(device.ip_address, device.api_port, timeout=3)
+            port_ok, port_msg = await run_in_threadpool(check_port, device.ip_address, device.api_port, timeout=3)
             if not port_ok:
                 validation_errors.append(f"API port check failed: {port_msg}")
                 logger.warning(f"Device {device.name} API port {device.api_port} not accessible")
@@ -111,8 +114,8 @@ def create_device(
     try:
         db_device = models.Device(**device.dict())
         db.add(db_device)
-        db.commit()
-        db.refresh(db_device)
+        await db.commit()
+        await db.refresh(db_device)
         
         # Log the creation
         new_log = models.ConfigurationLog(
@@ -122,12 +125,12 @@ def create_device(
             details=f"Device '{db_device.name}' ({db_device.ip_address}) added via API"
         )
         db.add(new_log)
-        db.commit()
+        await db.commit()
         
         logger.info(f"Successfully created device {db_device.name} (ID: {db_device.id})")
         
         # Sync Prometheus targets
-        sync_result = sync_prometheus_targets(db)
+        sync_result = await sync_prometheus_targets_async(db)
         if sync_result["success"]:
             logger.info("Prometheus targets synced successfully")
         else:
@@ -135,18 +138,18 @@ def create_device(
             
         return db_device
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Failed to create device {device.name}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create device: {str(e)}")
 
 @router.get("/test/{device_id}")
-def test_device_connectivity(device_id: int, db: Session = Depends(get_db)):
+async def test_device_connectivity(device_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Test connectivity to a device without modifying it.
     
     Returns detailed connectivity status including ping and port checks.
     """
-    device = db.query(models.Device).filter(models.Device.id == device_id).first()
+    device = await db.get(models.Device, device_id)
     if not device:
         raise HTTPException(status_code=404, detail=f"Device with ID {device_id} not found")
     
@@ -158,7 +161,7 @@ def test_device_connectivity(device_id: int, db: Session = Depends(get_db)):
     }
     
     # Ping test
-    ping_ok, ping_msg = check_ping(device.ip_address, timeout=2)
+    ping_ok, ping_msg = await run_in_threadpool(check_ping, device.ip_address, timeout=2)
     results["tests"]["ping"] = {
         "success": ping_ok,
         "message": ping_msg
@@ -166,7 +169,7 @@ def test_device_connectivity(device_id: int, db: Session = Depends(get_db)):
     
     # API port test
     if device.api_port:
-        port_ok, port_msg = check_port(device.ip_address, device.api_port, timeout=3)
+        port_ok, port_msg = await run_in_threadpool(check_port, device.ip_address, device.api_port, timeout=3)
         results["tests"]["api_port"] = {
             "port": device.api_port,
             "success": port_ok,
@@ -175,7 +178,7 @@ def test_device_connectivity(device_id: int, db: Session = Depends(get_db)):
     
     # SNMP port test (if SNMP community is configured)
     if device.snmp_community:
-        snmp_ok, snmp_msg = check_port(device.ip_address, 161, timeout=3)
+        snmp_ok, snmp_msg = await run_in_threadpool(check_port, device.ip_address, 161, timeout=3)
         results["tests"]["snmp_port"] = {
             "port": 161,
             "success": snmp_ok,
@@ -190,11 +193,11 @@ def test_device_connectivity(device_id: int, db: Session = Depends(get_db)):
     return results
 
 @router.delete("/{device_id}")
-def delete_device(device_id: int, db: Session = Depends(get_db)):
-    db_device = db.query(models.Device).filter(models.Device.id == device_id).first()
+async def delete_device(device_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_device = await db.get(models.Device, device_id)
     if not db_device:
         raise HTTPException(status_code=404, detail="Device not found")
-    db.delete(db_device)
+    await db.delete(db_device)
     
     # Log the deletion (System event)
     new_log = models.ConfigurationLog(
@@ -205,11 +208,11 @@ def delete_device(device_id: int, db: Session = Depends(get_db)):
     )
     db.add(new_log)
     
-    db.commit()
+    await db.commit()
     logger.info(f"Deleted device {db_device.name} (ID: {device_id})")
     
     # Sync Prometheus targets
-    sync_result = sync_prometheus_targets(db)
+    sync_result = await sync_prometheus_targets_async(db)
     if sync_result["success"]:
         logger.info("Prometheus targets synced successfully")
     else:
@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from .. import models
+from ..services.replica import get_async_read_db
+from ..services.inventory import INVENTORY_KINDS, collect_inventory, query_inventory
+from ..services.prefix_index import fleet_prefixes
+
+router = APIRouter(
+    prefix="/inventory",
+    tags=["inventory"]
+)
+
+@router.get("/")
+async def search_inventory(
+    kind: Optional[str] = Query(default=None, description="One of: " + ", ".join(INVENTORY_KINDS)),
+    device_id: Optional[int] = None,
+    name: Optional[str] = Query(default=None, description="Exact name, or a pattern with * (e.g. ether*)"),
+    interface: Optional[str] = Query(default=None, description="Owning/parent interface, exact or with *"),
+    address: Optional[str] = Query(default=None, description="Address, exact or with *"),
+    running: Optional[bool] = None,
+    disabled: Optional[bool] = None,
+    limit: int = Query(default=1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Search the stored inventory of the whole fleet.
+
+    E.g. kind=interfaces&name=ether5&running=false lists every router whose
+    ether5 is down; kind=pools&name=guest lists devices with a "guest" pool.
+    Data is as fresh as the last collection (see /inventory/status).
+    """
+    if kind is not None and kind not in INVENTORY_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown kind '{kind}'. Expected one of: {', '.join(INVENTORY_KINDS)}")
+    return await db.run_sync(
+        query_inventory, kind=kind, device_id=device_id, name=name, interface=interface,
+        address=address, running=running, disabled=disabled, limit=limit
+    )
+
+@router.get("/status")
+async def get_inventory_status(db: AsyncSession = Depends(get_async_read_db)):
+    """When each device's inventory was last collected, and whether it succeeded."""
+    rows = await db.execute(
+        select(models.InventoryCollection, models.Device.name)
+        .join(models.Device, models.Device.id == models.InventoryCollection.device_id)
+        .order_by(models.InventoryCollection.device_id)
+    )
+    return [
+        {
+            "device_id": collection.device_id,
+            "device": device_name,
+            "collected_at": collection.collected_at,
+            "status": collection.status,
+            "error": collection.error,
+            "items": collection.items,
+            "changed": collection.changed,
+        }
+        for collection, device_name in rows
+    ]
+
+@router.post("/collect")
+def run_inventory_collection(device_ids: Optional[List[int]] = Query(default=None)):
+    """Collect the inventory now instead of waiting for the next scheduled run."""
+    return collect_inventory(device_ids)
+
+@router.get("/prefixes/lookup")
+def lookup_address(ip: str = Query(..., description="IPv4 or IPv6 address")):
+    """Which devices and interfaces own or route an address (longest-prefix match)."""
+    try:
+        return fleet_prefixes.lookup(ip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/prefixes/overlaps")
+def find_overlapping_prefixes(prefix: str = Query(..., description="Network, e.g. 10.0.0.0/16")):
+    """Every address and route in the fleet that contains or falls inside a network."""
+    try:
+        return fleet_prefixes.overlaps(prefix)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/prefixes/conflicts")
+def find_address_conflicts():
+    """Duplicate addresses and overlapping subnets across devices."""
+    return fleet_prefixes.conflicts()
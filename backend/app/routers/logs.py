@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Optional
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_async_db
+from ..services.log_queries import filter_logs, paginate_logs, serialize_log, encode_cursor, status_to_level
+from ..services.log_rollups import count_logs, rebuild_rollups
+from ..services.log_export import stream_logs, EXPORT_FORMATS
+from ..services.log_partitions import run_log_maintenance
+from ..services.replica import get_async_read_db
 
 router = APIRouter(
     prefix="/logs",
@@ -10,33 +18,129 @@ router = APIRouter(
 )
 
 @router.get("/")
-def get_logs(limit: int = 100, db: Session = Depends(get_db)):
+async def get_logs(
+    response: Response,
+    limit: int = Query(default=100, ge=1, le=1000),
+    before: Optional[str] = Query(default=None, description="Cursor '<timestamp>,<log_id>' from a previous X-Next-Cursor header"),
+    device_id: Optional[int] = Query(default=None, description="Only logs for this device"),
+    level: Optional[str] = Query(default=None, description="success, error, warning or info"),
+    action_type: Optional[str] = Query(default=None, description="Exact action type, e.g. 'Device Created'"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
     """
     Fetch configuration logs joined with device names.
     Maps database status to frontend levels (success, error, warning, info).
+
+    Results are newest-first. When a full page is returned, the cursor for the
+    next page is sent in the X-Next-Cursor header; pass it back as `before`.
+    """
+    query = select(models.ConfigurationLog, models.Device.name).outerjoin(models.Device)
+    query = filter_logs(query, device_id=device_id, level=level, action_type=action_type)
+    rows = (await db.execute(paginate_logs(query, before, limit))).all()
+
+    if len(rows) == limit:
+        last_log = rows[-1][0]
+        response.headers["X-Next-Cursor"] = encode_cursor(last_log.timestamp, last_log.log_id)
+
+    return [serialize_log(log, device_name) for log, device_name in rows]
+
+@router.get("/stats")
+async def get_log_stats(
+    since: Optional[datetime] = Query(default=None, description="Inclusive start, defaults to 24 hours ago"),
+    until: Optional[datetime] = Query(default=None, description="Exclusive end, defaults to now"),
+    device_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Log counts per device, action type and status for a time window.
+
+    Served from hourly rollups plus the partial hours at the window edges,
+    so the cost does not grow with the size of the log table.
     """
-    logs = db.query(models.ConfigurationLog).outerjoin(models.Device).order_by(models.ConfigurationLog.timestamp.desc()).limit(limit).all()
-    
-    result = []
-    for log in logs:
-        # Map backend status to frontend level
-        level = "info"
-        status_lower = log.status.lower() if log.status else "info"
-        
-        if status_lower == "success":
-            level = "success"
-        elif status_lower == "failed" or status_lower == "error":
-            level = "error"
-        elif "warning" in status_lower:
-            level = "warning"
-            
-        result.append({
-            "id": log.log_id,
-            "timestamp": log.timestamp.isoformat(),
+    until = until or datetime.utcnow()
+    since = since or until - timedelta(hours=24)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="'since' must be before 'until'")
+
+    counts = await db.run_sync(count_logs, since, until, device_id=device_id)
+
+    device_ids = {key[0] for key in counts if key[0] is not None}
+    names = dict((await db.execute(select(models.Device.id, models.Device.name).where(models.Device.id.in_(device_ids)))).all()) if device_ids else {}
+
+    by_level = {"success": 0, "error": 0, "warning": 0, "info": 0}
+    items = []
+    for (row_device_id, action_type, status), count in counts.items():
+        if count <= 0:
+            continue
+        level = status_to_level(status)
+        by_level[level] += count
+        items.append({
+            "device_id": row_device_id,
+            "device": names.get(row_device_id, "System" if row_device_id is None else f"Device {row_device_id}"),
+            "action_type": action_type,
+            "status": status,
             "level": level,
-            "device": log.device.name if log.device else "System",
-            "action": log.action_type,
-            "message": log.details
+            "count": count
         })
-        
-    return result
+    items.sort(key=lambda item: item["count"], reverse=True)
+
+    return {
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "total": sum(by_level.values()),
+        "by_level": by_level,
+        "items": items
+    }
+
+@router.post("/stats/rebuild")
+async def rebuild_log_stats(db: AsyncSession = Depends(get_async_db)):
+    """Recompute the hourly log rollups from the raw log table."""
+    return {"buckets": await db.run_sync(rebuild_rollups)}
+
+@router.get("/export")
+def export_logs(
+    format: str = Query(default="ndjson", description="ndjson or csv"),
+    gzip: bool = Query(default=False, description="Compress the stream with gzip"),
+    since: Optional[datetime] = Query(default=None, description="Inclusive start of the time range"),
+    until: Optional[datetime] = Query(default=None, description="Exclusive end of the time range"),
+    device_id: Optional[int] = None,
+    include_archived: bool = Query(default=True, description="Also stream months archived by log retention")
+):
+    """
+    Stream configuration logs oldest-first as NDJSON or CSV.
+
+    Rows are fetched through a server-side cursor in batches and written out
+    as they arrive, so exports of any size use constant memory. Months already
+    removed by log retention are read back from their archive files.
+    """
+    fmt = format.lower()
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'. Expected one of: {', '.join(EXPORT_FORMATS)}")
+
+    filename = f"configuration_logs.{fmt}"
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        stream_logs(fmt, compress=gzip, device_id=device_id, since=since, until=until, include_archived=include_archived),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.post("/maintenance")
+def run_maintenance():
+    """
+    Manually run log partition maintenance.
+
+    Creates upcoming monthly partitions, then archives and drops partitions
+    older than LOG_RETENTION_MONTHS. Normally runs daily in the background.
+    Reports `"partitioned": false` with a warning while configuration_logs
+    still has to be migrated (see migrate_log_partitions.py).
+    """
+    try:
+        return run_log_maintenance()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Log maintenance failed: {str(e)}")
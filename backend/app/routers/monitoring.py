@@ -1,9 +1,17 @@
 from fastapi import APIRouter, Depends, Query, BackgroundTasks, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .. import models, schemas
-from ..database import get_db
+from .. import config, models, schemas
+from ..database import get_async_db, get_db
 from .routeros.connection import sync_identity
-from ..services.prometheus_sync import sync_prometheus_targets, get_current_targets
+from ..services.prometheus_sync import sync_prometheus_targets_async, get_current_targets
+from ..services.db_pool_metrics import pool_status
+from ..services.replica import get_async_read_db, replica_guard
+from ..services.change_feed import change_feed
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import platform
 import subprocess
 import logging
@@ -59,9 +67,21 @@ def check_ping(host: str, timeout: int = 1) -> bool:
         logger.error(f"Ping error for {host}: {e}")
         return False
 
+# Pings get threads of their own: fanned out over the default threadpool, a
+# large fleet would hold every thread for the ping timeout and stall all
+# sync routes
+_ping_pool = ThreadPoolExecutor(max_workers=config.MONITORING_PING_WORKERS, thread_name_prefix="ping")
+
+async def _ping_all(devices, timeout: int) -> List[bool]:
+    """Ping every device, at most MONITORING_PING_WORKERS at a time."""
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(_ping_pool, partial(check_ping, device.ip_address, timeout=timeout)) for device in devices
+    ))
+
 @router.get("/status")
-def get_device_status(
-    db: Session = Depends(get_db),
+async def get_device_status(
+    db: AsyncSession = Depends(get_async_read_db),
     include_unreachable: bool = Query(default=True, description="Include unreachable devices in results")
 ):
     """
@@ -71,13 +91,12 @@ def get_device_status(
     Args:
         include_unreachable: If False, filters out devices that are DOWN
     """
-    devices = db.query(models.Device).all()
+    devices = (await db.scalars(select(models.Device))).all()
     results = []
     
     logger.info(f"Checking status for {len(devices)} devices")
     
-    for device in devices:
-        is_up = check_ping(device.ip_address, timeout=2)
+    for device, is_up in zip(devices, await _ping_all(devices, timeout=2)):
         device_status = {
             "id": device.id,
             "name": device.name,
@@ -146,13 +165,13 @@ def get_prometheus_targets(
     return targets
 
 @router.get("/health")
-def get_monitoring_health(db: Session = Depends(get_db)) -> Dict[str, Any]:
+async def get_monitoring_health(db: AsyncSession = Depends(get_async_read_db)) -> Dict[str, Any]:
     """
     Returns overall health status of the monitoring system.
     
     Provides statistics about devices and their reachability.
     """
-    devices = db.query(models.Device).all()
+    devices = (await db.scalars(select(models.Device))).all()
     
     if not devices:
         return {
@@ -166,8 +185,8 @@ def get_monitoring_health(db: Session = Depends(get_db)) -> Dict[str, Any]:
     reachable = 0
     unreachable = 0
     
-    for device in devices:
-        if check_ping(device.ip_address, timeout=2):
+    for is_up in await _ping_all(devices, timeout=2):
+        if is_up:
             reachable += 1
         else:
             unreachable += 1
@@ -192,14 +211,14 @@ def get_monitoring_health(db: Session = Depends(get_db)) -> Dict[str, Any]:
     }
 
 @router.post("/sync-targets")
-def sync_targets_endpoint(db: Session = Depends(get_db)) -> Dict:
+async def sync_targets_endpoint(db: AsyncSession = Depends(get_async_db)) -> Dict:
     """
     Manually trigger sync of devices to Prometheus targets file.
     
     This endpoint syncs all devices from the database to the Prometheus
     file-based service discovery targets file.
     """
-    result = sync_prometheus_targets(db)
+    result = await sync_prometheus_targets_async(db)
     
     if not result["success"]:
         raise HTTPException(status_code=500, detail=result.get("message", "Sync failed"))
@@ -220,3 +239,25 @@ def get_targets_file() -> Dict:
         "targets": targets,
         "count": len(targets)
     }
+
+
+@router.get("/db-pool")
+def get_db_pool_status() -> Dict:
+    """
+    Current occupancy of the API's database connection pools.
+
+    Checkout latency and hold-time histograms are exported on /metrics.
+    """
+    return pool_status()
+
+
+@router.get("/replica")
+def get_replica_status() -> Dict:
+    """Whether read-only routes are being served by the replica, and its last measured lag."""
+    return replica_guard.status()
+
+
+@router.get("/change-feed")
+def get_change_feed_status() -> Dict:
+    """This worker's cross-worker cache invalidation listener and local table versions."""
+    return change_feed.status()
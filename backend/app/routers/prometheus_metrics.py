@@ -11,7 +11,10 @@ from sqlalchemy.orm import Session
 from prometheus_client import Gauge, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
 from .. import models
 from ..database import get_db
-from .routeros.connection import get_routeros_connection
+from ..services.circuit_breaker import BREAKER_REGISTRY
+from ..services.db_pool_metrics import POOL_REGISTRY
+from ..services.routeros_limits import LIMITS_REGISTRY
+from .routeros.connection import read_system_resource
 import logging
 import threading
 import time
@@ -27,6 +30,8 @@ def prometheus_metrics(db: Session = Depends(get_db)):
     Prometheus metrics endpoint.
     Polls all RouterOS devices and returns metrics in Prometheus format.
     Uses a fresh registry per request to avoid reporting stale data.
+    The API's own database pool, circuit breaker and RouterOS session
+    metrics are appended.
     """
     # Create a fresh registry for this scrape
     registry = CollectorRegistry()
@@ -56,11 +61,9 @@ def prometheus_metrics(db: Session = Depends(get_db)):
             'instance': f"{device.ip_address}:161"  # Match SNMP Format for Dashboard compatibility
         }
         
-        connection = None
         try:
             # Short timeout for synchronous scraping
-            connection, api = get_routeros_connection(device, timeout=3, retries=0)
-            resources = api.get_resource('/system/resource').get()
+            resources = read_system_resource(device, timeout=3, retries=0)
             
             if resources:
                 res = resources[0]
@@ -96,8 +99,6 @@ def prometheus_metrics(db: Session = Depends(get_db)):
                 
                 g_uptime.labels(**device_labels).set(total_seconds)
                 g_up.labels(**device_labels).set(1)
-
-            connection.disconnect()
             
         except Exception as e:
             # Log specific error but don't crash
@@ -105,10 +106,6 @@ def prometheus_metrics(db: Session = Depends(get_db)):
             # Mark as down explicitly
             g_up.labels(**device_labels).set(0)
             # Do NOT set other metrics -> Stale -> N/A in Grafana
-            
-            if connection:
-                try: connection.disconnect()
-                except: pass
 
     # Collect sequentially to avoid thread overhead complexity inside async context
     # (Or use threading if performance needed, but for <10 devices sequential is safer for connection lib)
@@ -116,6 +113,9 @@ def prometheus_metrics(db: Session = Depends(get_db)):
         collect_for_device(device)
     
     return Response(
-        content=generate_latest(registry),
+        content=(
+            generate_latest(registry) + generate_latest(POOL_REGISTRY)
+            + generate_latest(BREAKER_REGISTRY) + generate_latest(LIMITS_REGISTRY)
+        ),
         media_type=CONTENT_TYPE_LATEST
     )
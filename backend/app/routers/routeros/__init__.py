@@ -2,8 +2,14 @@ from fastapi import APIRouter
 from .devices import router as devices_router
 from .config import router as config_router
 from .metrics import router as metrics_router
+from .subscriptions import router as subscriptions_router
+from .circuits import router as circuits_router
+from .sessions import router as sessions_router
 
 router = APIRouter(prefix="/routeros", tags=["RouterOS"])
 router.include_router(devices_router)
 router.include_router(config_router)
 router.include_router(metrics_router)
+router.include_router(subscriptions_router)
+router.include_router(circuits_router)
+router.include_router(sessions_router)
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException
+from ...services.circuit_breaker import breakers
+
+router = APIRouter(
+    prefix="/circuits",
+    tags=["RouterOS Circuit Breakers"]
+)
+
+
+@router.get("/")
+def list_circuits():
+    """Circuit breaker state of every device this worker has connected to."""
+    return breakers.status()
+
+
+@router.post("/{device_id}/reset")
+def reset_circuit(device_id: int):
+    """Close a device's circuit, e.g. after fixing it, without waiting for the trial connection."""
+    if not breakers.reset(device_id):
+        raise HTTPException(status_code=404, detail="No circuit breaker for this device")
+    return {"status": "success"}
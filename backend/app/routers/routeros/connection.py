@@ -1,8 +1,15 @@
 import routeros_api
 import socket
 import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence
+from routeros_api import exceptions as routeros_exceptions
+from routeros_api.resource import clean_path
 from fastapi import HTTPException
+from ... import config
 from ...models import Device
+from ...services.circuit_breaker import CircuitOpen, breakers
+from ...services.routeros_limits import coalesced, session_limiter
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,27 +30,76 @@ class RouterOSNetworkError(RouterOSConnectionError):
     """Raised when network connectivity fails"""
     pass
 
+class RouterOSBusyError(RouterOSTimeoutError):
+    """Raised when no session slot for the device came free in time"""
+    pass
+
+class RouterOSCircuitOpenError(RouterOSNetworkError):
+    """Raised without connecting while the device's circuit breaker is open"""
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
 def get_routeros_connection(
     device: Device, 
     timeout: int = 10, 
     retries: int = 2,
-    retry_delay: float = 1.0
+    retry_delay: float = 1.0,
+    session_slot: bool = True
 ):
     """
     Establish connection to RouterOS device with improved error handling.
+
+    Goes through the device's circuit breaker (services/circuit_breaker.py):
+    while it is open, fails at once instead of retrying an unreachable router.
+    Then waits for one of the device's session slots (services/routeros_limits.py),
+    which is held until the connection is disconnected.
     
     Args:
         device: Device model with connection parameters
         timeout: Connection timeout in seconds (default: 10)
         retries: Number of retry attempts (default: 2)
         retry_delay: Initial delay between retries in seconds (default: 1.0)
+        session_slot: Take a session slot; False for long-lived sessions
         
     Returns:
         Tuple of (connection, api) objects
         
     Raises:
-        HTTPException: With appropriate status code and detailed error message
+        RouterOSCircuitOpenError: The circuit is open (mapped to 503 in main.py)
+        RouterOSBusyError: No session slot came free within ROUTEROS_SESSION_WAIT_SECONDS
+        RouterOSConnectionError: Or a subclass, when connecting fails
     """
+    breaker = breakers.get(device.id)
+    try:
+        breaker.before_call()
+    except CircuitOpen as e:
+        raise RouterOSCircuitOpenError(
+            f"Device {device.name} at {device.ip_address} is unreachable, not retrying for {e.retry_after:.0f}s. Last error: {e.last_error}",
+            retry_after=e.retry_after
+        )
+    if session_slot and not session_limiter.acquire(device.id, config.ROUTEROS_SESSION_WAIT_SECONDS):
+        breaker.release()
+        raise RouterOSBusyError(
+            f"Timed out after {config.ROUTEROS_SESSION_WAIT_SECONDS:.0f}s waiting for one of the "
+            f"{session_limiter.max_sessions} API sessions to {device.name}"
+        )
+    try:
+        connection, api = _connect(device, timeout, retries, retry_delay)
+    except BaseException as e:
+        if session_slot:
+            session_limiter.release(device.id)
+        if isinstance(e, RouterOSConnectionError) and not isinstance(e, RouterOSAuthError):
+            breaker.record_failure(str(e))
+        else:
+            breaker.release()  # The router answered, or the failure was ours
+        raise
+    breaker.record_success()
+    if session_slot:
+        session_limiter.attach(connection, device.id)
+    return connection, api
+
+def _connect(device: Device, timeout: int, retries: int, retry_delay: float):
     last_error = None
     
     for attempt in range(retries + 1):
@@ -117,6 +173,134 @@ def get_routeros_connection(
     # Should never reach here, but just in case
     raise RouterOSConnectionError(f"Failed to connect after {retries + 1} attempts: {str(last_error)}")
 
+@contextmanager
+def routeros_session(
+    device: Device,
+    timeout: int = 10,
+    retries: int = 2,
+    retry_delay: float = 1.0
+):
+    """
+    Open a RouterOS session for the duration of a `with` block.
+
+    Same connection semantics as get_routeros_connection, but the connection
+    is always closed on exit.
+
+    Yields:
+        The RouterOS api object
+    """
+    connection, api = get_routeros_connection(device, timeout=timeout, retries=retries, retry_delay=retry_delay)
+    try:
+        yield api
+    finally:
+        try:
+            connection.disconnect()
+        except Exception as e:
+            logger.warning(f"Error disconnecting from device {device.name}: {str(e)}")
+
+def read_system_resource(device: Device, timeout: int = 10, retries: int = 2) -> list:
+    """
+    Read /system/resource of a device.
+
+    Concurrent callers (dashboard, /metrics scrapes) share one read; the
+    connection settings of the caller that started it apply.
+    """
+    def read():
+        with routeros_session(device, timeout=timeout, retries=retries) as api:
+            return api.get_resource('/system/resource').get()
+    return coalesced(device.id, ("print", "/system/resource"), read)
+
+def pipelined_print(
+    api,
+    paths: Dict[str, str],
+    proplists: Optional[Dict[str, Sequence[str]]] = None,
+    queries: Optional[Dict[str, Dict[str, str]]] = None
+) -> Dict[str, list]:
+    """
+    Run several `print` commands on one session without waiting for each reply.
+
+    Every command is written to the socket up front and the tagged replies are
+    collected afterwards, so reading N tables costs one round trip, not N.
+
+    Args:
+        api: RouterOS api object from an open session
+        paths: Mapping of result key to menu path, e.g. {"pools": "/ip/pool"}
+        proplists: Optional mapping of result key to the properties to return
+        queries: Optional mapping of result key to exact-match filters
+
+    Returns:
+        Mapping of result key to the list of rows for that path
+    """
+    promises = {}
+    for key, path in paths.items():
+        arguments = {}
+        if proplists and proplists.get(key):
+            arguments["proplist"] = ",".join(proplists[key])
+        promises[key] = api.get_resource(path).call_async("print", arguments, (queries or {}).get(key) or {})
+    return {key: list(promise.get()) for key, promise in promises.items()}
+
+def base_communicator(api):
+    """Innermost communicator of the API library, the one that owns the tag buffers."""
+    communicator = api.communicator
+    while not hasattr(communicator, "response_buffor"):
+        communicator = communicator.inner
+    return communicator
+
+def decode_attributes(attributes: Dict[bytes, bytes]) -> Dict[str, str]:
+    """Decode a raw reply sentence the way the API library does (".id" becomes "id")."""
+    return {
+        (key[1:] if key in (b'.id', b'.dead') else key).decode(): value.decode(errors='backslashreplace')
+        for key, value in attributes.items()
+    }
+
+def stream_print(
+    api,
+    path: str,
+    proplist: Optional[Sequence[str]] = None,
+    queries: Optional[Dict[str, str]] = None
+) -> Iterator[Dict[str, str]]:
+    """
+    Yield the rows of a `print` one by one as they are read from the socket.
+
+    The API library's own iterator keeps every reply of a command buffered
+    until the command finishes, so large tables (connection tracking, ARP,
+    DHCP leases) would still be held in memory in full. This reads the
+    command's reply sentences directly and hands each row on as soon as it
+    is decoded.
+
+    Args:
+        api: RouterOS api object from an open session
+        path: Menu path, e.g. "/ip/arp"
+        proplist: Optional properties to return
+        queries: Optional exact-match filters evaluated on the router
+    """
+    communicator = base_communicator(api)
+    arguments = {b".proplist": ",".join(proplist).encode()} if proplist else {}
+    query_words = {key.encode(): str(value).encode() for key, value in (queries or {}).items()}
+    tag = communicator.send(clean_path(path).encode(), b"print", arguments, query_words)
+
+    try:
+        while True:
+            reply = communicator.receive_single_response()
+            sentence = reply.response
+            if sentence.tag != tag:
+                # Reply to some other in-flight command on this session
+                reply.save_to_buffor(communicator.response_buffor)
+                continue
+            if sentence.type == b're':
+                yield decode_attributes(sentence.attributes)
+            elif sentence.type == b'trap':
+                message = sentence.attributes.get(b'message', b'')
+                raise routeros_exceptions.RouterOsApiCommunicationError(
+                    f"Error \"{message.decode(errors='backslashreplace')}\" reading {path}", message
+                )
+            elif sentence.type == b'fatal':
+                raise routeros_exceptions.RouterOsApiFatalCommunicationError(f"Fatal error reading {path}")
+            elif sentence.type == b'done':
+                return
+    finally:
+        communicator.response_buffor.pop(tag, None)
+
 def test_routeros_connection(device: Device, timeout: int = 5) -> tuple[bool, str]:
     """
     Test RouterOS connection without raising exceptions.
@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from ... import models
+from ... import models, config
 from ...database import get_db
-from .connection import get_routeros_connection
+from ...services.cache import TTLCache
+from ...services.change_feed import change_feed
+from .connection import RouterOSCircuitOpenError, routeros_session, pipelined_print
+from ...services.routeros_limits import coalesced
 import traceback
 
 router = APIRouter(
@@ -10,88 +13,121 @@ router = APIRouter(
     tags=["RouterOS Device Info"]
 )
 
+# Device tables read for the config form dropdowns
+DEVICE_INFO_PATHS = {
+    "interfaces": "/interface",
+    "bridges": "/interface/bridge",
+    "vlans": "/interface/vlan",
+    "services": "/ip/service",
+    "pools": "/ip/pool",
+}
+
+# Only the columns the dropdowns use are requested from the router
+DEVICE_INFO_PROPLISTS = {
+    "interfaces": ["name"],
+    "bridges": ["name"],
+    "vlans": ["name", "vlan-id"],
+    "services": ["name"],
+    "pools": ["name"],
+}
+
+# Common protocols and actions for firewall/NAT. Built once at import time.
+STATIC_OPTIONS = {
+    "protocols": [
+        {'value': 'tcp', 'label': 'TCP'},
+        {'value': 'udp', 'label': 'UDP'},
+        {'value': 'icmp', 'label': 'ICMP'},
+        {'value': 'any', 'label': 'Any'}
+    ],
+    "firewall_actions": [
+        {'value': 'accept', 'label': 'Accept'},
+        {'value': 'drop', 'label': 'Drop'},
+        {'value': 'reject', 'label': 'Reject'}
+    ],
+    "firewall_chains": [
+        {'value': 'input', 'label': 'Input'},
+        {'value': 'forward', 'label': 'Forward'},
+        {'value': 'output', 'label': 'Output'}
+    ],
+    "enable_disable": [
+        {'value': 'enable', 'label': 'Enable'},
+        {'value': 'disable', 'label': 'Disable'}
+    ],
+    "yes_no": [
+        {'value': 'yes', 'label': 'Yes'},
+        {'value': 'no', 'label': 'No'}
+    ],
+    "user_groups": [
+        {'value': 'full', 'label': 'Full'},
+        {'value': 'read', 'label': 'Read'},
+        {'value': 'write', 'label': 'Write'}
+    ],
+}
+
+_device_info_cache = TTLCache(ttl_seconds=config.DEVICE_INFO_CACHE_TTL_SECONDS)
+
+
+def invalidate_device_info(device_id: int):
+    """Drop the cached dropdown data for a device, e.g. after a deploy changed it."""
+    _device_info_cache.pop(device_id)
+
+
+def _on_devices_changed(change):
+    # A device edited or deleted by any worker (new address, credentials)
+    if change["keys"] is None:
+        _device_info_cache.clear()
+        return
+    for device_id in change["keys"]:
+        invalidate_device_info(device_id)
+
+
+change_feed.on_change("devices", _on_devices_changed)
+
+
+def format_device_info(raw: dict) -> dict:
+    """Format raw RouterOS tables for the frontend dropdowns."""
+    return {
+        "interfaces": [{'value': i.get('name', ''), 'label': i.get('name', '')} for i in raw["interfaces"]],
+        "bridges": [{'value': b.get('name', ''), 'label': b.get('name', '')} for b in raw["bridges"]],
+        "vlans": [{'value': v.get('vlan-id', ''), 'label': f"VLAN {v.get('vlan-id', '')} ({v.get('name', '')})"} for v in raw["vlans"]],
+        "services": [{'value': s.get('name', ''), 'label': s.get('name', '').upper()} for s in raw["services"]],
+        "pools": [{'value': p.get('name', ''), 'label': p.get('name', '')} for p in raw["pools"]],
+        **STATIC_OPTIONS
+    }
+
+
 @router.get("/{device_id}/info")
-def get_device_info(device_id: int, db: Session = Depends(get_db)):
+def get_device_info(device_id: int, refresh: bool = False, db: Session = Depends(get_db)):
     """
     Fetch device-specific configuration options for populating dropdowns.
     Returns interfaces, bridges, IP pools, services, VLANs, etc.
+
+    All tables are read in one pipelined round trip and the result is cached
+    per device for DEVICE_INFO_CACHE_TTL_SECONDS. Pass refresh=true to bypass
+    the cache.
     """
+    if not refresh:
+        cached = _device_info_cache.get(device_id)
+        if cached is not None:
+            return {"status": "success", "data": cached}
+
     device = db.query(models.Device).filter(models.Device.id == device_id).first()
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
     try:
-        connection, api = get_routeros_connection(device)
-        
-        # Fetch various device resources
-        interfaces_raw = api.get_resource('/interface').get()
-        bridges_raw = api.get_resource('/interface/bridge').get()
-        vlans_raw = api.get_resource('/interface/vlan').get()
-        services_raw = api.get_resource('/ip/service').get()
-        pools_raw = api.get_resource('/ip/pool').get()
-        
-        connection.disconnect()
-        
-        # Format data for frontend dropdowns
-        interfaces = [{'value': i.get('name', ''), 'label': i.get('name', '')} for i in interfaces_raw]
-        bridges = [{'value': b.get('name', ''), 'label': b.get('name', '')} for b in bridges_raw]
-        vlans = [{'value': v.get('vlan-id', ''), 'label': f"VLAN {v.get('vlan-id', '')} ({v.get('name', '')})"} for v in vlans_raw]
-        services = [{'value': s.get('name', ''), 'label': s.get('name', '').upper()} for s in services_raw]
-        pools = [{'value': p.get('name', ''), 'label': p.get('name', '')} for p in pools_raw]
-        
-        # Common protocols and actions for firewall/NAT
-        protocols = [
-            {'value': 'tcp', 'label': 'TCP'},
-            {'value': 'udp', 'label': 'UDP'},
-            {'value': 'icmp', 'label': 'ICMP'},
-            {'value': 'any', 'label': 'Any'}
-        ]
-        
-        firewall_actions = [
-            {'value': 'accept', 'label': 'Accept'},
-            {'value': 'drop', 'label': 'Drop'},
-            {'value': 'reject', 'label': 'Reject'}
-        ]
-        
-        firewall_chains = [
-            {'value': 'input', 'label': 'Input'},
-            {'value': 'forward', 'label': 'Forward'},
-            {'value': 'output', 'label': 'Output'}
-        ]
-        
-        enable_disable = [
-            {'value': 'enable', 'label': 'Enable'},
-            {'value': 'disable', 'label': 'Disable'}
-        ]
-        
-        yes_no = [
-            {'value': 'yes', 'label': 'Yes'},
-            {'value': 'no', 'label': 'No'}
-        ]
-        
-        user_groups = [
-            {'value': 'full', 'label': 'Full'},
-            {'value': 'read', 'label': 'Read'},
-            {'value': 'write', 'label': 'Write'}
-        ]
-        
-        return {
-            "status": "success",
-            "data": {
-                "interfaces": interfaces,
-                "bridges": bridges,
-                "vlans": vlans,
-                "services": services,
-                "pools": pools,
-                "protocols": protocols,
-                "firewall_actions": firewall_actions,
-                "firewall_chains": firewall_chains,
-                "enable_disable": enable_disable,
-                "yes_no": yes_no,
-                "user_groups": user_groups
-            }
-        }
-        
+        def read():
+            # Interactive form load: fail fast instead of retrying with backoff
+            with routeros_session(device, timeout=5, retries=0) as api:
+                return format_device_info(pipelined_print(api, DEVICE_INFO_PATHS, DEVICE_INFO_PROPLISTS))
+
+        # Forms opened at the same time share one read
+        data = coalesced(device.id, "device_info", read)
+        _device_info_cache.set(device_id, data)
+        return {"status": "success", "data": data}
+
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py)
     except Exception as e:
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Failed to fetch device info: {str(e)}")
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from ... import models, schemas
 from ...database import get_db
-from .connection import get_routeros_connection
+from .connection import RouterOSCircuitOpenError, get_routeros_connection
 from ...services.prometheus_sync import sync_prometheus_targets
 
 router = APIRouter(
@@ -71,6 +71,8 @@ def sync_device_identity(device_id: int, db: Session = Depends(get_db)):
             "new_name": new_name
         }
 
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from ... import models
 from ...database import get_db
 from .connection import (
-    get_routeros_connection, 
+    read_system_resource,
     RouterOSTimeoutError, 
     RouterOSAuthError, 
     RouterOSNetworkError, 
@@ -29,10 +29,8 @@ def get_device_resources(device_id: int, db: Session = Depends(get_db)):
     if not device:
         raise HTTPException(status_code=404, detail=f"Device with ID {device_id} not found")
     
-    connection = None
     try:
-        connection, api = get_routeros_connection(device, timeout=10, retries=1)
-        resources = api.get_resource('/system/resource').get()
+        resources = read_system_resource(device, timeout=10, retries=1)
         return resources[0] if resources else {}
         
     except RouterOSTimeoutError as e:
@@ -69,10 +67,3 @@ def get_device_resources(device_id: int, db: Session = Depends(get_db)):
             status_code=500, 
             detail=f"Unexpected error: {str(e)}"
         )
-    
-    finally:
-        if connection:
-            try:
-                connection.disconnect()
-            except Exception as e:
-                logger.warning(f"Error disconnecting from device {device.name}: {str(e)}")
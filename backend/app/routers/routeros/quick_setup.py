@@ -1,18 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
+from app import config
 from app.database import get_db
 from app.models import Device
-from app.routers import configuration
+from app.services.script_jobs import FleetScriptJob, start_job
+from app.services.script_runner import install_scripts, run_script
+from app.services.script_templates import TemplateError, get_template, render_script
+from .connection import RouterOSCircuitOpenError, routeros_session
+from .device_info import invalidate_device_info
+from .scripts import catalog, select_fleet_devices
+import time
 import logging
 
 router = APIRouter(prefix="/routeros", tags=["RouterOS Quick Setup"])
 logger = logging.getLogger(__name__)
 
 
-class QuickSetupRequest(BaseModel):
-    device_id: int
+class QuickSetupOptions(BaseModel):
     enable_snmp: bool = True
     snmp_community: str = "public"
     secure_services: bool = True
@@ -22,136 +28,215 @@ class QuickSetupRequest(BaseModel):
     basic_firewall: bool = False  # Optional for now
 
 
+class QuickSetupRequest(QuickSetupOptions):
+    device_id: int
+
+
+class QuickSetupFleetRequest(QuickSetupOptions):
+    # Device selector, as for /routeros/scripts/fleet
+    device_ids: Optional[List[int]] = None
+    name: Optional[str] = None
+    all_devices: bool = False
+    concurrency: Optional[int] = None  # Defaults to SCRIPT_FLEET_CONCURRENCY
+    timeout: Optional[float] = None  # Whole setup per device, defaults to SCRIPT_JOB_TIMEOUT_SECONDS
+
+
+class QuickSetupStepResult(BaseModel):
+    step: str
+    status: str  # success, timeout or error
+    message: str
+    duration: float
+
+
 class QuickSetupResponse(BaseModel):
     success: bool
     message: str
     steps_completed: List[str]
     errors: List[str] = []
+    results: List[QuickSetupStepResult] = []
+
+
+def quick_setup_steps(request: QuickSetupOptions) -> List[dict]:
+    """The catalog templates and parameters for each selected quick setup step."""
+    steps = []
+    if request.enable_snmp:
+        steps.append({
+            "name": "SNMP",
+            "script": "enable_snmp.rsc",
+            "params": {"community": request.snmp_community},
+            "done": "✅ SNMP enabled",
+        })
+    if request.secure_services:
+        # Only telnet off and SSH on the standard port; FTP/WWW are left alone
+        steps.append({
+            "name": "Service security",
+            "script": "secure_services.rsc",
+            "params": {"ssh_port": 22, "disable_ftp": "no", "disable_www": "no"},
+            "done": "✅ Services secured (telnet disabled, SSH enabled)",
+        })
+    if request.setup_ntp:
+        steps.append({
+            "name": "NTP",
+            "script": "setup_ntp.rsc",
+            "params": {"primary": request.ntp_primary, "secondary": request.ntp_secondary},
+            "done": f"✅ NTP configured ({request.ntp_primary})",
+        })
+    if request.basic_firewall:
+        steps.append({
+            "name": "Firewall",
+            "script": "firewall_accept_established.rsc",
+            "params": {},
+            "done": "✅ Basic firewall rules added",
+        })
+    return steps
+
+
+def _quick_setup_entries(request: QuickSetupOptions) -> List[tuple]:
+    """(step, catalog entry) for each selected step, with parameters checked up front."""
+    entries = []
+    for step in quick_setup_steps(request):
+        entry = catalog.get(step["script"])
+        if entry is None:
+            raise HTTPException(status_code=500, detail=f"Quick setup script {step['script']} is missing")
+        try:
+            get_template(entry).validate(step["params"])
+        except TemplateError as e:
+            raise HTTPException(status_code=400, detail=f"{step['name']}: {e}")
+        entries.append((step, entry))
+    return entries
+
+
+def _render_steps(entries: List[tuple], device: Device) -> List[tuple]:
+    return [(step, render_script(entry, step["params"], device)) for step, entry in entries]
+
+
+def apply_quick_setup(api, device: Device, rendered: List[tuple], timeout: Optional[float] = None) -> List[Dict]:
+    """
+    Apply rendered quick setup steps over one open session.
+
+    Every step's script is installed in one pipelined exchange (a single
+    listing of installed scripts and jobs, then all uploads and stale-version
+    removals back to back). The steps then run in order, each with what is
+    left of `timeout`, since later steps may depend on earlier ones.
+    Returns one result per step; a failing step does not stop the others.
+    """
+    started = time.monotonic()
+    timeout = config.SCRIPT_JOB_TIMEOUT_SECONDS if timeout is None else timeout
+    results = []
+    try:
+        installs = install_scripts(api, device, [script for _, script in rendered])
+    except Exception as e:
+        logger.error(f"Quick setup install failed for device {device.id}: {e}")
+        return [
+            {"step": step["name"], "status": "error", "message": f"Install failed: {e}", "duration": 0.0}
+            for step, _ in rendered
+        ]
+
+    for (step, script), install in zip(rendered, installs):
+        step_started = time.monotonic()
+        remaining = max(0.0, timeout - (step_started - started))
+        try:
+            outcome = run_script(api, device, script, timeout=remaining, install=install)
+            status = "success" if outcome["completed"] else "timeout"
+            message = step["done"] if outcome["completed"] else outcome["message"]
+        except Exception as e:
+            logger.error(f"{step['name']} setup failed for device {device.id}: {e}")
+            status, message = "error", str(e)
+        results.append({
+            "step": step["name"],
+            "status": status,
+            "message": message,
+            "duration": round(time.monotonic() - step_started, 3),
+        })
+    invalidate_device_info(device.id)
+    return results
+
+
+class QuickSetupJob(FleetScriptJob):
+    """Quick setup as a fleet job; each device's result lists its steps."""
+
+    def __init__(self, entries: List[tuple], devices: List[Device], concurrency: int, timeout: float):
+        super().__init__(None, devices, None, concurrency, timeout)
+        self.label = "quick-setup"
+        self.entries = entries
+
+    def _prepare(self, device: Device):
+        return _render_steps(self.entries, device)
+
+    def _execute(self, api, device: Device, prepared, remaining: float) -> Dict:
+        steps = apply_quick_setup(api, device, prepared, timeout=remaining)
+        succeeded = sum(1 for step in steps if step["status"] == "success")
+        if succeeded == len(steps):
+            status = "success"
+        else:
+            status = "partial" if succeeded else "error"
+        return {
+            "status": status,
+            "message": f"Quick setup completed: {succeeded}/{len(steps)} steps",
+            "steps": steps,
+        }
 
 
 @router.post("/quick-setup", response_model=QuickSetupResponse)
-async def quick_setup(request: QuickSetupRequest, db: Session = Depends(get_db)):
+def quick_setup(request: QuickSetupRequest, db: Session = Depends(get_db)):
     """
     One-click setup for GNS3 MikroTik devices.
     Bundles: SNMP, Security (disable telnet/enable SSH), NTP, optional firewall.
+
+    Each step is a catalog script template rendered for the device. All
+    steps share one RouterOS session: their scripts are installed in a
+    single pipelined exchange, then run in order. `results` reports each
+    step separately.
     """
     device = db.query(Device).filter_by(id=request.device_id).first()
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
-    completed_steps = []
-    errors = []
-
     try:
-        # 1. Enable SNMP
-        if request.enable_snmp:
-            try:
-                config_result = configuration.execute_template(
-                    device_id=request.device_id,
-                    template_name="enable_snmp",
-                    params={"community": request.snmp_community},
-                    db=db
-                )
-                completed_steps.append("✅ SNMP enabled")
-            except Exception as e:
-                errors.append(f"SNMP setup failed: {str(e)}")
-                logger.error(f"SNMP setup failed for device {device.id}: {e}")
-
-        # 2. Secure Services (Disable Telnet, Enable SSH)
-        if request.secure_services:
-            try:
-                # Disable telnet
-                configuration.execute_template(
-                    device_id=request.device_id,
-                    template_name="service_toggle",
-                    params={
-                        "Service Name": "telnet",
-                        "State (enable/disable)": "disable",
-                        "Port": 23
-                    },
-                    db=db
-                )
-                
-                # Enable SSH
-                configuration.execute_template(
-                    device_id=request.device_id,
-                    template_name="service_toggle",
-                    params={
-                        "Service Name": "ssh",
-                        "State (enable/disable)": "enable",
-                        "Port": 22
-                    },
-                    db=db
-                )
-                completed_steps.append("✅ Services secured (telnet disabled, SSH enabled)")
-            except Exception as e:
-                errors.append(f"Service security failed: {str(e)}")
-                logger.error(f"Service security failed for device {device.id}: {e}")
-
-        # 3. Setup NTP
-        if request.setup_ntp:
-            try:
-                configuration.execute_template(
-                    device_id=request.device_id,
-                    template_name="system_ntp_client",
-                    params={
-                        "Primary NTP Server": request.ntp_primary,
-                        "Secondary NTP Server": request.ntp_secondary,
-                        "Enabled": "yes"
-                    },
-                    db=db
-                )
-                completed_steps.append(f"✅ NTP configured ({request.ntp_primary})")
-            except Exception as e:
-                errors.append(f"NTP setup failed: {str(e)}")
-                logger.error(f"NTP setup failed for device {device.id}: {e}")
-
-        # 4. Basic Firewall (Optional)
-        if request.basic_firewall:
-            try:
-                # Accept established connections
-                configuration.execute_template(
-                    device_id=request.device_id,
-                    template_name="firewall_filter_add",
-                    params={
-                        "Chain": "input",
-                        "Protocol": "tcp",
-                        "Dst Port": "",
-                        "Action": "accept",
-                        "Src Address": "",
-                        "Comment": "Accept established"
-                    },
-                    db=db
-                )
-                completed_steps.append("✅ Basic firewall rules added")
-            except Exception as e:
-                errors.append(f"Firewall setup failed: {str(e)}")
-                logger.error(f"Firewall setup failed for device {device.id}: {e}")
-
-        success = len(completed_steps) > 0
-        message = f"Quick setup completed: {len(completed_steps)}/{sum([request.enable_snmp, request.secure_services, request.setup_ntp, request.basic_firewall])} steps"
-
-        return QuickSetupResponse(
-            success=success,
-            message=message,
-            steps_completed=completed_steps,
-            errors=errors
-        )
+        rendered = _render_steps(_quick_setup_entries(request), device)
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    try:
+        with routeros_session(device) as api:
+            results = apply_quick_setup(api, device, rendered)
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py)
     except Exception as e:
         logger.error(f"Quick setup failed for device {device.id}: {e}")
         raise HTTPException(status_code=500, detail=f"Quick setup failed: {str(e)}")
 
+    completed_steps = [r["message"] for r in results if r["status"] == "success"]
+    errors = [f"{r['step']} setup failed: {r['message']}" for r in results if r["status"] != "success"]
+
+    success = len(completed_steps) > 0
+    message = f"Quick setup completed: {len(completed_steps)}/{len(results)} steps"
 
-# Helper function to use in configuration.py
-def execute_template(device_id: int, template_name: str, params: dict, db: Session):
-    """Execute a configuration template - placeholder until we integrate properly"""
-    from app.routers.configuration import ConfigDeployRequest, deploy_config
-    
-    request = ConfigDeployRequest(
-        device_id=device_id,
-        template_name=template_name,
-        params=params
+    return QuickSetupResponse(
+        success=success,
+        message=message,
+        steps_completed=completed_steps,
+        errors=errors,
+        results=results
     )
-    
-    return deploy_config(request, db)
+
+
+@router.post("/quick-setup/fleet", status_code=202)
+def quick_setup_fleet(request: QuickSetupFleetRequest, db: Session = Depends(get_db)):
+    """
+    Apply quick setup to many devices at once.
+
+    Devices are selected like /routeros/scripts/fleet. Each device gets one
+    session and `timeout` seconds for the whole setup. Returns the job record
+    right away; follow it with /routeros/scripts/jobs/{job_id}/stream, where
+    each device's result carries its per-step `steps`.
+    """
+    entries = _quick_setup_entries(request)
+    devices = select_fleet_devices(db, request)
+    job = start_job(QuickSetupJob(
+        entries,
+        devices,
+        concurrency=max(1, request.concurrency or config.SCRIPT_FLEET_CONCURRENCY),
+        timeout=request.timeout or config.SCRIPT_JOB_TIMEOUT_SECONDS,
+    ))
+    return job.to_dict(include_results=False)
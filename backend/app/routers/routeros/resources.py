@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
 from ... import models
 from ...database import get_db
-from .connection import get_routeros_connection
+from ...services.routeros_subscriptions import subscriptions
+from .connection import RouterOSCircuitOpenError, get_routeros_connection, routeros_session, pipelined_print, stream_print
+from ...services.routeros_limits import coalesced
+import json
 import logging
 
 router = APIRouter(
@@ -12,30 +17,233 @@ router = APIRouter(
 
 logger = logging.getLogger(__name__)
 
-@router.get("/{device_id}/interfaces")
-def get_interfaces(device_id: int, db: Session = Depends(get_db)):
-    """Fetch all interfaces from the device."""
+
+def _flag(value) -> bool:
+    return value == 'true'
+
+
+# Resource kinds served by this router: RouterOS menu path plus the response
+# fields, each mapped to the RouterOS property it comes from and an optional
+# converter. The property names double as the `.proplist` projection.
+# Optional "queries" are exact-match filters applied on the router.
+RESOURCE_KINDS = {
+    "interfaces": {
+        "path": "/interface",
+        "fields": {
+            "id": ("id", None),
+            "name": ("name", None),
+            "type": ("type", None),
+            "running": ("running", _flag),
+            "disabled": ("disabled", _flag),
+        },
+    },
+    "bridges": {
+        "path": "/interface/bridge",
+        "fields": {
+            "name": ("name", None),
+        },
+    },
+    "vlans": {
+        "path": "/interface/vlan",
+        "fields": {
+            "name": ("name", None),
+            "vlan_id": ("vlan-id", None),
+            "interface": ("interface", None),
+        },
+    },
+    "ips": {
+        "path": "/ip/address",
+        "fields": {
+            "address": ("address", None),
+            "network": ("network", None),
+            "interface": ("interface", None),
+        },
+    },
+    "pools": {
+        "path": "/ip/pool",
+        "fields": {
+            "name": ("name", None),
+            "ranges": ("ranges", None),
+        },
+    },
+    "services": {
+        "path": "/ip/service",
+        "fields": {
+            "name": ("name", None),
+            "port": ("port", None),
+            "address": ("address", None),
+            "disabled": ("disabled", _flag),
+        },
+    },
+    "routes": {
+        "path": "/ip/route",
+        # Static routes only: connected routes mirror /ip/address and a full
+        # dynamic table (BGP/OSPF) is far too large to fetch whole
+        "queries": {"dynamic": "false"},
+        "fields": {
+            "dst_address": ("dst-address", None),
+            "gateway": ("gateway", None),
+            "distance": ("distance", None),
+            "routing_table": ("routing-table", None),
+            "disabled": ("disabled", _flag),
+        },
+    },
+}
+
+
+# Large tables that are streamed row by row instead of fetched whole, with the
+# properties that may be used as exact-match filters on the router
+STREAM_TABLES = {
+    "connections": {
+        "path": "/ip/firewall/connection",
+        "filters": ["protocol", "src-address", "dst-address", "connection-state", "tcp-state"],
+    },
+    "arp": {
+        "path": "/ip/arp",
+        "filters": ["interface", "address", "mac-address", "dynamic", "complete"],
+    },
+    "dhcp-leases": {
+        "path": "/ip/dhcp-server/lease",
+        "filters": ["server", "status", "address", "mac-address", "host-name", "dynamic"],
+    },
+}
+
+STREAM_CHUNK_ROWS = 100
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in value.split(",") if part.strip()] if value else []
+
+
+def _proplist_name(prop: str) -> str:
+    return ".id" if prop == "id" else prop
+
+
+def _format_rows(kind: str, rows: list, fields: List[str]) -> List[Dict]:
+    spec = RESOURCE_KINDS[kind]["fields"]
+    formatted = []
+    for row in rows:
+        item = {}
+        for field in fields:
+            prop, convert = spec[field]
+            value = row.get(prop)
+            item[field] = convert(value) if convert else value
+        formatted.append(item)
+    return formatted
+
+
+def fetch_resources(device: models.Device, kinds: List[str], fields: Optional[List[str]] = None) -> Dict[str, List[Dict]]:
+    """
+    Read several resource kinds from a device over a single session.
+
+    Kinds whose table is mirrored by a live subscription are served from
+    memory; only the rest are read from the device.
+
+    Args:
+        device: Device to read from
+        kinds: Keys of RESOURCE_KINDS to fetch
+        fields: Response fields to keep. A kind that has none of them returns
+            all of its fields. None returns every field.
+
+    Returns:
+        Mapping of kind to its formatted rows
+    """
+    selected = {}
+    for kind in kinds:
+        spec_fields = list(RESOURCE_KINDS[kind]["fields"])
+        wanted = [f for f in fields if f in spec_fields] if fields else []
+        selected[kind] = wanted or spec_fields
+
+    result = {}
+    for kind in kinds:
+        if RESOURCE_KINDS[kind].get("queries"):
+            continue  # Mirrors hold the whole table
+        mirrored = subscriptions.get_rows(device.id, RESOURCE_KINDS[kind]["path"])
+        if mirrored is not None:
+            result[kind] = _format_rows(kind, mirrored, selected[kind])
+
+    remaining = [kind for kind in kinds if kind not in result]
+    if not remaining:
+        return result
+
+    paths = {kind: RESOURCE_KINDS[kind]["path"] for kind in remaining}
+    # The API library strips the dot from ".id" in replies, but the router
+    # still expects it in `.proplist`
+    proplists = {
+        kind: [_proplist_name(RESOURCE_KINDS[kind]["fields"][f][0]) for f in selected[kind]]
+        for kind in remaining
+    }
+
+    queries = {kind: RESOURCE_KINDS[kind].get("queries") for kind in remaining}
+
+    def read():
+        with routeros_session(device) as api:
+            return pipelined_print(api, paths, proplists, queries)
+
+    # Concurrent requests for the same tables and properties share one read
+    key = tuple((paths[kind], tuple(proplists[kind]), tuple(sorted((queries[kind] or {}).items()))) for kind in remaining)
+    raw = coalesced(device.id, ("pipelined_print", key), read)
+
+    for kind in remaining:
+        result[kind] = _format_rows(kind, raw[kind], selected[kind])
+    return {kind: result[kind] for kind in kinds}
+
+
+def _get_device(device_id: int, db: Session) -> models.Device:
     device = db.query(models.Device).filter(models.Device.id == device_id).first()
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
-    
+    return device
+
+
+@router.get("/{device_id}")
+def get_resources(
+    device_id: int,
+    kinds: str = Query(default=",".join(RESOURCE_KINDS), description="Comma-separated: " + ", ".join(RESOURCE_KINDS)),
+    fields: Optional[str] = Query(default=None, description="Comma-separated response fields to return, e.g. name,type,running"),
+    db: Session = Depends(get_db)
+):
+    """
+    Fetch several resource tables in one call.
+
+    All requested tables are read over one RouterOS session and only the
+    properties needed for `fields` are transferred from the router.
+    """
+    kind_list = _split(kinds)
+    unknown_kinds = [k for k in kind_list if k not in RESOURCE_KINDS]
+    if not kind_list or unknown_kinds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown resource kinds: {', '.join(unknown_kinds) or '(none given)'}. Expected any of: {', '.join(RESOURCE_KINDS)}"
+        )
+
+    field_list = _split(fields)
+    known_fields = {f for k in kind_list for f in RESOURCE_KINDS[k]["fields"]}
+    unknown_fields = [f for f in field_list if f not in known_fields]
+    if unknown_fields:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields for {', '.join(kind_list)}: {', '.join(unknown_fields)}"
+        )
+
+    device = _get_device(device_id, db)
+    try:
+        return fetch_resources(device, kind_list, field_list or None)
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py)
+    except Exception as e:
+        logger.error(f"Failed to fetch resources {kind_list}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{device_id}/interfaces")
+def get_interfaces(device_id: int, db: Session = Depends(get_db)):
+    """Fetch all interfaces from the device."""
+    device = _get_device(device_id, db)
     try:
-        connection, api = get_routeros_connection(device)
-        # Get all interfaces
-        interfaces = api.get_resource('/interface').get()
-        connection.disconnect()
-        
-        # Simplify response
-        return [
-            {
-                "id": i.get('id'),
-                "name": i.get('name'),
-                "type": i.get('type'),
-                "running": i.get('running') == 'true',
-                "disabled": i.get('disabled') == 'true'
-            }
-            for i in interfaces
-        ]
+        return fetch_resources(device, ["interfaces"])["interfaces"]
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py)
     except Exception as e:
         logger.error(f"Failed to fetch interfaces: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -44,16 +252,11 @@ def get_interfaces(device_id: int, db: Session = Depends(get_db)):
 @router.get("/{device_id}/bridges")
 def get_bridges(device_id: int, db: Session = Depends(get_db)):
     """Fetch all bridge interfaces."""
-    device = db.query(models.Device).filter(models.Device.id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-
+    device = _get_device(device_id, db)
     try:
-        connection, api = get_routeros_connection(device)
-        bridges = api.get_resource('/interface/bridge').get()
-        connection.disconnect()
-        
-        return [{"name": b.get('name')} for b in bridges]
+        return fetch_resources(device, ["bridges"])["bridges"]
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -61,23 +264,11 @@ def get_bridges(device_id: int, db: Session = Depends(get_db)):
 @router.get("/{device_id}/vlans")
 def get_vlans(device_id: int, db: Session = Depends(get_db)):
     """Fetch defined VLANs."""
-    device = db.query(models.Device).filter(models.Device.id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-
+    device = _get_device(device_id, db)
     try:
-        connection, api = get_routeros_connection(device)
-        vlans= api.get_resource('/interface/vlan').get()
-        connection.disconnect()
-        
-        return [
-            {
-                "name": v.get('name'),
-                "vlan_id": v.get('vlan-id'),
-                "interface": v.get('interface')
-            } 
-            for v in vlans
-        ]
+        return fetch_resources(device, ["vlans"])["vlans"]
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -85,23 +276,11 @@ def get_vlans(device_id: int, db: Session = Depends(get_db)):
 @router.get("/{device_id}/ips")
 def get_ip_addresses(device_id: int, db: Session = Depends(get_db)):
     """Fetch assigned IP addresses."""
-    device = db.query(models.Device).filter(models.Device.id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-
+    device = _get_device(device_id, db)
     try:
-        connection, api = get_routeros_connection(device)
-        ips = api.get_resource('/ip/address').get()
-        connection.disconnect()
-        
-        return [
-            {
-                "address": ip.get('address'),
-                "network": ip.get('network'),
-                "interface": ip.get('interface')
-            } 
-            for ip in ips
-        ]
+        return fetch_resources(device, ["ips"])["ips"]
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -109,15 +288,95 @@ def get_ip_addresses(device_id: int, db: Session = Depends(get_db)):
 @router.get("/{device_id}/pools")
 def get_ip_pools(device_id: int, db: Session = Depends(get_db)):
     """Fetch IP pools."""
-    device = db.query(models.Device).filter(models.Device.id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
+    device = _get_device(device_id, db)
+    try:
+        return fetch_resources(device, ["pools"])["pools"]
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{device_id}/routes")
+def get_routes(device_id: int, db: Session = Depends(get_db)):
+    """Fetch static routes."""
+    device = _get_device(device_id, db)
+    try:
+        return fetch_resources(device, ["routes"])["routes"]
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
+
+def _ndjson_rows(connection, device: models.Device, path: str, proplist: List[str], queries: Dict[str, str], limit: Optional[int]):
+    """Encode streamed rows as NDJSON, closing the RouterOS session when done."""
+    chunk = []
+    count = 0
     try:
-        connection, api = get_routeros_connection(device)
-        pools = api.get_resource('/ip/pool').get()
-        connection.disconnect()
-        
-        return [{"name": p.get('name'), "ranges": p.get('ranges')} for p in pools]
+        for row in stream_print(connection.get_api(), path, proplist, queries):
+            chunk.append(json.dumps(row))
+            count += 1
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                yield ("\n".join(chunk) + "\n").encode()
+                chunk = []
+            if limit and count >= limit:
+                break
+        if chunk:
+            yield ("\n".join(chunk) + "\n").encode()
     except Exception as e:
+        # The status line is already sent; report the failure in-band
+        logger.error(f"Streaming {path} from {device.name} failed after {count} rows: {e}")
+        if chunk:
+            yield ("\n".join(chunk) + "\n").encode()
+        yield (json.dumps({"error": str(e)}) + "\n").encode()
+    finally:
+        try:
+            connection.disconnect()
+        except Exception as e:
+            logger.warning(f"Error disconnecting from device {device.name}: {str(e)}")
+
+
+@router.get("/{device_id}/stream/{table}")
+def stream_table(
+    device_id: int,
+    table: str,
+    request: Request,
+    fields: Optional[str] = Query(default=None, description="Comma-separated RouterOS properties to return"),
+    limit: Optional[int] = Query(default=None, ge=1, description="Stop after this many rows"),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream a large RouterOS table as NDJSON.
+
+    Rows are sent on as they are decoded from the API socket, so memory use
+    stays flat and the first rows arrive before the router has finished
+    listing. Any of the table's filter properties may be passed as query
+    parameters (e.g. ?protocol=tcp or ?mac_address=...) and are matched
+    exactly on the router. An error after streaming has started is reported
+    as a final {"error": ...} line.
+    """
+    spec = STREAM_TABLES.get(table)
+    if not spec:
+        raise HTTPException(status_code=404, detail=f"Unknown table '{table}'. Expected one of: {', '.join(STREAM_TABLES)}")
+
+    queries = {}
+    for name in spec["filters"]:
+        value = request.query_params.get(name, request.query_params.get(name.replace("-", "_")))
+        if value is not None:
+            queries[name] = value
+
+    device = _get_device(device_id, db)
+    try:
+        connection, _ = get_routeros_connection(device)
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py)
+    except Exception as e:
+        logger.error(f"Failed to connect for streaming {table}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+    proplist = [_proplist_name(f) for f in _split(fields)]
+    return StreamingResponse(
+        _ndjson_rows(connection, device, spec["path"], proplist, queries, limit),
+        media_type="application/x-ndjson"
+    )
@@ -1,102 +1,219 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from ... import database, models
-from .connection import get_routeros_connection
+from ... import database, models, schemas
+from ...services.script_catalog import ScriptCatalog
+from ...services.script_runner import run_script
+from ...services.script_jobs import start_fleet_job, get_fleet_job, list_fleet_jobs
+from ...services.script_templates import TemplateError, get_template, render_script
+from .connection import RouterOSCircuitOpenError, get_routeros_connection
+from .device_info import invalidate_device_info
+from typing import Any, Dict, List, Optional
+import json
 import os
-import uuid
-import time
 
 router = APIRouter(
     prefix="",  # Main.py mounts this at /routeros/scripts already
     tags=["scripts"]
 )
 
-SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "scripts", "routeros")
+# backend/scripts/routeros
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), "scripts", "routeros")
+
+catalog = ScriptCatalog(SCRIPTS_DIR)
+
+def _describe(entry) -> dict:
+    """Catalog metadata plus the template parameters the script accepts."""
+    metadata = entry.metadata()
+    try:
+        metadata["params"] = [spec.to_dict() for spec in get_template(entry).params.values()]
+    except TemplateError as e:
+        metadata["params"] = []
+        metadata["template_error"] = str(e)
+    return metadata
 
 @router.get("/")
 def list_scripts():
-    """List available RouterOS scripts."""
-    scripts = []
-    if os.path.exists(SCRIPTS_DIR):
-        for f in os.listdir(SCRIPTS_DIR):
-            if f.endswith(".rsc"):
-                with open(os.path.join(SCRIPTS_DIR, f), "r") as file:
-                    content = file.read()
-                scripts.append({
-                    "name": f,
-                    "description": f.replace("_", " ").replace(".rsc", "").title(),
-                    "content": content
-                })
-    return scripts
+    """List available RouterOS scripts (metadata only, see GET /{script_name} for the source)."""
+    return [_describe(entry) for entry in catalog.list()]
+
+def select_fleet_devices(db: Session, request) -> List[models.Device]:
+    """
+    Validate a fleet request's selector and options and load its devices.
+
+    `request` needs device_ids, name, all_devices, concurrency and timeout.
+    The devices are detached from `db` because jobs outlive the request.
+    """
+    if not (request.device_ids or request.name or request.all_devices):
+        raise HTTPException(status_code=400, detail="Select devices with device_ids, name or all_devices")
+    if request.concurrency is not None and request.concurrency < 1:
+        raise HTTPException(status_code=400, detail="concurrency must be at least 1")
+    if request.timeout is not None and request.timeout <= 0:
+        raise HTTPException(status_code=400, detail="timeout must be positive")
+
+    query = db.query(models.Device)
+    if request.device_ids:
+        query = query.filter(models.Device.id.in_(request.device_ids))
+    if request.name:
+        pattern = request.name.replace("%", r"\%").replace("_", r"\_").replace("*", "%")
+        query = query.filter(models.Device.name.like(pattern, escape="\\"))
+    devices = query.order_by(models.Device.id).all()
+    if not devices:
+        raise HTTPException(status_code=404, detail="No devices match the selector")
+
+    for device in devices:
+        db.expunge(device)
+    return devices
+
+@router.post("/fleet", status_code=202)
+def execute_script_on_fleet(request: schemas.FleetScriptRequest, db: Session = Depends(database.get_db)):
+    """
+    Run a catalog script on many devices at once.
+
+    Devices are selected by `device_ids`, a `name` pattern (* wildcards) or
+    `all_devices`. At most `concurrency` devices run at a time and each has
+    `timeout` seconds to connect and finish. Returns the job record right
+    away; follow it with GET /jobs/{job_id} or /jobs/{job_id}/stream.
+    """
+    entry = catalog.get(request.script_name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Script not found")
+    # Fail on bad parameters before touching any device
+    try:
+        get_template(entry).validate(request.params or {})
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    devices = select_fleet_devices(db, request)
+    job = start_fleet_job(entry, devices, params=request.params, concurrency=request.concurrency, timeout=request.timeout)
+    return job.to_dict(include_results=False)
+
+@router.get("/jobs")
+def list_script_jobs():
+    """Recent fleet script jobs, newest first."""
+    return [job.to_dict(include_results=False) for job in list_fleet_jobs()]
+
+@router.get("/jobs/{job_id}")
+def get_script_job(job_id: str):
+    job = get_fleet_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+def _ndjson_job_results(job):
+    for result in job.follow():
+        # A blank line keeps idle connections open while devices are still running
+        yield (json.dumps(result, default=str) + "\n") if result is not None else "\n"
+    yield json.dumps({"job_id": job.id, "status": job.status, "summary": job.summary()}) + "\n"
+
+@router.get("/jobs/{job_id}/stream")
+def stream_script_job(job_id: str):
+    """
+    Stream a job's per-device results as NDJSON while they arrive.
+
+    Results recorded before the request are sent first. The last line is the
+    job summary, sent once every device has finished.
+    """
+    job = get_fleet_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(_ndjson_job_results(job), media_type="application/x-ndjson")
+
+@router.get("/{script_name}")
+def get_script(script_name: str, request: Request):
+    """
+    Fetch one script with its source.
+
+    The response carries an ETag of the content hash; a request with a
+    matching If-None-Match gets 304 Not Modified.
+    """
+    entry = catalog.get(script_name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Script not found")
+
+    etag = f'"{entry.sha256}"'
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return Response(
+        content=json.dumps({**_describe(entry), "content": entry.content}),
+        media_type="application/json",
+        headers={"ETag": etag}
+    )
+
+@router.post("/render/{device_id}")
+def render_script_for_device(
+    device_id: int,
+    script_name: str,
+    params: Optional[Dict[str, Any]] = Body(default=None),
+    db: Session = Depends(database.get_db)
+):
+    """Preview a template rendered for a device without running it."""
+    entry = catalog.get(script_name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Script not found")
+    device = db.query(models.Device).filter(models.Device.id == device_id).first()
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    try:
+        rendered = render_script(entry, params, device)
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"name": entry.name, "sha256": rendered.sha256, "content": rendered.content}
 
 @router.post("/execute/{device_id}")
-def execute_script(device_id: int, script_name: str, db: Session = Depends(database.get_db)):
+def execute_script(
+    device_id: int,
+    script_name: str,
+    params: Optional[Dict[str, Any]] = Body(default=None),
+    db: Session = Depends(database.get_db)
+):
     """
-    Execute a script on a specific device using /system/script/add and /run.
-    This works by uploading the script content to the router's script repository, running it, and removing it.
+    Execute a script on a specific device.
+
+    Template scripts are rendered for the device from the JSON body
+    parameters first; see the script's `params` in the catalog.
+
+    The script is installed in the router's script repository under a name
+    derived from its content hash and kept there, so repeated runs of the
+    same version skip the upload. The call returns once the script's job
+    has finished (or SCRIPT_JOB_TIMEOUT_SECONDS passed).
     """
     
     # 1. Get Script Content
-    script_path = os.path.join(SCRIPTS_DIR, script_name)
-    if not os.path.exists(script_path):
+    entry = catalog.get(script_name)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Script not found")
-    
-    with open(script_path, "r") as f:
-        script_content = f.read()
 
     # 2. Get Device & Connection
     device = db.query(models.Device).filter(models.Device.id == device_id).first()
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
+    try:
+        entry = render_script(entry, params, device)
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     connection = None
-    temp_script_name = f"networkweaver_{uuid.uuid4().hex[:8]}"
 
     try:
         logger.info(f"Connecting to {device.name} to execute {script_name}")
         connection, api = get_routeros_connection(device)
-        
-        system_script = api.get_resource('/system/script')
-        
-        # 3. Add script to router (overwrite if exists)
-        try:
-            logger.info(f"Adding temporary script: {temp_script_name}")
-            system_script.add(name=temp_script_name, source=script_content)
-        except Exception as e:
-            # If it exists, remove and try again
-            try:
-                existing = system_script.get(name=temp_script_name)
-                if existing:
-                    system_script.remove(id=existing[0]['id'])
-                    system_script.add(name=temp_script_name, source=script_content)
-            except Exception as e2:
-                raise Exception(f"Failed to upload script: {str(e2)}")
-
-        # 4. Run the script
-        logger.info(f"Running script: {temp_script_name}")
-        try:
-            system_script.run(id=temp_script_name)
-            message = "Script executed successfully."
-        except Exception as e:
-            message = f"Script execution triggered error (might be expected): {str(e)}"
-            logger.warning(message)
-
-        # 5. Cleanup
-        try:
-            # Short delay to allow execution to start
-            time.sleep(1)
-            existing = system_script.get(name=temp_script_name)
-            if existing:
-                system_script.remove(id=existing[0]['id'])
-        except Exception as e:
-            logger.warning(f"Failed to cleanup temp script: {str(e)}")
-        
+
+        # 3. Install if needed, run and wait for the job
+        result = run_script(api, device, entry)
+
+        invalidate_device_info(device.id)
+
         return {
             "status": "success", 
             "message": f"Script {script_name} executed on {device.name}", 
-            "details": message
+            "details": result["message"],
+            **{k: v for k, v in result.items() if k != "message"}
         }
 
+    except RouterOSCircuitOpenError:
+        raise  # 503 (see main.py)
     except Exception as e:
         logger.error(f"Execution failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Execution failed: {str(e)}")
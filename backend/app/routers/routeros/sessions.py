@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from ...services.routeros_limits import in_flight_reads, session_limiter
+
+router = APIRouter(
+    prefix="/sessions",
+    tags=["RouterOS Sessions"]
+)
+
+
+@router.get("/")
+def list_sessions():
+    """Per device: API sessions open and waiting in this worker, and distinct reads in flight."""
+    reads = in_flight_reads()
+    return [
+        {"device_id": device_id, **status, "in_flight_reads": reads.get(device_id, 0)}
+        for device_id, status in session_limiter.status().items()
+    ]
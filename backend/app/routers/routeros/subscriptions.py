@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from ... import models
+from ...database import get_db
+# Module import: the service itself imports this package's connection helpers
+from ...services import routeros_subscriptions
+
+router = APIRouter(
+    prefix="/subscriptions",
+    tags=["RouterOS Subscriptions"]
+)
+
+
+@router.get("/")
+def list_subscriptions():
+    """Connection and sync state of every live table mirror."""
+    return routeros_subscriptions.subscriptions.status()
+
+
+@router.post("/{device_id}")
+def subscribe_device(
+    device_id: int,
+    paths: Optional[List[str]] = Query(default=None, description="Menu paths to mirror, e.g. /interface. Defaults to ROUTEROS_SUBSCRIPTION_PATHS"),
+    db: Session = Depends(get_db)
+):
+    """
+    Mirror RouterOS tables of a device in memory.
+
+    The tables are listed once and then kept current from the router's
+    `listen` change stream; reads of mirrored tables stop hitting the device.
+    """
+    device = db.query(models.Device).filter(models.Device.id == device_id).first()
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    return routeros_subscriptions.subscriptions.subscribe(device, paths).status()
+
+
+@router.delete("/{device_id}")
+def unsubscribe_device(device_id: int):
+    if not routeros_subscriptions.subscriptions.unsubscribe(device_id):
+        raise HTTPException(status_code=404, detail="Device is not subscribed")
+    return {"status": "success"}
+
+
+@router.get("/{device_id}/table")
+def get_mirrored_table(device_id: int, path: str = Query(..., description="Mirrored menu path, e.g. /ip/address")):
+    """Rows of a mirrored table. 409 while the mirror is resyncing."""
+    rows = routeros_subscriptions.subscriptions.get_rows(device_id, path)
+    if rows is None:
+        raise HTTPException(status_code=409, detail=f"{path} of device {device_id} is not subscribed or not in sync")
+    return rows
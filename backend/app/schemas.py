@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 # Device Schemas
@@ -32,7 +32,7 @@ class ConfigResponse(BaseModel):
 
 class ConfigLogResponse(BaseModel):
     log_id: int
-    device_id: int
+    device_id: Optional[int] = None  # System events (e.g. device deletion) have no device
     timestamp: datetime
     action_type: str
     status: str
@@ -60,3 +60,14 @@ class User(UserBase):
     role: str
     class Config:
         orm_mode = True
+
+# Script Schemas
+class FleetScriptRequest(BaseModel):
+    script_name: str
+    params: Optional[dict] = None  # Template parameters, rendered per device
+    # Device selector: explicit ids, a name pattern with * wildcards, or every device
+    device_ids: Optional[List[int]] = None
+    name: Optional[str] = None
+    all_devices: bool = False
+    concurrency: Optional[int] = None  # Defaults to SCRIPT_FLEET_CONCURRENCY
+    timeout: Optional[float] = None  # Per device, defaults to SCRIPT_JOB_TIMEOUT_SECONDS
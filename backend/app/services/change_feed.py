@@ -0,0 +1,222 @@
+"""
+Cross-worker cache invalidation over PostgreSQL LISTEN/NOTIFY.
+
+Every uvicorn worker (and every replica of the API) keeps its own
+in-process caches. To keep them coherent without a broker, each flush
+through SessionLocal that touches a watched table sends a NOTIFY on
+CHANNEL, naming the table and the keys of the rows that changed (device
+ids, usernames). NOTIFY is transactional: it is delivered on commit and
+dropped on rollback.
+
+Each worker runs one listener thread on a dedicated connection. For
+every notification it bumps the table's local version and calls the
+handlers registered with on_change. Whenever the listener (re)connects,
+as notifications may have been missed, every handler gets a change
+without keys, meaning "anything may have changed".
+
+Handlers receive a dict with "table", "keys" (None for any row),
+"deleted" (keys of deleted rows) and "local" (sent by this worker, whose
+own caches were usually updated already).
+"""
+
+import json
+import os
+import select
+import socket
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from app import config
+from app.database import SessionLocal, engine
+from app.models import ConfigurationLog, Device, InventoryItem, User
+from app.services.pollers import poller_heartbeat
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "networkweaver_changes"
+
+# PostgreSQL rejects payloads of 8000 bytes or more; larger key lists are
+# sent as "any row changed"
+_MAX_PAYLOAD = 7000
+
+# Wake-up interval of the listener, also its heartbeat
+_POLL_SECONDS = 5.0
+
+
+def _user_keys(user: User) -> List:
+    # Old usernames too, so a rename invalidates what was cached under them
+    return [user.username, *inspect(user).attrs.username.history.deleted]
+
+
+# Make a rename load the username being replaced when it is expired (e.g.
+# after a commit); otherwise the old key would be missing from the history
+@event.listens_for(User.username, "set", active_history=True)
+def _keep_previous_username(target, value, oldvalue, initiator):
+    pass
+
+
+# Watched model -> function giving the keys of a changed row (None: versions only)
+WATCHED = {
+    Device: lambda device: [device.id],
+    User: _user_keys,
+    InventoryItem: lambda item: [item.device_id],
+    ConfigurationLog: None,
+}
+
+# Table name -> whether its notifications carry keys
+KEYED_TABLES = {model.__tablename__: keys_of is not None for model, keys_of in WATCHED.items()}
+
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _changes(session: Session) -> Dict[str, Dict[str, set]]:
+    """Keys of the watched rows written by a flush, per table."""
+    changes: Dict[str, Dict[str, set]] = {}
+    # session.dirty builds a new set on every access, so the kind is passed along
+    for objects, dirty, deleted in ((session.new, False, False), (session.dirty, True, False), (session.deleted, False, True)):
+        for obj in objects:
+            keys_of = WATCHED.get(type(obj), False)
+            if keys_of is False:
+                continue
+            if dirty and not session.is_modified(obj):
+                continue
+            change = changes.setdefault(obj.__tablename__, {"keys": set(), "deleted": set()})
+            if keys_of is not None:
+                keys = keys_of(obj)
+                change["keys"].update(keys)
+                if deleted:
+                    change["deleted"].update(keys)
+    return changes
+
+
+def _payload(table: str, keys: Optional[set], deleted: set) -> str:
+    payload = json.dumps({
+        "table": table,
+        "keys": None if keys is None else sorted(keys, key=str),
+        "deleted": [] if keys is None else sorted(deleted, key=str),
+        "origin": ORIGIN,
+    })
+    if keys is not None and len(payload.encode()) > _MAX_PAYLOAD:
+        return _payload(table, None, deleted)
+    return payload
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _notify_flushed_changes(session: Session, flush_context):
+    if not config.CHANGE_NOTIFY_ENABLED:
+        return
+    connection = session.connection()
+    if connection.dialect.name != "postgresql":
+        return
+    for table, change in _changes(session).items():
+        keys = change["keys"] if KEYED_TABLES[table] else None
+        connection.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": CHANNEL, "payload": _payload(table, keys, change["deleted"])},
+        )
+
+
+class ChangeFeed:
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[[Dict], None]]] = defaultdict(list)
+        self._versions: Dict[str, int] = defaultdict(int)
+        self.listening = False
+        self.received = 0
+        self.resyncs = 0
+        self.last_error: Optional[str] = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def on_change(self, table: str, handler: Callable[[Dict], None]):
+        """Call `handler` for every change to `table`, from any worker."""
+        self._handlers[table].append(handler)
+
+    def version(self, table: str) -> int:
+        """Local version of a table, bumped on every change notification."""
+        return self._versions[table]
+
+    def dispatch(self, change: Dict):
+        table = change["table"]
+        self._versions[table] += 1
+        for handler in list(self._handlers.get(table, ())):
+            try:
+                handler(change)
+            except Exception as e:
+                logger.error(f"Change handler for {table} failed: {e}")
+
+    def _resync(self):
+        """Treat every watched table as changed, as notifications may have been lost."""
+        self.resyncs += 1
+        for table in KEYED_TABLES:
+            self.dispatch({"table": table, "keys": None, "deleted": [], "local": False})
+
+    def _listen(self):
+        # A connection of our own for the lifetime of the LISTEN, outside the pool
+        pooled = engine.raw_connection()
+        connection = pooled.driver_connection
+        pooled.detach()
+        try:
+            connection.rollback()  # The pre-ping may have opened a transaction
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            self.listening = True
+            self.last_error = None
+            self._resync()
+            while True:
+                poller_heartbeat("change_feed", _POLL_SECONDS)
+                if select.select([connection], [], [], _POLL_SECONDS) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notification = connection.notifies.pop(0)
+                    self.received += 1
+                    try:
+                        change = json.loads(notification.payload)
+                    except ValueError:
+                        logger.warning(f"Ignoring malformed change notification: {notification.payload!r}")
+                        continue
+                    change["local"] = change.pop("origin", None) == ORIGIN
+                    self.dispatch(change)
+        finally:
+            self.listening = False
+            connection.close()
+
+    def _loop(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Change listener disconnected, reconnecting: {e}")
+                poller_heartbeat("change_feed", _POLL_SECONDS, error=str(e))
+            time.sleep(_POLL_SECONDS)
+
+    def start(self):
+        """Start listening (PostgreSQL with psycopg2 only)."""
+        if not config.CHANGE_NOTIFY_ENABLED:
+            return
+        if engine.dialect.name != "postgresql" or engine.dialect.driver != "psycopg2":
+            logger.info(f"Change notifications are not supported on {engine.dialect.name}+{engine.dialect.driver}")
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="change-feed", daemon=True)
+        self._thread.start()
+
+    def status(self) -> Dict:
+        return {
+            "listening": self.listening,
+            "received": self.received,
+            "resyncs": self.resyncs,
+            "last_error": self.last_error,
+            "versions": dict(self._versions),
+        }
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,191 @@
+"""
+Per-device circuit breakers for RouterOS connections.
+
+get_routeros_connection asks the device's breaker before connecting and
+reports the outcome afterwards. Only failures to reach the device count:
+timeouts and network errors, not rejected credentials.
+
+- closed: connections go ahead. Once the last ROUTEROS_CIRCUIT_WINDOW
+  attempts hold at least ROUTEROS_CIRCUIT_MIN_CALLS failures making up
+  ROUTEROS_CIRCUIT_FAILURE_RATE of them, the breaker opens.
+- open: connections are refused at once with the cached last error,
+  for ROUTEROS_CIRCUIT_OPEN_SECONDS.
+- half_open: one trial connection is let through. Success closes the
+  breaker, failure opens it again.
+
+State is per worker. Breakers of edited or deleted devices are dropped
+(see change_feed.py).
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+from prometheus_client import CollectorRegistry, Counter
+from prometheus_client.core import GaugeMetricFamily
+from app import config
+from app.services.change_feed import change_feed
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_REGISTRY = CollectorRegistry()
+
+REJECTIONS = Counter(
+    "networkweaver_routeros_circuit_rejections_total",
+    "RouterOS connections refused because the device's circuit was open",
+    ["device_id"], registry=BREAKER_REGISTRY,
+)
+TRANSITIONS = Counter(
+    "networkweaver_routeros_circuit_transitions_total",
+    "Circuit breaker state changes, by the state entered",
+    ["device_id", "state"], registry=BREAKER_REGISTRY,
+)
+
+
+class CircuitOpen(Exception):
+    def __init__(self, device_id: int, last_error: Optional[str], retry_after: float):
+        self.device_id = device_id
+        self.last_error = last_error
+        self.retry_after = retry_after
+        super().__init__(f"Circuit open for device {device_id}, retry in {retry_after:.0f}s. Last error: {last_error}")
+
+
+class CircuitBreaker:
+    def __init__(self, device_id: int, window: int, min_calls: int, failure_rate: float, open_seconds: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.device_id = device_id
+        self.clock = clock
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.last_error: Optional[str] = None
+        self.last_failure_at: Optional[float] = None
+        self.opened_at: Optional[float] = None
+        self._outcomes = deque(maxlen=window)  # True for success
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def _enter(self, state: str):
+        self.state = state
+        TRANSITIONS.labels(str(self.device_id), state).inc()
+
+    def before_call(self):
+        """Raise CircuitOpen unless a connection attempt may go ahead."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            remaining = self.opened_at + self.open_seconds - self.clock()
+            if self.state == OPEN and remaining <= 0:
+                self._enter(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+        REJECTIONS.labels(str(self.device_id)).inc()
+        raise CircuitOpen(self.device_id, self.last_error, max(remaining, 1.0))
+
+    def record_success(self):
+        with self._lock:
+            self._trial_running = False
+            if self.state != CLOSED:
+                self._outcomes.clear()
+                self._enter(CLOSED)
+            self._outcomes.append(True)
+
+    def record_failure(self, error: str):
+        with self._lock:
+            self._trial_running = False
+            self.last_error = error
+            self.last_failure_at = time.time()
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            tripped = failures >= self.min_calls and failures >= self.failure_rate * len(self._outcomes)
+            if self.state == HALF_OPEN or (self.state == CLOSED and tripped):
+                self.opened_at = self.clock()
+                self._enter(OPEN)
+
+    def release(self):
+        """End a trial whose outcome says nothing about reachability (e.g. bad credentials)."""
+        with self._lock:
+            self._trial_running = False
+
+    def status(self) -> Dict:
+        with self._lock:
+            retry_after = None
+            if self.state == OPEN:
+                retry_after = round(max(0.0, self.opened_at + self.open_seconds - self.clock()), 1)
+            return {
+                "device_id": self.device_id,
+                "state": self.state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": self._outcomes.count(False),
+                "last_error": self.last_error,
+                "last_failure_at": self.last_failure_at,
+                "retry_after_seconds": retry_after,
+            }
+
+
+class DeviceBreakers:
+    """Registry of breakers, created on a device's first connection."""
+
+    def __init__(self):
+        self._breakers: Dict[int, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, device_id: int) -> CircuitBreaker:
+        breaker = self._breakers.get(device_id)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(device_id, CircuitBreaker(
+                    device_id,
+                    window=config.ROUTEROS_CIRCUIT_WINDOW,
+                    min_calls=config.ROUTEROS_CIRCUIT_MIN_CALLS,
+                    failure_rate=config.ROUTEROS_CIRCUIT_FAILURE_RATE,
+                    open_seconds=config.ROUTEROS_CIRCUIT_OPEN_SECONDS,
+                ))
+        return breaker
+
+    def reset(self, device_id: Optional[int] = None) -> bool:
+        """Forget one device's breaker (or all of them); the next call starts closed."""
+        with self._lock:
+            if device_id is None:
+                self._breakers.clear()
+                return True
+            return self._breakers.pop(device_id, None) is not None
+
+    def status(self):
+        return [breaker.status() for breaker in list(self._breakers.values())]
+
+
+breakers = DeviceBreakers()
+
+
+def _on_devices_changed(change):
+    # A new address or new credentials deserve a fresh start
+    if change["keys"] is None:
+        breakers.reset()
+        return
+    for device_id in change["keys"]:
+        breakers.reset(device_id)
+
+
+change_feed.on_change("devices", _on_devices_changed)
+
+
+class _BreakerStateCollector:
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            "networkweaver_routeros_circuit_state",
+            "Circuit breaker state per device (0 closed, 1 half-open, 2 open)",
+            labels=["device_id"],
+        )
+        for status in breakers.status():
+            gauge.add_metric([str(status["device_id"])], _STATE_VALUES[status["state"]])
+        yield gauge
+
+
+BREAKER_REGISTRY.register(_BreakerStateCollector())
@@ -0,0 +1,149 @@
+"""
+Connection pool instrumentation for the SQLAlchemy engines.
+
+The pool classes below time every checkout (waiting for a free slot,
+opening a connection and the pre-ping), and pool event listeners track
+how long connections are held, checkouts beyond pool_size, timeouts,
+new connections and invalidations. Pool occupancy is read live at scrape
+time. Everything is kept in POOL_REGISTRY and served by /metrics, with
+the engine ("sync" or "async") as a label.
+"""
+
+import time
+from typing import Dict
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+POOL_REGISTRY = CollectorRegistry()
+
+_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+CHECKOUT_SECONDS = Histogram(
+    "networkweaver_db_pool_checkout_seconds",
+    "Time to get a connection from the pool, including waiting for a free slot",
+    ["engine"], buckets=_LATENCY_BUCKETS, registry=POOL_REGISTRY,
+)
+HOLD_SECONDS = Histogram(
+    "networkweaver_db_pool_connection_hold_seconds",
+    "Time a connection stayed checked out",
+    ["engine"], buckets=_LATENCY_BUCKETS, registry=POOL_REGISTRY,
+)
+CHECKOUTS = Counter(
+    "networkweaver_db_pool_checkouts_total", "Connection checkouts", ["engine"], registry=POOL_REGISTRY,
+)
+OVERFLOW_CHECKOUTS = Counter(
+    "networkweaver_db_pool_overflow_checkouts_total",
+    "Checkouts that took the checked-out count above pool_size",
+    ["engine"], registry=POOL_REGISTRY,
+)
+CHECKOUT_TIMEOUTS = Counter(
+    "networkweaver_db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after pool_timeout",
+    ["engine"], registry=POOL_REGISTRY,
+)
+CONNECTIONS_CREATED = Counter(
+    "networkweaver_db_pool_connections_created_total", "New database connections opened", ["engine"], registry=POOL_REGISTRY,
+)
+INVALIDATIONS = Counter(
+    "networkweaver_db_pool_invalidations_total", "Connections invalidated (e.g. failed pre-ping)", ["engine"], registry=POOL_REGISTRY,
+)
+
+
+class _TimedCheckout:
+    """Times Pool.connect(); there is no pool event before a checkout starts."""
+
+    def connect(self):
+        label = self.logging_name or "default"
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            CHECKOUT_TIMEOUTS.labels(label).inc()
+            raise
+        finally:
+            CHECKOUT_SECONDS.labels(label).observe(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine, label: str):
+    """
+    Attach the pool listeners to an engine (sync, or the sync_engine of an
+    async engine) whose pool was created with pool_logging_name=label.
+    """
+    pool = engine.pool
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, record, proxy):
+        record.info["checked_out_at"] = time.perf_counter()
+        CHECKOUTS.labels(label).inc()
+        size = getattr(pool, "size", None)
+        if size is not None and pool.checkedout() > size():
+            OVERFLOW_CHECKOUTS.labels(label).inc()
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, record):
+        checked_out_at = record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            HOLD_SECONDS.labels(label).observe(time.perf_counter() - checked_out_at)
+
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_connection, record):
+        CONNECTIONS_CREATED.labels(label).inc()
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_connection, record, exception):
+        INVALIDATIONS.labels(label).inc()
+
+    _engines[label] = engine
+
+
+# label -> engine; the pool is looked up at scrape time as dispose() replaces it
+_engines: Dict[str, object] = {}
+
+
+def pool_status() -> Dict[str, Dict]:
+    """Live occupancy of each instrumented pool."""
+    status = {}
+    for label, engine in _engines.items():
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        status[label] = {
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+        }
+    return status
+
+
+class _PoolStateCollector:
+    _GAUGES = {
+        "size": "Configured pool_size",
+        "in_use": "Connections currently checked out",
+        "idle": "Connections idle in the pool",
+        "overflow": "Connections open beyond pool_size",
+    }
+
+    def collect(self):
+        status = pool_status()
+        for key, documentation in self._GAUGES.items():
+            gauge = GaugeMetricFamily(f"networkweaver_db_pool_{key}", documentation, labels=["engine"])
+            for label, values in status.items():
+                gauge.add_metric([label], values[key])
+            yield gauge
+
+
+POOL_REGISTRY.register(_PoolStateCollector())
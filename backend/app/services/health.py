@@ -0,0 +1,134 @@
+"""
+Cached dependency health for the /health endpoints.
+
+A background thread probes the dependencies every HEALTH_REFRESH_SECONDS
+and keeps the latest result; probe requests only read it, so orchestrator
+traffic never opens database connections itself. Checked, and required
+for readiness:
+
+- database: SELECT 1 through the pool, once startup got that far
+- targets_dir: the Prometheus targets directory is writable
+
+Reported only, as degraded in /health: the API keeps serving requests
+without them, so they must not take it out of rotation.
+
+- pollers: each background loop reported a run recently (see pollers.py);
+  a slow inventory run or a hung router only delays background data
+- replica: reads fall back to the primary without it
+- log_partitions: configuration_logs is partitioned; retention is off
+  until it is migrated
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import text
+from app import config
+from app.database import engine
+from app.services.log_partitions import maintenance_status
+from app.services.pollers import poller_status
+from app.services.prometheus_sync import TARGETS_DIR
+from app.services.replica import replica_guard
+from app.services.startup import startup
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _check_database() -> Dict:
+    if startup.summary()["stages"]["database"]["status"] != "ok":
+        return {"ok": False, "error": "waiting for startup"}
+    started = time.monotonic()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return {"ok": True, "latency_ms": round((time.monotonic() - started) * 1000, 2)}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
+def _check_targets_dir() -> Dict:
+    directory = TARGETS_DIR if TARGETS_DIR.exists() else TARGETS_DIR.parent
+    if os.access(directory, os.W_OK):
+        return {"ok": True, "path": str(TARGETS_DIR)}
+    return {"ok": False, "path": str(TARGETS_DIR), "error": "not writable"}
+
+
+def _check_replica() -> Dict:
+    return {"ok": True, **replica_guard.status()}
+
+
+def _check_log_partitions() -> Dict:
+    status = maintenance_status()
+    check = {"ok": "warning" not in status, "partitioned": status.get("partitioned"), "last_run": status.get("ran_at")}
+    if "warning" in status:
+        check["warning"] = status["warning"]
+    return check
+
+
+def _check_pollers() -> Dict:
+    pollers = poller_status(grace_seconds=config.HEALTH_REFRESH_SECONDS)
+    return {"ok": all(values["fresh"] for values in pollers.values()), "pollers": pollers}
+
+
+# Checks that decide readiness; the others are informational
+READINESS_CHECKS = ("database", "targets_dir")
+
+
+class HealthMonitor:
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._status: Optional[Dict] = None
+        self._checked_at = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        checks = {
+            "database": _check_database(),
+            "targets_dir": _check_targets_dir(),
+            "pollers": _check_pollers(),
+            "replica": _check_replica(),
+            "log_partitions": _check_log_partitions(),
+        }
+        readiness = startup.summary()
+        self._status = {
+            "ready": readiness["ready"] and all(checks[name]["ok"] for name in READINESS_CHECKS),
+            "degraded": sorted(name for name, check in checks.items() if not check["ok"] and name not in READINESS_CHECKS),
+            "startup": readiness,
+            "checks": checks,
+            "checked_at": datetime.utcnow(),
+        }
+        self._checked_at = time.monotonic()
+
+    def _loop(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Health refresh failed: {e}")
+            # Follow startup closely so readiness is reported soon after it completes
+            time.sleep(self.interval_seconds if startup.ready else min(1.0, self.interval_seconds))
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def status(self) -> Dict:
+        """The latest cached status. Not ready if it is missing or too old."""
+        self.start()
+        status = self._status
+        if status is None:
+            return {"ready": False, "error": "no health check has completed yet"}
+        age = time.monotonic() - self._checked_at
+        if age > 3 * self.interval_seconds:
+            return {**status, "ready": False, "error": f"health status is {age:.0f}s old"}
+        return {**status, "age_seconds": round(age, 1)}
+
+
+health_monitor = HealthMonitor(config.HEALTH_REFRESH_SECONDS)
@@ -0,0 +1,257 @@
+"""
+Fleet inventory: periodic snapshots of every device's tables in the database.
+
+The collector reads the INVENTORY_KINDS tables of each device and diffs them
+against the stored rows by checksum, so only added, changed and vanished
+items are written. Cross-fleet questions ("which routers have ether5 down",
+"which devices have a pool named X") are then one indexed SQL query.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app import config
+from app.database import SessionLocal
+from app.models import Device, InventoryItem, InventoryCollection
+from app.routers.routeros.resources import fetch_resources
+from app.services.pollers import poller_heartbeat
+from app.services.prefix_index import fleet_prefixes
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Resource kinds (see RESOURCE_KINDS) snapshotted for each device, with the
+# fields that identify an item within its device
+INVENTORY_KINDS = {
+    "interfaces": ("name",),
+    "bridges": ("name",),
+    "vlans": ("name",),
+    "ips": ("address", "interface"),
+    "pools": ("name",),
+    "services": ("name",),
+    "routes": ("dst_address", "gateway", "routing_table"),
+}
+
+# Indexed InventoryItem columns filled from the item's fields
+INDEXED_COLUMNS = ("name", "interface", "address", "running", "disabled")
+
+# Fields stored in an indexed column of a different name, per kind
+COLUMN_SOURCES = {
+    "routes": {"address": "dst_address"},
+}
+
+
+def item_key(kind: str, row: Dict) -> str:
+    return "|".join(str(row.get(field) or "") for field in INVENTORY_KINDS[kind])
+
+
+def _checksum(row: Dict) -> str:
+    return hashlib.sha1(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def store_device_inventory(db: Session, device_id: int, tables: Dict[str, List[Dict]]) -> Dict[str, int]:
+    """
+    Bring the stored inventory of a device in line with freshly read tables.
+
+    Only items whose checksum changed are updated; new items are inserted and
+    items no longer on the device are deleted. Does not commit.
+    """
+    seen: Dict[Tuple[str, str], Dict] = {}
+    for kind, rows in tables.items():
+        for row in rows:
+            seen[(kind, item_key(kind, row))] = row
+
+    stored = {
+        (item.kind, item.key): item
+        for item in db.query(InventoryItem).filter(
+            InventoryItem.device_id == device_id,
+            InventoryItem.kind.in_(list(tables))
+        )
+    }
+
+    now = datetime.utcnow()
+    counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    for (kind, key), row in seen.items():
+        checksum = _checksum(row)
+        item = stored.pop((kind, key), None)
+        if item is not None and item.checksum == checksum:
+            counts["unchanged"] += 1
+            continue
+        if item is None:
+            item = InventoryItem(device_id=device_id, kind=kind, key=key, first_seen=now)
+            db.add(item)
+            counts["inserted"] += 1
+        else:
+            counts["updated"] += 1
+        # "interface" is the owning interface for addresses and the parent for VLANs
+        sources = COLUMN_SOURCES.get(kind, {})
+        for column in INDEXED_COLUMNS:
+            setattr(item, column, row.get(sources.get(column, column)))
+        item.attributes = row
+        item.checksum = checksum
+        item.last_changed = now
+
+    for item in stored.values():
+        db.delete(item)
+        counts["deleted"] += 1
+
+    return counts
+
+
+def _record_collection(db: Session, device_id: int, status: str, error: Optional[str] = None, items: int = 0, changed: int = 0):
+    collection = db.get(InventoryCollection, device_id)
+    if collection is None:
+        collection = InventoryCollection(device_id=device_id)
+        db.add(collection)
+    collection.collected_at = datetime.utcnow()
+    collection.status = status
+    collection.error = error
+    if status == "success":
+        collection.items = items
+        collection.changed = changed
+
+
+def collect_inventory(device_ids: Optional[List[int]] = None) -> Dict[int, Dict]:
+    """
+    Snapshot the inventory of all (or the given) devices.
+
+    Devices are read in parallel on up to INVENTORY_COLLECT_WORKERS threads;
+    the database writes happen here, one transaction per device. Devices
+    whose rows changed are then re-indexed in the fleet prefix index. Returns
+    the per-device change counts, or the error for devices that could not be
+    read.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(Device)
+        if device_ids:
+            query = query.filter(Device.id.in_(device_ids))
+        devices = query.all()
+        for device in devices:
+            db.expunge(device)
+    finally:
+        db.close()
+
+    def read(device: Device):
+        try:
+            return fetch_resources(device, list(INVENTORY_KINDS)), None
+        except Exception as e:
+            return None, str(e)
+
+    results = {}
+    if not devices:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, config.INVENTORY_COLLECT_WORKERS)) as pool:
+        for device, (tables, error) in zip(devices, pool.map(read, devices)):
+            db = SessionLocal()
+            try:
+                if error is not None:
+                    logger.warning(f"Inventory collection from {device.name} failed: {error}")
+                    _record_collection(db, device.id, "error", error=error)
+                    results[device.id] = {"status": "error", "error": error}
+                else:
+                    counts = store_device_inventory(db, device.id, tables)
+                    changed = counts["inserted"] + counts["updated"] + counts["deleted"]
+                    items = counts["inserted"] + counts["updated"] + counts["unchanged"]
+                    _record_collection(db, device.id, "success", items=items, changed=changed)
+                    results[device.id] = {"status": "success", **counts}
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Storing inventory of {device.name} failed: {e}")
+                results[device.id] = {"status": "error", "error": str(e)}
+            finally:
+                db.close()
+
+    changed_ids = [
+        device_id for device_id, result in results.items()
+        if result["status"] == "success" and (result["inserted"] or result["updated"] or result["deleted"])
+    ]
+    db = SessionLocal()
+    try:
+        fleet_prefixes.refresh_devices(db, changed_ids)
+        if not device_ids:
+            fleet_prefixes.retain_devices(d.id for d in devices)
+    finally:
+        db.close()
+
+    return results
+
+
+def query_inventory(
+    db: Session,
+    kind: Optional[str] = None,
+    device_id: Optional[int] = None,
+    name: Optional[str] = None,
+    interface: Optional[str] = None,
+    address: Optional[str] = None,
+    running: Optional[bool] = None,
+    disabled: Optional[bool] = None,
+    limit: int = 1000,
+):
+    """
+    Filter the stored inventory across all devices in a single query.
+
+    `name`, `interface` and `address` match exactly, or as a pattern when
+    they contain `*` (e.g. name=ether*).
+    """
+    query = db.query(InventoryItem, Device.name).join(Device, Device.id == InventoryItem.device_id)
+    if kind:
+        query = query.filter(InventoryItem.kind == kind)
+    if device_id is not None:
+        query = query.filter(InventoryItem.device_id == device_id)
+    for column, value in (
+        (InventoryItem.name, name),
+        (InventoryItem.interface, interface),
+        (InventoryItem.address, address),
+    ):
+        if value is None:
+            continue
+        if "*" in value:
+            query = query.filter(column.like(value.replace("%", r"\%").replace("_", r"\_").replace("*", "%"), escape="\\"))
+        else:
+            query = query.filter(column == value)
+    if running is not None:
+        query = query.filter(InventoryItem.running == running)
+    if disabled is not None:
+        query = query.filter(InventoryItem.disabled == disabled)
+
+    query = query.order_by(InventoryItem.device_id, InventoryItem.kind, InventoryItem.key).limit(limit)
+    return [
+        {
+            "device_id": item.device_id,
+            "device": device_name,
+            "kind": item.kind,
+            **item.attributes,
+            "last_changed": item.last_changed,
+        }
+        for item, device_name in query
+    ]
+
+
+def _collector_loop(interval_seconds: int):
+    while True:
+        error = None
+        try:
+            collect_inventory()
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Inventory collection failed: {e}")
+        poller_heartbeat("inventory", interval_seconds, error)
+        time.sleep(interval_seconds)
+
+
+def start_inventory_collector(interval_seconds: int = config.INVENTORY_INTERVAL_SECONDS) -> Optional[threading.Thread]:
+    """Collect the fleet inventory now and then every `interval_seconds` in a daemon thread."""
+    if interval_seconds <= 0:
+        return None
+    thread = threading.Thread(target=_collector_loop, args=(interval_seconds,), name="inventory-collector", daemon=True)
+    thread.start()
+    return thread
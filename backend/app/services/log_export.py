@@ -0,0 +1,137 @@
+"""
+Streaming export of configuration logs.
+
+Rows are read through a server-side cursor in fixed-size batches and encoded
+chunk by chunk, so memory stays flat no matter how large the export is.
+"""
+
+import csv
+import io
+import itertools
+import json
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+from app.database import SessionLocal
+from app.models import ConfigurationLog, Device
+from app.services.log_queries import filter_logs, status_to_level
+from app.services.replica import read_session_factory
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = ["log_id", "timestamp", "device_id", "device_name", "action_type", "status", "level", "details"]
+EXPORT_FORMATS = ("ndjson", "csv")
+
+
+def export_row(row) -> Dict:
+    """Flatten a log row for export. Unlike the Logs page, keeps the raw status."""
+    return {
+        "log_id": row.log_id,
+        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+        "device_id": row.device_id,
+        "device_name": row.device_name,
+        "action_type": row.action_type,
+        "status": row.status,
+        "level": status_to_level(row.status),
+        "details": row.details,
+    }
+
+
+def iter_log_batches(
+    device_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    replica: bool = False,
+) -> Iterator[List[Dict]]:
+    """
+    Yield exported log rows oldest-first in batches of `batch_size`.
+
+    Uses its own session because the response body is produced after the
+    request-scoped session has been released. With `replica`, reads from the
+    replica when it is within the lag bound.
+    """
+    db = read_session_factory()() if replica else SessionLocal()
+    try:
+        # Plain column rows: no ORM identity map growing with the export
+        query = (
+            db.query(
+                ConfigurationLog.log_id,
+                ConfigurationLog.timestamp,
+                ConfigurationLog.device_id,
+                Device.name.label("device_name"),
+                ConfigurationLog.action_type,
+                ConfigurationLog.status,
+                ConfigurationLog.details,
+            )
+            .outerjoin(Device, ConfigurationLog.device_id == Device.id)
+            .execution_options(stream_results=True, yield_per=batch_size)
+        )
+        query = filter_logs(query, device_id=device_id, since=since, until=until)
+        query = query.order_by(ConfigurationLog.timestamp.asc(), ConfigurationLog.log_id.asc())
+
+        batch = []
+        for row in query:
+            batch.append(export_row(row))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        db.close()
+
+
+def encode_ndjson(batches: Iterable[List[Dict]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(json.dumps(row, default=str) + "\n" for row in batch).encode("utf-8")
+
+
+def encode_csv(batches: Iterable[List[Dict]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a byte stream on the fly into a single gzip member."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_logs(
+    fmt: str,
+    compress: bool = False,
+    device_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    include_archived: bool = True,
+) -> Iterator[bytes]:
+    """
+    Build the byte stream for an export in the requested format.
+
+    Archived months (see log_partitions) are older than anything still in the
+    database, so they are streamed first to keep the output oldest-first.
+    """
+    # Imported here: log_partitions builds its archives on top of this module
+    from app.services.log_partitions import iter_archived_batches
+
+    batches = iter_log_batches(device_id=device_id, since=since, until=until, replica=True)
+    if include_archived:
+        archived = iter_archived_batches(device_id=device_id, since=since, until=until)
+        batches = itertools.chain(archived, batches)
+    chunks = encode_csv(batches) if fmt == "csv" else encode_ndjson(batches)
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,408 @@
+"""
+Monthly partitioning, retention and archival for configuration_logs.
+
+On PostgreSQL configuration_logs is range-partitioned by timestamp into one
+partition per month plus a default partition. Retention detaches each
+expired month, archives the detached table to a gzipped NDJSON file and
+drops it, all in one transaction, so removing a month costs the same
+regardless of how many rows it holds and no row is dropped unarchived.
+Expired rows that landed in the default partition (e.g. backdated ones)
+are archived and deleted the same way.
+
+Deployments whose configuration_logs predates partitioning keep a plain
+table, and retention stays off until it is converted once with
+`python migrate_log_partitions.py` (see migrate_to_partitioned).
+"""
+
+import gzip
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from app import config
+from app.database import engine
+from app.models import ConfigurationLog
+from app.services.log_export import EXPORT_BATCH_SIZE, export_row
+from app.services.pollers import poller_heartbeat
+import logging
+
+logger = logging.getLogger(__name__)
+
+LOG_TABLE = "configuration_logs"
+DEFAULT_PARTITION = f"{LOG_TABLE}_default"
+PARTITION_NAME_RE = re.compile(rf"^{LOG_TABLE}_p(\d{{4}})_(\d{{2}})$")
+ARCHIVE_DIR = Path(config.LOG_ARCHIVE_DIR)
+# Monthly partitions archive to <partition>.ndjson.gz, expired rows of the
+# default partition to <partition>_default_<unix time>.ndjson.gz
+ARCHIVE_NAME_RE = re.compile(rf"^{LOG_TABLE}_p(\d{{4}})_(\d{{2}})(?:_default_\d+)?\.ndjson\.gz$")
+LEGACY_TABLE = f"{LOG_TABLE}_unpartitioned"
+
+# Outcome of the latest maintenance run, for /health
+_last_maintenance: Dict = {}
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + (month.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{LOG_TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def archive_path(month: datetime) -> Path:
+    return ARCHIVE_DIR / f"{partition_name(month)}.ndjson.gz"
+
+
+def default_archive_path(month: datetime, stamp: int) -> Path:
+    return ARCHIVE_DIR / f"{partition_name(month)}_default_{stamp}.ndjson.gz"
+
+
+def retention_cutoff(retention_months: int, now: Optional[datetime] = None) -> datetime:
+    """Oldest timestamp kept: the first day of the month `retention_months` ago."""
+    return add_months(month_start(now or datetime.utcnow()), -retention_months)
+
+
+def expired_months(months: List[datetime], cutoff: datetime) -> List[datetime]:
+    """Months whose whole range ends on or before `cutoff`."""
+    return [month for month in months if add_months(month, 1) <= cutoff]
+
+
+def is_partitioned(conn) -> bool:
+    """True when configuration_logs exists as a partitioned table (PostgreSQL only)."""
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table)"
+    ), {"table": LOG_TABLE}).scalar())
+
+
+def list_partitions(conn) -> List[datetime]:
+    """Months that currently have a live partition, oldest first."""
+    if not is_partitioned(conn):
+        return []
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :table"
+    ), {"table": LOG_TABLE}).scalars()
+
+    months = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            months.append(datetime(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def list_archives() -> List[Tuple[datetime, Path]]:
+    """Archived months and their files, oldest first."""
+    if not ARCHIVE_DIR.exists():
+        return []
+    archives = []
+    for path in ARCHIVE_DIR.iterdir():
+        match = ARCHIVE_NAME_RE.match(path.name)
+        if match:
+            archives.append((datetime(int(match.group(1)), int(match.group(2)), 1), path))
+    return sorted(archives)
+
+
+def iter_archived_batches(
+    device_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[List[Dict]]:
+    """
+    Yield archived log rows oldest-first, in the same shape as the live export.
+
+    Months that still have a live partition are skipped; the database copy is
+    authoritative until the partition has been dropped.
+    """
+    with engine.connect() as conn:
+        live_months = set(list_partitions(conn))
+
+    for month, path in list_archives():
+        if month in live_months:
+            continue
+        if until is not None and month >= until:
+            continue
+        if since is not None and add_months(month, 1) <= since:
+            continue
+
+        batch = []
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if device_id is not None and row.get("device_id") != device_id:
+                    continue
+                if since is not None or until is not None:
+                    ts = datetime.fromisoformat(row["timestamp"]) if row.get("timestamp") else None
+                    if ts is None or (since is not None and ts < since) or (until is not None and ts >= until):
+                        continue
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+
+def create_partition(conn, month: datetime):
+    """
+    Create the partition for one month.
+
+    PostgreSQL refuses to add a partition while the default partition holds
+    rows in its range, so such rows are moved into the new partition while the
+    default partition is briefly detached. Concurrent writers wait on the lock.
+    """
+    name = partition_name(month)
+    bounds = {"start": month, "end": add_months(month, 1)}
+    values = f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+
+    stranded = conn.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end)"
+    ), bounds).scalar()
+
+    if not stranded:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {LOG_TABLE} {values}"))
+        return
+
+    conn.execute(text(f"ALTER TABLE {LOG_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+    conn.execute(text(f"CREATE TABLE {name} PARTITION OF {LOG_TABLE} {values}"))
+    conn.execute(text(
+        f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end"
+    ), bounds)
+    conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end"), bounds)
+    conn.execute(text(f"ALTER TABLE {LOG_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    logger.info(f"Moved rows for {name} out of the default partition")
+
+
+def ensure_partitions(months_ahead: int = config.LOG_PARTITION_MONTHS_AHEAD, now: Optional[datetime] = None) -> List[str]:
+    """
+    Create the default partition and monthly partitions from the current month
+    up to `months_ahead` months in the future.
+
+    Returns:
+        Names of partitions created by this call
+    """
+    created = []
+    current = month_start(now or datetime.utcnow())
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            if conn.dialect.name == "postgresql":
+                logger.warning(
+                    f"{LOG_TABLE} is not partitioned, so log retention is off; "
+                    "convert it with `python migrate_log_partitions.py`"
+                )
+            return created
+
+        existing = set(list_partitions(conn))
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {LOG_TABLE} DEFAULT"))
+
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if month in existing:
+                continue
+            create_partition(conn, month)
+            created.append(partition_name(month))
+
+    if created:
+        logger.info(f"Created log partitions: {', '.join(created)}")
+    return created
+
+
+def migrate_to_partitioned(months_ahead: int = config.LOG_PARTITION_MONTHS_AHEAD, now: Optional[datetime] = None) -> Dict:
+    """
+    Convert a plain configuration_logs table (created before partitioning)
+    into the partitioned layout, in one transaction.
+
+    The old table is renamed aside, the partitioned table is created with
+    partitions for every month it holds, the rows are copied over and the
+    old table is dropped. Log writes wait on the table lock meanwhile, so
+    run it in a quiet period. Does nothing if the table is partitioned.
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name != "postgresql":
+            raise RuntimeError(f"Log partitioning needs PostgreSQL, not {conn.dialect.name}")
+        if is_partitioned(conn):
+            return {"migrated": False, "rows": 0, "partitions": []}
+
+        conn.execute(text(f"LOCK TABLE {LOG_TABLE} IN ACCESS EXCLUSIVE MODE"))
+        conn.execute(text(f"ALTER TABLE {LOG_TABLE} RENAME TO {LEGACY_TABLE}"))
+        # Free the index and sequence names for the new table
+        indexes = conn.execute(
+            text("SELECT indexname FROM pg_indexes WHERE tablename = :table"), {"table": LEGACY_TABLE}
+        ).scalars().all()
+        for index in indexes:
+            conn.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index[:48]}_unpartitioned"'))
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'log_id')"), {"table": LEGACY_TABLE}).scalar()
+        if sequence:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {LEGACY_TABLE}_log_id_seq"))
+
+        # Also creates the default partition (see models.py)
+        ConfigurationLog.__table__.create(conn)
+
+        oldest = conn.execute(text(f"SELECT MIN(timestamp) FROM {LEGACY_TABLE}")).scalar()
+        current = month_start(now or datetime.utcnow())
+        month = min(month_start(oldest), current) if oldest else current
+        partitions = []
+        while month <= add_months(current, months_ahead):
+            create_partition(conn, month)
+            partitions.append(partition_name(month))
+            month = add_months(month, 1)
+
+        # The new primary key includes timestamp, which the old table allowed to be NULL
+        rows = conn.execute(text(
+            f"INSERT INTO {LOG_TABLE} (log_id, device_id, timestamp, action_type, status, details) "
+            f"SELECT log_id, device_id, COALESCE(timestamp, now() AT TIME ZONE 'utc'), action_type, status, details "
+            f"FROM {LEGACY_TABLE}"
+        )).rowcount
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{LOG_TABLE}', 'log_id'), COALESCE(MAX(log_id), 1), MAX(log_id) IS NOT NULL) "
+            f"FROM {LOG_TABLE}"
+        ))
+        conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+
+    logger.info(f"Migrated {rows} log rows into {len(partitions)} monthly partitions")
+    return {"migrated": True, "rows": rows, "partitions": partitions}
+
+
+def _write_archives(conn, table: str, path_for, where: str = "", params: Optional[Dict] = None) -> List[Tuple[Path, Path]]:
+    """
+    Stream the rows of `table` into one gzipped NDJSON file per month, in
+    the export format, under temporary names.
+
+    Returns:
+        (temporary path, final path) pairs, to be renamed into place once the
+        rows are gone from the database
+    """
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    files = {}
+    paths = []
+    try:
+        rows = conn.execute(text(
+            f"SELECT l.log_id, l.timestamp, l.device_id, d.name AS device_name, l.action_type, l.status, l.details "
+            f"FROM {table} l LEFT JOIN devices d ON d.id = l.device_id {where} ORDER BY l.timestamp, l.log_id"
+        ).execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE), params or {})
+        for row in rows:
+            month = month_start(row.timestamp)
+            f = files.get(month)
+            if f is None:
+                path = path_for(month)
+                temp_path = path.with_suffix(".tmp")
+                paths.append((temp_path, path))
+                f = files[month] = gzip.open(temp_path, "wt", encoding="utf-8")
+            f.write(json.dumps(export_row(row), default=str) + "\n")
+    except BaseException:
+        for f in files.values():
+            f.close()
+        for temp_path, _ in paths:
+            temp_path.unlink(missing_ok=True)
+        raise
+    for f in files.values():
+        f.close()
+    return paths
+
+
+def _publish_archives(paths: List[Tuple[Path, Path]]) -> List[str]:
+    # Renamed into place only now, so a half-written archive is never picked up by the export API
+    for temp_path, path in paths:
+        temp_path.replace(path)
+    return [str(path) for _, path in paths]
+
+
+def apply_retention(retention_months: int = config.LOG_RETENTION_MONTHS, now: Optional[datetime] = None) -> Dict:
+    """
+    Archive and remove every log row older than the retention window.
+
+    Monthly partitions whose whole range ends on or before the first day of
+    the month `retention_months` ago are detached, archived from the
+    detached table and dropped in one transaction, so rows written to them
+    meanwhile are never lost. Older rows in the default partition are
+    archived and deleted under a write lock on it. A retention of 0 keeps
+    everything.
+    """
+    result = {"archived": [], "dropped": [], "default_rows_expired": 0}
+    if retention_months <= 0:
+        return result
+
+    cutoff = retention_cutoff(retention_months, now)
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return result
+        expired = expired_months(list_partitions(conn), cutoff)
+
+    for month in expired:
+        name = partition_name(month)
+        with engine.begin() as conn:
+            # Detached first: no more rows can reach it, so the archive holds every row dropped
+            conn.execute(text(f"ALTER TABLE {LOG_TABLE} DETACH PARTITION {name}"))
+            archives = _write_archives(conn, name, archive_path)
+            conn.execute(text(f"DROP TABLE {name}"))
+            result["archived"].extend(_publish_archives(archives))
+        result["dropped"].append(name)
+        logger.info(f"Log retention: archived and dropped {name}")
+
+    stamp = int(time.time())
+    with engine.begin() as conn:
+        conn.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN EXCLUSIVE MODE"))
+        archives = _write_archives(
+            conn, DEFAULT_PARTITION, lambda month: default_archive_path(month, stamp),
+            "WHERE l.timestamp < :cutoff", {"cutoff": cutoff},
+        )
+        if archives:
+            result["default_rows_expired"] = conn.execute(
+                text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff"), {"cutoff": cutoff}
+            ).rowcount
+            result["archived"].extend(_publish_archives(archives))
+            logger.info(f"Log retention: archived and deleted {result['default_rows_expired']} rows from {DEFAULT_PARTITION}")
+
+    return result
+
+
+def run_log_maintenance() -> Dict:
+    """Create upcoming partitions, then expire old ones."""
+    with engine.connect() as conn:
+        partitioned = is_partitioned(conn)
+    created = ensure_partitions()
+    retention = apply_retention()
+    result = {"partitioned": partitioned, "created": created, **retention}
+    if not partitioned and engine.dialect.name == "postgresql":
+        result["warning"] = f"{LOG_TABLE} is not partitioned, so retention is off. Run `python migrate_log_partitions.py`."
+    _last_maintenance.clear()
+    _last_maintenance.update(result, ran_at=datetime.utcnow())
+    return result
+
+
+def maintenance_status() -> Dict:
+    """The outcome of the latest maintenance run (empty before the first)."""
+    return dict(_last_maintenance)
+
+
+def _maintenance_loop(interval_seconds: int):
+    while True:
+        error = None
+        try:
+            run_log_maintenance()
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Log maintenance failed: {e}")
+        poller_heartbeat("log_maintenance", interval_seconds, error)
+        time.sleep(interval_seconds)
+
+
+def start_log_maintenance(interval_seconds: int = config.LOG_MAINTENANCE_INTERVAL_SECONDS) -> threading.Thread:
+    """Run log maintenance now and then every `interval_seconds` in a daemon thread."""
+    thread = threading.Thread(target=_maintenance_loop, args=(interval_seconds,), name="log-maintenance", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,110 @@
+from datetime import datetime
+from typing import Optional, Tuple, Union
+from fastapi import HTTPException
+from sqlalchemy import Select, func, not_, or_, tuple_
+from sqlalchemy.orm import Query
+from app.models import ConfigurationLog
+
+# Frontend log levels and the database statuses they map to
+LOG_LEVELS = ("success", "error", "warning", "info")
+
+
+def status_to_level(status: Optional[str]) -> str:
+    """Map a stored log status (Success, Failed, ...) to a frontend level."""
+    status_lower = status.lower() if status else "info"
+
+    if status_lower == "success":
+        return "success"
+    if status_lower in ("failed", "error"):
+        return "error"
+    if "warning" in status_lower:
+        return "warning"
+    return "info"
+
+
+def level_condition(level: str):
+    """SQL condition equivalent to status_to_level(status) == level."""
+    status_lower = func.lower(ConfigurationLog.status)
+    is_success = status_lower == "success"
+    is_error = status_lower.in_(["failed", "error"])
+    is_warning = status_lower.like("%warning%")
+
+    if level == "success":
+        return is_success
+    if level == "error":
+        return is_error
+    if level == "warning":
+        return is_warning
+    if level == "info":
+        return or_(ConfigurationLog.status.is_(None), not_(or_(is_success, is_error, is_warning)))
+    raise HTTPException(status_code=400, detail=f"Unknown log level '{level}'. Expected one of: {', '.join(LOG_LEVELS)}")
+
+
+def encode_cursor(timestamp: datetime, log_id: int) -> str:
+    """Build the opaque `before` cursor for the row a page ended on."""
+    return f"{timestamp.isoformat()},{log_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Parse a `<timestamp>,<log_id>` cursor.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    try:
+        ts_str, id_str = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(ts_str), int(id_str)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor '{cursor}'. Expected '<timestamp>,<log_id>'")
+
+
+def filter_logs(
+    query: Union[Query, Select],
+    device_id: Optional[int] = None,
+    level: Optional[str] = None,
+    action_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Union[Query, Select]:
+    """Apply the common server-side log filters to a ConfigurationLog query or select()."""
+    if device_id is not None:
+        query = query.filter(ConfigurationLog.device_id == device_id)
+    if level:
+        query = query.filter(level_condition(level.lower()))
+    if action_type:
+        query = query.filter(ConfigurationLog.action_type == action_type)
+    if since is not None:
+        query = query.filter(ConfigurationLog.timestamp >= since)
+    if until is not None:
+        query = query.filter(ConfigurationLog.timestamp < until)
+    return query
+
+
+def paginate_logs(query: Union[Query, Select], before: Optional[str], limit: int) -> Union[Query, Select]:
+    """
+    Keyset-paginate a ConfigurationLog query newest-first.
+
+    Rows are ordered by (timestamp, log_id) descending so the log_id breaks
+    ties between rows written in the same microsecond. Seeking past the cursor
+    keeps every page an index range scan regardless of how deep it is.
+    """
+    if before:
+        cursor_ts, cursor_id = decode_cursor(before)
+        query = query.filter(
+            tuple_(ConfigurationLog.timestamp, ConfigurationLog.log_id) < tuple_(cursor_ts, cursor_id)
+        )
+    return query.order_by(ConfigurationLog.timestamp.desc(), ConfigurationLog.log_id.desc()).limit(limit)
+
+
+def serialize_log(log: ConfigurationLog, device_name: Optional[str]) -> dict:
+    """Shape a log row the way the Logs page expects it."""
+    return {
+        "id": log.log_id,
+        "timestamp": log.timestamp.isoformat() if log.timestamp else None,
+        "level": status_to_level(log.status),
+        "device": device_name or "System",
+        "device_id": log.device_id,
+        "action": log.action_type,
+        "message": log.details
+    }
@@ -0,0 +1,230 @@
+"""
+Hourly rollups of configuration log counts.
+
+Every flush that inserts or re-classifies ConfigurationLog rows upserts the
+matching (hour, device_id, action_type, status) counters in the same
+transaction, so stats for any window are read from a few rollup rows plus
+the partial hours at its edges instead of scanning the raw log table.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import and_, event, func, inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import ConfigurationLog, ConfigurationLogRollup
+from app.services.log_queries import filter_logs
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Log attributes that decide which rollup bucket a row is counted in
+BUCKET_FIELDS = ("timestamp", "device_id", "action_type", "status")
+
+BucketKey = Tuple[datetime, Optional[int], Optional[str], Optional[str]]
+
+
+def hour_floor(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def hour_ceil(ts: datetime) -> datetime:
+    floor = hour_floor(ts)
+    return floor if floor == ts else floor + timedelta(hours=1)
+
+
+def _bucket(timestamp, device_id, action_type, status) -> BucketKey:
+    return (hour_floor(timestamp or datetime.utcnow()), device_id, action_type, status)
+
+
+def _previous_value(state, field):
+    history = state.attrs[field].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return state.dict.get(field)
+
+
+def apply_rollup_deltas(conn, deltas: Dict[BucketKey, int]):
+    """Add count deltas to their hourly buckets, with a single upsert where the database has one."""
+    rows = [
+        {"hour": hour, "device_id": device_id, "action_type": action_type, "status": status, "count": count}
+        for (hour, device_id, action_type, status), count in deltas.items()
+    ]
+    table = ConfigurationLogRollup.__table__
+
+    if conn.dialect.name == "postgresql":
+        stmt = pg_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_configuration_log_rollups_bucket",
+            set_={"count": table.c.count + stmt.excluded.count}
+        )
+    elif conn.dialect.name == "sqlite":
+        # SQLite treats NULL device_ids as distinct, so system events may get
+        # several rows per bucket. Readers always SUM, so that is harmless.
+        stmt = sqlite_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["hour", "device_id", "action_type", "status"],
+            set_={"count": table.c.count + stmt.excluded.count}
+        )
+    else:
+        _apply_rollup_deltas_portably(conn, rows)
+        return
+
+    conn.execute(stmt)
+
+
+def _apply_rollup_deltas_portably(conn, rows):
+    """Select-then-update/insert for databases without an upsert statement."""
+    table = ConfigurationLogRollup.__table__
+    for row in rows:
+        bucket = and_(*(
+            table.c[field].is_(None) if row[field] is None else table.c[field] == row[field]
+            for field in ("hour", "device_id", "action_type", "status")
+        ))
+        bucket_id = conn.execute(select(table.c.id).where(bucket).limit(1)).scalar()
+        if bucket_id is not None:
+            conn.execute(table.update().where(table.c.id == bucket_id).values(count=table.c.count + row["count"]))
+        else:
+            # Not atomic: two writers creating the same bucket at once may conflict
+            conn.execute(table.insert().values(**row))
+
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Make changes to bucket fields load the value being replaced when it is
+# expired (e.g. after a commit); otherwise the old bucket would be unknown
+for _field in BUCKET_FIELDS:
+    event.listen(getattr(ConfigurationLog, _field), "set", _keep_previous_value, active_history=True, retval=True)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _rollup_flushed_logs(session: Session, flush_context):
+    # session.new/dirty/deleted still hold the pre-flush state here, while
+    # defaults and foreign keys of the flushed rows are already populated.
+    deltas = Counter()
+
+    for obj in session.new:
+        if isinstance(obj, ConfigurationLog):
+            deltas[_bucket(obj.timestamp, obj.device_id, obj.action_type, obj.status)] += 1
+
+    for obj in session.dirty:
+        if not isinstance(obj, ConfigurationLog):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[field].history.has_changes() for field in BUCKET_FIELDS):
+            continue
+        deltas[_bucket(*(_previous_value(state, field) for field in BUCKET_FIELDS))] -= 1
+        deltas[_bucket(obj.timestamp, obj.device_id, obj.action_type, obj.status)] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, ConfigurationLog):
+            state = inspect(obj)
+            deltas[_bucket(*(_previous_value(state, field) for field in BUCKET_FIELDS))] -= 1
+
+    deltas = {key: count for key, count in deltas.items() if count}
+    if deltas:
+        apply_rollup_deltas(session.connection(), deltas)
+
+
+def _hour_expression(dialect_name: str):
+    if dialect_name == "postgresql":
+        return func.date_trunc("hour", ConfigurationLog.timestamp)
+    return func.strftime("%Y-%m-%d %H:00:00.000000", ConfigurationLog.timestamp)
+
+
+def rebuild_rollups(db: Session) -> int:
+    """
+    Recompute every rollup bucket from the raw log table.
+
+    Only rows still in the database are counted, so months already removed
+    by log retention drop out of the rollups. Returns the number of buckets.
+    """
+    hour = _hour_expression(db.get_bind().dialect.name)
+    buckets = (
+        db.query(
+            hour.label("hour"),
+            ConfigurationLog.device_id,
+            ConfigurationLog.action_type,
+            ConfigurationLog.status,
+            func.count().label("count"),
+        )
+        .group_by(hour, ConfigurationLog.device_id, ConfigurationLog.action_type, ConfigurationLog.status)
+    )
+
+    db.query(ConfigurationLogRollup).delete(synchronize_session=False)
+    inserted = db.execute(
+        ConfigurationLogRollup.__table__.insert().from_select(
+            ["hour", "device_id", "action_type", "status", "count"], buckets
+        )
+    ).rowcount
+    db.commit()
+    logger.info(f"Rebuilt {inserted} log rollup buckets")
+    return inserted
+
+
+def backfill_rollups_if_empty(db: Session) -> bool:
+    """Build rollups once for logs written before the rollup table existed."""
+    if db.query(ConfigurationLogRollup.id).first() is not None:
+        return False
+    if db.query(ConfigurationLog.log_id).first() is None:
+        return False
+    rebuild_rollups(db)
+    return True
+
+
+def count_logs(
+    db: Session,
+    since: datetime,
+    until: datetime,
+    device_id: Optional[int] = None,
+) -> Counter:
+    """
+    Count logs in [since, until) per (device_id, action_type, status).
+
+    Whole hours come from the rollup table; only the partial hours at either
+    edge of the window (including the still-open current hour) touch the raw
+    log table, and those are bounded index range scans.
+    """
+    counts = Counter()
+    full_start, full_end = hour_ceil(since), hour_floor(until)
+
+    if full_start < full_end:
+        rollup_query = db.query(
+            ConfigurationLogRollup.device_id,
+            ConfigurationLogRollup.action_type,
+            ConfigurationLogRollup.status,
+            func.sum(ConfigurationLogRollup.count),
+        ).filter(ConfigurationLogRollup.hour >= full_start, ConfigurationLogRollup.hour < full_end)
+        if device_id is not None:
+            rollup_query = rollup_query.filter(ConfigurationLogRollup.device_id == device_id)
+        rollup_query = rollup_query.group_by(
+            ConfigurationLogRollup.device_id, ConfigurationLogRollup.action_type, ConfigurationLogRollup.status
+        )
+        for row_device_id, action_type, status, total in rollup_query:
+            counts[(row_device_id, action_type, status)] += int(total)
+        raw_ranges = [(since, full_start), (full_end, until)]
+    else:
+        raw_ranges = [(since, until)]
+
+    for start, end in raw_ranges:
+        if start >= end:
+            continue
+        raw_query = db.query(
+            ConfigurationLog.device_id,
+            ConfigurationLog.action_type,
+            ConfigurationLog.status,
+            func.count(),
+        )
+        raw_query = filter_logs(raw_query, device_id=device_id, since=start, until=end)
+        raw_query = raw_query.group_by(ConfigurationLog.device_id, ConfigurationLog.action_type, ConfigurationLog.status)
+        for row_device_id, action_type, status, total in raw_query:
+            counts[(row_device_id, action_type, status)] += total
+
+    return counts
@@ -0,0 +1,33 @@
+"""
+Heartbeats of the background loops, for the health checks.
+
+Each loop reports after every run; a loop counts as fresh while its last
+run is at most twice its interval ago (plus one health refresh).
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+# Poller name -> {"interval", "last_run", "last_error"}
+_pollers: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+
+def poller_heartbeat(name: str, interval_seconds: float, error: Optional[str] = None):
+    """Record that the loop `name` finished a run (with `error` if it failed)."""
+    with _lock:
+        _pollers[name] = {"interval": interval_seconds, "last_run": time.time(), "last_error": error}
+
+
+def poller_status(grace_seconds: float = 0) -> Dict[str, Dict]:
+    now = time.time()
+    with _lock:
+        pollers = {name: dict(values) for name, values in _pollers.items()}
+    for values in pollers.values():
+        age = now - values["last_run"]
+        values["age_seconds"] = round(age, 1)
+        values["fresh"] = age <= 2 * values["interval"] + grace_seconds
+        values["last_run"] = datetime.utcfromtimestamp(values["last_run"])
+    return pollers
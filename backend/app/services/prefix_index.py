@@ -0,0 +1,363 @@
+"""
+In-memory prefix index over the fleet's addresses and static routes.
+
+Built from the inventory store (services/inventory.py) into one Patricia
+trie per address family. Answers "which device and interface owns or routes
+this IP" by longest-prefix match, lists every prefix overlapping a network
+and reports address conflicts across the fleet. The inventory collector
+refreshes only the devices whose rows changed; changes made by other
+workers arrive through the change feed.
+"""
+
+import ipaddress
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import Device, InventoryItem
+from app.services.change_feed import change_feed
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Inventory kinds indexed, and the field holding the prefix
+PREFIX_SOURCES = {
+    "ips": "address",
+    "routes": "dst_address",
+}
+
+EntryKey = Tuple[int, str, str]  # (device_id, inventory kind, inventory key)
+
+
+class _Node:
+    __slots__ = ("value", "length", "children", "entries")
+
+    def __init__(self, value: int, length: int):
+        self.value = value
+        self.length = length
+        self.children: List[Optional["_Node"]] = [None, None]
+        self.entries: Dict[EntryKey, Dict] = {}
+
+
+class PrefixTrie:
+    """
+    Path-compressed binary trie of network prefixes.
+
+    Prefixes are (value, length) with `value` the network address as an
+    integer `width` bits wide. Each node holds the entries for exactly its
+    prefix; nodes with no entries exist only where two branches split.
+    """
+
+    def __init__(self, width: int):
+        self.width = width
+        self.root = _Node(0, 0)
+
+    def _bit(self, value: int, index: int) -> int:
+        return (value >> (self.width - 1 - index)) & 1
+
+    def _common_length(self, a: int, a_length: int, b: int, b_length: int) -> int:
+        diff = a ^ b
+        common = self.width - diff.bit_length() if diff else self.width
+        return min(common, a_length, b_length)
+
+    def _mask(self, value: int, length: int) -> int:
+        if length == 0:
+            return 0
+        return value & ~((1 << (self.width - length)) - 1)
+
+    def insert(self, value: int, length: int, key: EntryKey, entry: Dict):
+        node = self.root
+        while node.length != length:
+            bit = self._bit(value, node.length)
+            child = node.children[bit]
+            if child is None:
+                child = node.children[bit] = _Node(value, length)
+                break
+            common = self._common_length(child.value, child.length, value, length)
+            if common == child.length:
+                node = child
+                continue
+            # Split the edge at the first differing bit
+            split = _Node(self._mask(value, common), common)
+            split.children[self._bit(child.value, common)] = child
+            node.children[bit] = split
+            if common == length:
+                child = split
+            else:
+                child = split.children[self._bit(value, common)] = _Node(value, length)
+            break
+        else:
+            child = node
+        child.entries[key] = entry
+
+    def remove(self, value: int, length: int, key: EntryKey):
+        path = [self.root]
+        node = self.root
+        while node.length < length:
+            child = node.children[self._bit(value, node.length)]
+            if child is None or self._common_length(child.value, child.length, value, length) < child.length:
+                return
+            path.append(child)
+            node = child
+        if node.length != length:
+            return
+        node.entries.pop(key, None)
+
+        # Drop nodes left without entries and splice out pass-through nodes
+        while len(path) > 1:
+            node = path.pop()
+            if node.entries:
+                break
+            parent = path[-1]
+            children = [c for c in node.children if c is not None]
+            if len(children) == 2:
+                break
+            parent.children[self._bit(node.value, parent.length)] = children[0] if children else None
+            if children:
+                break
+
+    def matches(self, value: int, length: Optional[int] = None) -> Iterator[_Node]:
+        """Nodes with entries whose prefix contains (value, length), shortest first."""
+        length = self.width if length is None else length
+        node = self.root
+        while node is not None:
+            if node.entries:
+                yield node
+            if node.length >= length:
+                return
+            child = node.children[self._bit(value, node.length)]
+            if child is None or child.length > length or \
+                    self._common_length(child.value, child.length, value, length) < child.length:
+                return
+            node = child
+
+    def within(self, value: int, length: int) -> Iterator[_Node]:
+        """Nodes with entries whose prefix lies inside (value, length), including it."""
+        node = self.root
+        while node.length < length:
+            child = node.children[self._bit(value, node.length)]
+            if child is None:
+                return
+            common = self._common_length(child.value, child.length, value, length)
+            if common < min(child.length, length):
+                return
+            node = child
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.entries:
+                yield node
+            stack.extend(c for c in node.children if c is not None)
+
+
+def _parse(prefix: str):
+    return ipaddress.ip_network(prefix, strict=False)
+
+
+class FleetPrefixIndex:
+    """Prefix tries for IPv4 and IPv6 plus the per-device bookkeeping to refresh them."""
+
+    def __init__(self):
+        self._tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        self._device_prefixes: Dict[int, List[Tuple[int, int, int, EntryKey]]] = {}
+        # Host addresses assigned on interfaces, for duplicate detection
+        self._hosts: Dict[Tuple[int, int], Dict[EntryKey, Dict]] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def _entry(self, item: InventoryItem, device_name: str, network) -> Dict:
+        attributes = item.attributes or {}
+        entry = {
+            "device_id": item.device_id,
+            "device": device_name,
+            "kind": "address" if item.kind == "ips" else "route",
+            "prefix": str(network),
+        }
+        if item.kind == "ips":
+            entry["address"] = attributes.get("address")
+            entry["interface"] = attributes.get("interface")
+        else:
+            entry["gateway"] = attributes.get("gateway")
+            entry["distance"] = attributes.get("distance")
+            entry["routing_table"] = attributes.get("routing_table")
+        return entry
+
+    def _remove_device(self, device_id: int):
+        for version, value, length, key in self._device_prefixes.pop(device_id, []):
+            self._tries[version].remove(value, length, key)
+        for host in [h for h, entries in self._hosts.items() if any(k[0] == device_id for k in entries)]:
+            entries = self._hosts[host]
+            for key in [k for k in entries if k[0] == device_id]:
+                del entries[key]
+            if not entries:
+                del self._hosts[host]
+
+    def _add_items(self, device_id: int, rows: Iterable[Tuple[InventoryItem, str]]):
+        prefixes = self._device_prefixes.setdefault(device_id, [])
+        for item, device_name in rows:
+            raw = (item.attributes or {}).get(PREFIX_SOURCES[item.kind])
+            if not raw:
+                continue
+            try:
+                network = _parse(raw)
+            except ValueError:
+                logger.debug(f"Skipping unparsable prefix {raw!r} of device {device_id}")
+                continue
+            key = (device_id, item.kind, item.key)
+            entry = self._entry(item, device_name, network)
+            value, length = int(network.network_address), network.prefixlen
+            self._tries[network.version].insert(value, length, key, entry)
+            prefixes.append((network.version, value, length, key))
+            if item.kind == "ips":
+                host = ipaddress.ip_interface(raw).ip
+                self._hosts.setdefault((host.version, int(host)), {})[key] = entry
+
+    def _query_items(self, db: Session, device_ids: Optional[List[int]] = None):
+        query = (
+            db.query(InventoryItem, Device.name)
+            .join(Device, Device.id == InventoryItem.device_id)
+            .filter(InventoryItem.kind.in_(list(PREFIX_SOURCES)))
+        )
+        if device_ids is not None:
+            query = query.filter(InventoryItem.device_id.in_(device_ids))
+        grouped: Dict[int, List[Tuple[InventoryItem, str]]] = {}
+        for item, device_name in query:
+            grouped.setdefault(item.device_id, []).append((item, device_name))
+        return grouped
+
+    def load(self, db: Session):
+        """(Re)build the whole index from the inventory store."""
+        grouped = self._query_items(db)
+        with self._lock:
+            self._tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+            self._device_prefixes = {}
+            self._hosts = {}
+            for device_id, rows in grouped.items():
+                self._add_items(device_id, rows)
+            self._loaded = True
+
+    def refresh_devices(self, db: Session, device_ids: Iterable[int]):
+        """Re-index only the given devices, e.g. those whose inventory changed."""
+        device_ids = list(device_ids)
+        if not self._loaded or not device_ids:
+            return
+        grouped = self._query_items(db, device_ids)
+        with self._lock:
+            for device_id in device_ids:
+                self._remove_device(device_id)
+                if device_id in grouped:
+                    self._add_items(device_id, grouped[device_id])
+
+    def retain_devices(self, device_ids: Iterable[int]):
+        """Forget devices that no longer exist."""
+        keep = set(device_ids)
+        with self._lock:
+            for device_id in [d for d in self._device_prefixes if d not in keep]:
+                self._remove_device(device_id)
+
+    def apply_change(self, change: Dict):
+        """Change feed handler for devices (renames, deletes) and inventory items."""
+        if not self._loaded:
+            return
+        if change["table"] == "inventory_items" and change["local"]:
+            return  # This worker's collector refreshed the index already
+        if change["keys"] is None:
+            with self._lock:
+                self._loaded = False  # Rebuilt on the next query
+            return
+        db = SessionLocal()
+        try:
+            self.refresh_devices(db, change["keys"])
+        finally:
+            db.close()
+
+    def ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            db = SessionLocal()
+            try:
+                self.load(db)
+            finally:
+                db.close()
+
+    def lookup(self, ip: str) -> Dict:
+        """
+        Longest-prefix match for a single address.
+
+        `owners` are the interfaces the address is assigned to, `longest`
+        the entries of the most specific covering prefix, and `matches`
+        every covering prefix, most specific first.
+        """
+        address = ipaddress.ip_address(ip)
+        self.ensure_loaded()
+        with self._lock:
+            nodes = list(self._tries[address.version].matches(int(address)))
+            owners = list(self._hosts.get((address.version, int(address)), {}).values())
+            matches = [entry for node in reversed(nodes) for entry in node.entries.values()]
+            longest = list(nodes[-1].entries.values()) if nodes else []
+        return {"ip": str(address), "owners": owners, "longest": longest, "matches": matches}
+
+    def overlaps(self, prefix: str) -> List[Dict]:
+        """Every indexed prefix that contains or lies inside `prefix`."""
+        network = _parse(prefix)
+        value, length = int(network.network_address), network.prefixlen
+        self.ensure_loaded()
+        with self._lock:
+            trie = self._tries[network.version]
+            nodes = {id(node): node for node in trie.matches(value, length)}
+            nodes.update({id(node): node for node in trie.within(value, length)})
+            entries = [entry for node in nodes.values() for entry in node.entries.values()]
+        return sorted(entries, key=lambda e: (_parse(e["prefix"]).prefixlen, e["device_id"]))
+
+    def conflicts(self) -> Dict[str, List[Dict]]:
+        """
+        Address conflicts across the fleet.
+
+        `duplicate_addresses`: one host address assigned on more than one
+        device. `overlapping_subnets`: interface subnets on different devices
+        where one strictly contains the other (identical subnets are a
+        shared link and not reported).
+        """
+        self.ensure_loaded()
+        with self._lock:
+            duplicates = []
+            for entries in self._hosts.values():
+                if len({key[0] for key in entries}) > 1:
+                    duplicates.append({
+                        "address": next(iter(entries.values()))["address"].split("/")[0],
+                        "entries": list(entries.values()),
+                    })
+
+            overlapping = []
+            for trie in self._tries.values():
+                for node in trie.within(0, 0):
+                    outer = [e for e in node.entries.values() if e["kind"] == "address"]
+                    if not outer:
+                        continue
+                    outer_devices = {e["device_id"] for e in outer}
+                    for inner_node in trie.within(node.value, node.length):
+                        if inner_node is node:
+                            continue
+                        inner = [
+                            e for e in inner_node.entries.values()
+                            if e["kind"] == "address" and (outer_devices - {e["device_id"]})
+                        ]
+                        if inner:
+                            overlapping.append({"subnet": outer, "contained": inner})
+        return {"duplicate_addresses": duplicates, "overlapping_subnets": overlapping}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "devices": len(self._device_prefixes),
+                "prefixes": sum(len(p) for p in self._device_prefixes.values()),
+            }
+
+
+fleet_prefixes = FleetPrefixIndex()
+change_feed.on_change("devices", fleet_prefixes.apply_change)
+change_feed.on_change("inventory_items", fleet_prefixes.apply_change)
@@ -2,6 +2,9 @@ import json
 import os
 from pathlib import Path
 from typing import List, Dict
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import Device
@@ -27,8 +30,11 @@ def generate_prometheus_targets(db: Session) -> List[Dict]:
     
     Returns list of target configurations in Prometheus file_sd format.
     """
-    devices = db.query(Device).all()
-    
+    return device_targets(db.query(Device).all())
+
+
+def device_targets(devices: List[Device]) -> List[Dict]:
+    """Prometheus file_sd target configurations for the given devices."""
     targets = []
     for device in devices:
         target = {
@@ -107,6 +113,29 @@ def sync_prometheus_targets(db: Session) -> Dict:
         }
 
 
+async def sync_prometheus_targets_async(db: AsyncSession) -> Dict:
+    """sync_prometheus_targets for an AsyncSession; the file is written in the threadpool."""
+    try:
+        targets = device_targets((await db.scalars(select(Device))).all())
+        success = await run_in_threadpool(write_targets_file, targets)
+
+        return {
+            "success": success,
+            "targets_count": len(targets),
+            "file_path": str(TARGETS_FILE),
+            "message": f"Synced {len(targets)} devices to Prometheus targets"
+        }
+
+    except Exception as e:
+        logger.error(f"Error syncing Prometheus targets: {e}")
+        return {
+            "success": False,
+            "targets_count": 0,
+            "error": str(e),
+            "message": "Failed to sync targets"
+        }
+
+
 def get_current_targets() -> List[Dict]:
     """
     Read current Prometheus targets from file.
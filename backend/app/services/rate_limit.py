@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable, Tuple
+
+
+class TokenBucketLimiter:
+    """
+    Thread-safe token buckets, one per key.
+
+    Each bucket holds up to `burst` tokens and refills at `rate` tokens per
+    second. Only the `maxsize` most recently used buckets are kept; an
+    evicted bucket starts full again, which is what an idle key would have
+    refilled to anyway.
+    """
+
+    def __init__(self, rate: float, burst: float, maxsize: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self.clock = clock
+        self._buckets: "OrderedDict[Hashable, tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def _tokens(self, key: Hashable, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.burst
+        tokens, updated = bucket
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def _wait(self, tokens: float) -> float:
+        if tokens >= 1:
+            return 0.0
+        return (1 - tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def _take(self, key: Hashable, tokens: float, now: float):
+        self._buckets[key] = (tokens - 1, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+
+    def acquire(self, keys: Iterable[Hashable]) -> float:
+        """
+        Take one token from every key's bucket, or from none of them.
+
+        Returns 0 on success, otherwise the seconds until all buckets hold
+        a token again.
+        """
+        return acquire_all((self, key) for key in keys)
+
+    def reset(self, key: Hashable):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+def acquire_all(requests: Iterable[Tuple[TokenBucketLimiter, Hashable]]) -> float:
+    """
+    Take one token from each (limiter, key) bucket, or from none of them,
+    even across limiters with different rates. Returns what acquire does.
+    """
+    requests = list(dict.fromkeys(requests))
+    limiters = sorted({id(limiter): limiter for limiter, _ in requests}.values(), key=id)
+    # Always locked in the same order, so concurrent calls cannot deadlock
+    for limiter in limiters:
+        limiter._lock.acquire()
+    try:
+        now = {id(limiter): limiter.clock() for limiter in limiters}
+        levels = [(limiter, key, limiter._tokens(key, now[id(limiter)])) for limiter, key in requests]
+        wait = max((limiter._wait(tokens) for limiter, _, tokens in levels), default=0.0)
+        if wait > 0:
+            return wait
+        for limiter, key, tokens in levels:
+            limiter._take(key, tokens, now[id(limiter)])
+        return 0.0
+    finally:
+        for limiter in reversed(limiters):
+            limiter._lock.release()
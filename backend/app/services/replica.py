@@ -0,0 +1,151 @@
+"""
+Read routing to the optional PostgreSQL replica (REPLICA_DATABASE_URL).
+
+Read-only routes take their session from get_read_db/get_async_read_db.
+These hand out a replica session while the replica is healthy and at most
+REPLICA_MAX_LAG_SECONDS behind, and a primary session otherwise. Writes
+always go through get_db/get_async_db.
+
+A background thread measures the lag every REPLICA_LAG_CHECK_SECONDS.
+The replica is only used while its WAL receiver is streaming: with the
+receiver stopped, replay catches up with the last WAL received and the
+replica would look current however far behind the primary it falls.
+While streaming, lag is zero when the replica has replayed everything it
+received (an idle primary sends nothing, so the replay timestamp alone
+would look stale), otherwise the age of the last replayed transaction. A
+server that is not in recovery, such as a second stand-alone instance in
+local tests, reports no lag.
+
+The receiver's status is only visible to roles with pg_read_all_stats;
+for other roles just its presence is checked.
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+from sqlalchemy import text
+from app import config
+from app.database import (
+    AsyncReplicaSessionLocal, AsyncSessionLocal, ReplicaSessionLocal, SessionLocal,
+    replica_engine, require_ready, require_ready_async
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+_LAG_QUERY = text("""
+    SELECT
+        pg_is_in_recovery() AS in_recovery,
+        (SELECT pid FROM pg_stat_wal_receiver) AS receiver_pid,
+        (SELECT status FROM pg_stat_wal_receiver) AS receiver_status,
+        pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() AS caught_up,
+        EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) AS replay_age
+""")
+
+
+class ReplicaNotStreaming(Exception):
+    pass
+
+
+def replica_lag(row) -> float:
+    """Lag in seconds from a _LAG_QUERY row. Raises ReplicaNotStreaming if the replica cannot be trusted."""
+    if not row.in_recovery:
+        return 0.0
+    if row.receiver_pid is None:
+        raise ReplicaNotStreaming("replica has no WAL receiver")
+    if row.receiver_status is not None and row.receiver_status != "streaming":
+        raise ReplicaNotStreaming(f"replica WAL receiver is {row.receiver_status}, not streaming")
+    if row.caught_up:
+        return 0.0
+    return float(row.replay_age or 0)
+
+
+class ReplicaLagGuard:
+    def __init__(self, engine, max_lag_seconds: float, interval_seconds: float):
+        self.engine = engine
+        self.max_lag_seconds = max_lag_seconds
+        self.interval_seconds = interval_seconds
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return self.engine is not None
+
+    def check(self):
+        try:
+            with self.engine.connect() as conn:
+                self.lag_seconds = replica_lag(conn.execute(_LAG_QUERY).one())
+            self.last_error = None
+        except Exception as e:
+            self.lag_seconds = None
+            self.last_error = str(e)
+            logger.warning(f"Replica lag check failed, reading from the primary: {e}")
+        self.checked_at = time.monotonic()
+
+    def _loop(self):
+        while True:
+            self.check()
+            time.sleep(self.interval_seconds)
+
+    def start(self):
+        """Start the lag checks (only when a replica is configured)."""
+        with self._lock:
+            if not self.configured or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="replica-lag-guard", daemon=True)
+        self._thread.start()
+
+    @property
+    def use_replica(self) -> bool:
+        """True while the last check succeeded recently and found the lag within bounds."""
+        if not self.configured or self.lag_seconds is None or self.checked_at is None:
+            return False
+        if time.monotonic() - self.checked_at > 3 * self.interval_seconds:
+            return False
+        return self.lag_seconds <= self.max_lag_seconds
+
+    def status(self) -> Dict:
+        return {
+            "configured": self.configured,
+            "serving_reads": self.use_replica,
+            "lag_seconds": None if self.lag_seconds is None else round(self.lag_seconds, 3),
+            "max_lag_seconds": self.max_lag_seconds,
+            "last_error": self.last_error,
+            "checked_seconds_ago": None if self.checked_at is None else round(time.monotonic() - self.checked_at, 1),
+        }
+
+
+replica_guard = ReplicaLagGuard(replica_engine, config.REPLICA_MAX_LAG_SECONDS, config.REPLICA_LAG_CHECK_SECONDS)
+
+
+def read_session_factory():
+    """Session factory for a read-only unit of work: the replica when usable, else the primary."""
+    return ReplicaSessionLocal if replica_guard.use_replica else SessionLocal
+
+
+def get_read_db():
+    """Like get_db, but served by the replica while it is within the lag bound."""
+    if replica_guard.use_replica:
+        db = ReplicaSessionLocal()
+    else:
+        require_ready()
+        db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    """Like get_async_db, but served by the replica while it is within the lag bound."""
+    if replica_guard.use_replica:
+        factory = AsyncReplicaSessionLocal
+    else:
+        await require_ready_async()
+        factory = AsyncSessionLocal
+    async with factory() as db:
+        yield db
@@ -0,0 +1,173 @@
+"""
+Per-device limits on RouterOS API access.
+
+Low-end boards slow down sharply with several API sessions open at once,
+so each device gets at most ROUTEROS_MAX_SESSIONS_PER_DEVICE sessions
+through get_routeros_connection. Further callers wait up to
+ROUTEROS_SESSION_WAIT_SECONDS for a slot. A slot is freed when the
+connection is disconnected, so callers must disconnect on every path
+(routeros_session does). Long-lived listen subscriptions do not take a
+slot.
+
+Identical reads of the same device that overlap in time are coalesced:
+the first caller performs the RouterOS call and every concurrent caller
+with the same key waits for it and gets the same result (or error).
+Results are shared, so callers must not modify them.
+"""
+
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable
+from prometheus_client import CollectorRegistry, Counter
+from prometheus_client.core import GaugeMetricFamily
+from app import config
+
+LIMITS_REGISTRY = CollectorRegistry()
+
+WAIT_TIMEOUTS = Counter(
+    "networkweaver_routeros_session_wait_timeouts_total",
+    "Callers that gave up waiting for a free RouterOS session slot",
+    ["device_id"], registry=LIMITS_REGISTRY,
+)
+COALESCED_READS = Counter(
+    "networkweaver_routeros_coalesced_reads_total",
+    "Reads answered by another caller's in-flight RouterOS call",
+    ["device_id"], registry=LIMITS_REGISTRY,
+)
+
+
+class _DeviceSlots:
+    def __init__(self):
+        self.in_use = 0
+        self.waiting = 0
+        self.condition = threading.Condition()
+
+
+class DeviceSessionLimiter:
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self._devices: Dict[int, _DeviceSlots] = {}
+        self._lock = threading.Lock()
+
+    def _slots(self, device_id: int) -> _DeviceSlots:
+        with self._lock:
+            return self._devices.setdefault(device_id, _DeviceSlots())
+
+    def acquire(self, device_id: int, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for a session slot. False if none came free."""
+        slots = self._slots(device_id)
+        with slots.condition:
+            slots.waiting += 1
+            try:
+                acquired = slots.condition.wait_for(lambda: slots.in_use < self.max_sessions, timeout)
+            finally:
+                slots.waiting -= 1
+            if acquired:
+                slots.in_use += 1
+        if not acquired:
+            WAIT_TIMEOUTS.labels(str(device_id)).inc()
+        return acquired
+
+    def release(self, device_id: int):
+        slots = self._slots(device_id)
+        with slots.condition:
+            slots.in_use -= 1
+            slots.condition.notify()
+
+    def attach(self, connection, device_id: int):
+        """Free the slot when `connection` is disconnected."""
+        # Last resort for a leaked connection only: the pool is part of a
+        # reference cycle (pool -> api -> communicator -> pool), so it is not
+        # collected before a full cyclic GC, which may be minutes away
+        finalizer = weakref.finalize(connection, self.release, device_id)
+        # Through a weak reference: a bound method would keep the connection alive
+        connection_ref = weakref.ref(connection)
+        disconnect = type(connection).disconnect
+
+        def disconnect_and_release():
+            try:
+                disconnect(connection_ref())
+            finally:
+                finalizer()  # Runs the release once
+
+        connection.disconnect = disconnect_and_release
+
+    def status(self) -> Dict[int, Dict]:
+        with self._lock:
+            devices = dict(self._devices)
+        return {
+            device_id: {"in_use": slots.in_use, "waiting": slots.waiting, "max_sessions": self.max_sessions}
+            for device_id, slots in devices.items()
+        }
+
+
+session_limiter = DeviceSessionLimiter(config.ROUTEROS_MAX_SESSIONS_PER_DEVICE)
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+_in_flight: Dict[Hashable, _InFlight] = {}
+_in_flight_lock = threading.Lock()
+
+
+def coalesced(device_id: int, key: Hashable, read: Callable[[], Any]) -> Any:
+    """
+    Run `read` for the device unless an identical read (same key) is in
+    flight; then wait for that one and return its result.
+    """
+    flight_key = (device_id, key)
+    with _in_flight_lock:
+        flight = _in_flight.get(flight_key)
+        leader = flight is None
+        if leader:
+            flight = _in_flight[flight_key] = _InFlight()
+
+    if not leader:
+        COALESCED_READS.labels(str(device_id)).inc()
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = read()
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[flight_key]
+        flight.done.set()
+
+
+def in_flight_reads() -> Dict[int, int]:
+    """Number of distinct reads in flight per device."""
+    counts: Dict[int, int] = {}
+    with _in_flight_lock:
+        for device_id, _ in _in_flight:
+            counts[device_id] = counts.get(device_id, 0) + 1
+    return counts
+
+
+class _SessionStateCollector:
+    def collect(self):
+        in_use = GaugeMetricFamily(
+            "networkweaver_routeros_sessions_in_use", "RouterOS sessions open per device", labels=["device_id"],
+        )
+        waiting = GaugeMetricFamily(
+            "networkweaver_routeros_session_waiters", "Callers waiting for a RouterOS session slot", labels=["device_id"],
+        )
+        for device_id, status in session_limiter.status().items():
+            in_use.add_metric([str(device_id)], status["in_use"])
+            waiting.add_metric([str(device_id)], status["waiting"])
+        yield in_use
+        yield waiting
+
+
+LIMITS_REGISTRY.register(_SessionStateCollector())
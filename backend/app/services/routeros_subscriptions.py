@@ -0,0 +1,262 @@
+"""
+Live mirrors of RouterOS tables kept fresh by `listen` subscriptions.
+
+For each subscribed device a worker thread keeps one API session open. On
+that session it issues a `listen` and a `print` per mirrored path: the print
+(re)builds the mirror and the listen stream applies every later change as it
+happens. Reads are then served from memory with no device round trip. When
+the stream drops, the worker reconnects with backoff and resyncs each table.
+"""
+
+import select
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from routeros_api.resource import clean_path
+from app import config
+from app.models import Device
+from app.services.change_feed import change_feed
+from app.routers.routeros.connection import (
+    get_routeros_connection,
+    base_communicator,
+    decode_attributes,
+    RouterOSConnectionError
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TableMirror:
+    """In-memory copy of one RouterOS table, keyed by item id."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.synced = False
+        self.updated_at: Optional[float] = None
+        self.events = 0
+        self._rows: Dict[str, Dict[str, str]] = {}
+        self._staged: Optional[Dict[str, Dict[str, str]]] = None
+        self._lock = threading.Lock()
+
+    def begin_resync(self):
+        with self._lock:
+            self._staged = {}
+
+    def stage(self, row: Dict[str, str]):
+        """Add a row of the snapshot being rebuilt."""
+        with self._lock:
+            if self._staged is not None and row.get("id"):
+                self._staged[row["id"]] = row
+
+    def finish_resync(self):
+        """Swap the rebuilt snapshot in. Until then readers see the previous one."""
+        with self._lock:
+            if self._staged is not None:
+                self._rows = self._staged
+                self._staged = None
+            self.synced = True
+            self.updated_at = time.time()
+
+    def apply_event(self, row: Dict[str, str]):
+        """Apply one listen event: an added/changed item, or a removal."""
+        item_id = row.get("id")
+        if not item_id:
+            return
+        with self._lock:
+            for rows in (self._rows, self._staged):
+                if rows is None:
+                    continue
+                if row.get("dead") in ("true", "yes"):
+                    rows.pop(item_id, None)
+                else:
+                    rows.setdefault(item_id, {}).update(row)
+            self.events += 1
+            self.updated_at = time.time()
+
+    def mark_stale(self):
+        with self._lock:
+            self.synced = False
+            self._staged = None
+
+    def rows(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [dict(row) for row in self._rows.values()]
+
+
+class DeviceSubscription:
+    """Worker that keeps the mirrors of one device subscribed."""
+
+    def __init__(self, device: Device, paths: Iterable[str]):
+        # The worker outlives the request session, so keep a detached copy
+        self.device = Device(**{c.name: getattr(device, c.name) for c in Device.__table__.columns})
+        self.mirrors = {path: TableMirror(path) for path in paths}
+        self.connected = False
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"routeros-subscription-{device.id}", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        delay = 1.0
+        while not self._stop.is_set():
+            try:
+                self._session()
+                delay = 1.0
+            except Exception as e:
+                self.connected = False
+                self.last_error = str(e) or type(e).__name__
+                self.reconnects += 1
+                for mirror in self.mirrors.values():
+                    mirror.mark_stale()
+                logger.warning(f"Subscription to {self.device.name} dropped: {e}. Reconnecting in {delay:.0f}s")
+                self._stop.wait(delay)
+                delay = min(delay * 2, config.ROUTEROS_SUBSCRIPTION_MAX_BACKOFF_SECONDS)
+
+    def _session(self):
+        # Held open indefinitely, so it does not count against the session limit
+        connection, api = get_routeros_connection(self.device, timeout=10, retries=0, session_slot=False)
+        try:
+            communicator = base_communicator(api)
+            sock = connection.socket.socket
+
+            # Listen before printing so no change between the two is missed
+            handlers = {}
+            for path, mirror in self.mirrors.items():
+                encoded_path = clean_path(path).encode()
+                handlers[communicator.send(encoded_path, b"listen", {}, {})] = (mirror, "listen")
+                mirror.begin_resync()
+                handlers[communicator.send(encoded_path, b"print", {}, {})] = (mirror, "print")
+
+            self.connected = True
+            self.last_error = None
+            heartbeat_tag = None
+            last_activity = time.monotonic()
+
+            while not self._stop.is_set():
+                readable, _, _ = select.select([sock], [], [], 1.0)
+                if not readable:
+                    if time.monotonic() - last_activity > config.ROUTEROS_SUBSCRIPTION_HEARTBEAT_SECONDS:
+                        if heartbeat_tag is not None:
+                            raise RouterOSConnectionError(f"No reply from {self.device.ip_address} to heartbeat")
+                        heartbeat_tag = communicator.send(b"/system/identity/", b"print", {}, {})
+                        last_activity = time.monotonic()
+                    continue
+
+                sentence = communicator.receive_single_response().response
+                last_activity = time.monotonic()
+
+                if sentence.tag == heartbeat_tag:
+                    if sentence.type == b"done":
+                        communicator.response_buffor.pop(heartbeat_tag, None)
+                        heartbeat_tag = None
+                    continue
+
+                mirror, kind = handlers.get(sentence.tag, (None, None))
+                if mirror is None:
+                    continue
+                if sentence.type == b"re":
+                    row = decode_attributes(sentence.attributes)
+                    if kind == "print":
+                        mirror.stage(row)
+                    else:
+                        mirror.apply_event(row)
+                elif sentence.type == b"done" and kind == "print":
+                    mirror.finish_resync()
+                    communicator.response_buffor.pop(sentence.tag, None)
+                elif sentence.type in (b"trap", b"fatal"):
+                    message = sentence.attributes.get(b"message", b"").decode(errors="backslashreplace")
+                    raise RouterOSConnectionError(f"{kind} on {mirror.path} failed: {message}")
+        finally:
+            self.connected = False
+            try:
+                connection.disconnect()
+            except Exception:
+                pass
+
+    def status(self) -> Dict:
+        return {
+            "device_id": self.device.id,
+            "device_name": self.device.name,
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+            "tables": {
+                path: {
+                    "synced": mirror.synced,
+                    "rows": len(mirror._rows),
+                    "events": mirror.events,
+                    "updated_at": mirror.updated_at,
+                }
+                for path, mirror in self.mirrors.items()
+            },
+        }
+
+
+class SubscriptionManager:
+    """Registry of device subscriptions, one worker per device."""
+
+    def __init__(self):
+        self._subscriptions: Dict[int, DeviceSubscription] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, device: Device, paths: Optional[Iterable[str]] = None) -> DeviceSubscription:
+        """Start (or restart with new paths) the subscription for a device."""
+        paths = [clean_path(p).rstrip("/") for p in (paths or config.ROUTEROS_SUBSCRIPTION_PATHS)]
+        with self._lock:
+            existing = self._subscriptions.get(device.id)
+            if existing and set(existing.mirrors) == set(paths):
+                return existing
+            subscription = DeviceSubscription(device, paths)
+            self._subscriptions[device.id] = subscription
+        if existing:
+            existing.stop()
+        subscription.start()
+        return subscription
+
+    def unsubscribe(self, device_id: int) -> bool:
+        with self._lock:
+            subscription = self._subscriptions.pop(device_id, None)
+        if subscription:
+            subscription.stop()
+        return subscription is not None
+
+    def get_rows(self, device_id: int, path: str) -> Optional[List[Dict[str, str]]]:
+        """Rows of a mirrored table, or None if it is not subscribed and in sync."""
+        subscription = self._subscriptions.get(device_id)
+        if not subscription:
+            return None
+        mirror = subscription.mirrors.get(clean_path(path).rstrip("/"))
+        if not mirror or not mirror.synced or not subscription.connected:
+            return None
+        return mirror.rows()
+
+    def status(self) -> List[Dict]:
+        return [s.status() for s in list(self._subscriptions.values())]
+
+    def stop_all(self):
+        with self._lock:
+            subscriptions = list(self._subscriptions.values())
+            self._subscriptions.clear()
+        for subscription in subscriptions:
+            subscription.stop()
+
+
+subscriptions = SubscriptionManager()
+
+
+def _stop_deleted_devices(change):
+    for device_id in change["deleted"]:
+        subscriptions.unsubscribe(device_id)
+
+
+change_feed.on_change("devices", _stop_deleted_devices)
@@ -0,0 +1,105 @@
+"""
+In-memory catalog of the RouterOS scripts shipped in scripts/routeros.
+
+Script metadata, content and content hash are read once and kept until the
+file changes. Each access only stats the directory and the files involved:
+a changed directory mtime rescans the file names, and a changed file
+mtime or size re-reads just that file.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_EXTENSION = ".rsc"
+
+
+class ScriptEntry:
+    __slots__ = ("name", "description", "content", "sha256", "size", "mtime")
+
+    def __init__(self, name: str, content: str, size: int, mtime: float):
+        self.name = name
+        self.description = name.replace("_", " ").replace(SCRIPT_EXTENSION, "").title()
+        self.content = content
+        self.sha256 = hashlib.sha256(content.encode()).hexdigest()
+        self.size = size
+        self.mtime = mtime
+
+    def metadata(self) -> Dict:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "size": self.size,
+            "modified": self.mtime,
+            "sha256": self.sha256,
+        }
+
+
+class ScriptCatalog:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._entries: Dict[str, Optional[ScriptEntry]] = {}  # None until first read
+        self._dir_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _load(self, name: str, stat: os.stat_result) -> Optional[ScriptEntry]:
+        cached = self._entries.get(name)
+        if cached and cached.mtime == stat.st_mtime and cached.size == stat.st_size:
+            return cached
+        try:
+            with open(os.path.join(self.directory, name), "r") as file:
+                content = file.read()
+        except OSError as e:
+            logger.warning(f"Cannot read script {name}: {e}")
+            self._entries.pop(name, None)
+            return None
+        entry = ScriptEntry(name, content, stat.st_size, stat.st_mtime)
+        self._entries[name] = entry
+        return entry
+
+    def _refresh_names(self):
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime
+        except FileNotFoundError:
+            self._entries.clear()
+            self._dir_mtime = None
+            return
+        if dir_mtime == self._dir_mtime:
+            return
+        names = {f for f in os.listdir(self.directory) if f.endswith(SCRIPT_EXTENSION)}
+        for name in list(self._entries):
+            if name not in names:
+                del self._entries[name]
+        for name in names:
+            self._entries.setdefault(name, None)
+        self._dir_mtime = dir_mtime
+
+    def _current(self, name: str) -> Optional[ScriptEntry]:
+        try:
+            stat = os.stat(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            self._entries.pop(name, None)
+            return None
+        return self._load(name, stat)
+
+    def list(self) -> List[ScriptEntry]:
+        """All scripts, sorted by name. Only changed files are re-read."""
+        with self._lock:
+            self._refresh_names()
+            entries = [self._current(name) for name in sorted(self._entries)]
+        return [entry for entry in entries if entry is not None]
+
+    def get(self, name: str) -> Optional[ScriptEntry]:
+        """A script by file name, or None if there is no such script."""
+        # Only plain file names from the catalog directory, no paths
+        if os.path.basename(name) != name or not name.endswith(SCRIPT_EXTENSION):
+            return None
+        with self._lock:
+            self._refresh_names()
+            if name not in self._entries:
+                return None
+            return self._current(name)
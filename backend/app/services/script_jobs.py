@@ -0,0 +1,174 @@
+"""
+Fleet script jobs: one catalog script run on many devices in parallel.
+
+A job runs in a background thread with at most `concurrency` devices in
+flight. Each device's outcome is appended to the job record as soon as it
+is known, and readers can follow the record while it grows. The last
+SCRIPT_FLEET_JOBS_KEPT jobs are kept in memory.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+from app import config
+from app.models import Device
+from app.routers.routeros.connection import routeros_session
+from app.services.script_catalog import ScriptEntry
+from app.services.script_runner import run_script
+from app.services.script_templates import render_script
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FleetScriptJob:
+    """
+    Runs one catalog script on each device. Subclasses can run other work
+    per device by overriding _prepare and _execute.
+    """
+
+    def __init__(self, entry: Optional[ScriptEntry], devices: List[Device], params: Optional[Dict], concurrency: int, timeout: float):
+        self.id = uuid.uuid4().hex
+        self.entry = entry
+        self.label = entry.name if entry else None
+        self.params = params or {}
+        self.devices = devices
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.status = "pending"
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.results: List[Dict] = []
+        self._changed = threading.Condition()
+
+    def _prepare(self, device: Device):
+        """Per-device work done before connecting; errors here skip the device."""
+        return render_script(self.entry, self.params, device)
+
+    def _execute(self, api, device: Device, prepared, remaining: float) -> Dict:
+        """Run on an open session. The returned dict must have a "status"."""
+        outcome = run_script(api, device, prepared, timeout=remaining)
+        outcome["status"] = "success" if outcome["completed"] else "timeout"
+        return outcome
+
+    def _run_device(self, device: Device) -> Dict:
+        started = time.monotonic()
+        result = {"device_id": device.id, "device": device.name}
+        try:
+            prepared = self._prepare(device)
+            # The connect timeout is part of the device's budget
+            with routeros_session(device, timeout=max(1, int(min(self.timeout, 10))), retries=0) as api:
+                remaining = max(0.0, self.timeout - (time.monotonic() - started))
+                result.update(self._execute(api, device, prepared, remaining))
+        except Exception as e:
+            result.update({"status": "error", "message": str(e)})
+        result["duration"] = round(time.monotonic() - started, 3)
+        return result
+
+    def _record(self, result: Dict):
+        with self._changed:
+            self.results.append(result)
+            self._changed.notify_all()
+
+    def run(self):
+        with self._changed:
+            self.status = "running"
+            self._changed.notify_all()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"script-job-{self.id[:8]}") as pool:
+                for device in self.devices:
+                    pool.submit(self._run_device, device).add_done_callback(lambda f: self._record(f.result()))
+        finally:
+            with self._changed:
+                self.status = "finished"
+                self.finished_at = datetime.utcnow()
+                self._changed.notify_all()
+        logger.info(f"Fleet run of {self.label} finished: {self.summary()}")
+
+    def summary(self) -> Dict[str, int]:
+        counts = {"success": 0, "partial": 0, "timeout": 0, "error": 0}
+        for result in list(self.results):
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        counts["pending"] = len(self.devices) - len(self.results)
+        return counts
+
+    def to_dict(self, include_results: bool = True) -> Dict:
+        record = {
+            "job_id": self.id,
+            "script": self.label,
+            "status": self.status,
+            "devices": len(self.devices),
+            "concurrency": self.concurrency,
+            "timeout": self.timeout,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "summary": self.summary(),
+        }
+        if include_results:
+            record["results"] = list(self.results)
+        return record
+
+    def follow(self, heartbeat_seconds: float = 15.0) -> Iterator[Optional[Dict]]:
+        """
+        Yield results as they arrive, starting with those already recorded.
+
+        Yields None when nothing arrived for `heartbeat_seconds`, so callers
+        can keep a connection alive. Ends once the job has finished.
+        """
+        sent = 0
+        while True:
+            with self._changed:
+                if sent == len(self.results) and self.status != "finished":
+                    self._changed.wait(heartbeat_seconds)
+                pending = self.results[sent:]
+                finished = self.status == "finished"
+            sent += len(pending)
+            if not pending and not finished:
+                yield None
+            yield from pending
+            if finished and sent == len(self.results):
+                return
+
+
+_jobs: "OrderedDict[str, FleetScriptJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def start_fleet_job(
+    entry: ScriptEntry,
+    devices: List[Device],
+    params: Optional[Dict] = None,
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None
+) -> FleetScriptJob:
+    """Start running a script, rendered per device from `params`, on the given (detached) devices."""
+    return start_job(FleetScriptJob(
+        entry,
+        devices,
+        params,
+        concurrency=max(1, concurrency or config.SCRIPT_FLEET_CONCURRENCY),
+        timeout=timeout or config.SCRIPT_JOB_TIMEOUT_SECONDS,
+    ))
+
+
+def start_job(job: FleetScriptJob) -> FleetScriptJob:
+    """Register a job so it can be looked up and followed, and start it in the background."""
+    with _jobs_lock:
+        _jobs[job.id] = job
+        while len(_jobs) > config.SCRIPT_FLEET_JOBS_KEPT:
+            _jobs.popitem(last=False)
+    threading.Thread(target=job.run, name=f"script-job-{job.id[:8]}", daemon=True).start()
+    return job
+
+
+def get_fleet_job(job_id: str) -> Optional[FleetScriptJob]:
+    return _jobs.get(job_id)
+
+
+def list_fleet_jobs() -> List[FleetScriptJob]:
+    with _jobs_lock:
+        return list(reversed(_jobs.values()))
@@ -0,0 +1,179 @@
+"""
+Run catalog scripts on RouterOS devices.
+
+Each script version is installed once per device under a name derived from
+its content hash (networkweaver_<stem>_<sha12>) and reused by later runs,
+so a steady-state run is a single `run` plus job polling. Installing a new
+version removes the older versions of the same script, and completion is
+detected from /system/script/job instead of a fixed sleep.
+"""
+
+import re
+import time
+from typing import Dict, List, Optional
+from app import config
+from app.models import Device
+from app.services.cache import TTLCache
+from app.services.script_catalog import ScriptEntry, SCRIPT_EXTENSION
+from app.routers.routeros.connection import pipelined_print
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_NAME_PREFIX = "networkweaver_"
+
+# Names left behind by the old upload-run-delete flow (networkweaver_<uuid8>)
+_LEGACY_NAME = re.compile(r"^networkweaver_[0-9a-f]{8}$")
+
+# (device_id, installed name) -> RouterOS item id of the installed script
+_installed = TTLCache(ttl_seconds=config.SCRIPT_INSTALL_CACHE_TTL_SECONDS, maxsize=4096)
+
+
+def _stem(entry: ScriptEntry) -> str:
+    stem = entry.name[:-len(SCRIPT_EXTENSION)]
+    return re.sub(r"[^A-Za-z0-9_-]", "_", stem)
+
+
+def installed_name(entry: ScriptEntry) -> str:
+    return f"{SCRIPT_NAME_PREFIX}{_stem(entry)}_{entry.sha256[:12]}"
+
+
+def is_version_of(name: str, entry: ScriptEntry) -> bool:
+    """Whether `name` is an installed version of the script, not of one whose stem merely starts the same."""
+    return re.fullmatch(rf"{re.escape(SCRIPT_NAME_PREFIX + _stem(entry))}_[0-9a-f]{{12}}", name) is not None
+
+
+def install_scripts(api, device: Device, entries: List[ScriptEntry]) -> List[Dict]:
+    """
+    Make sure the current version of each script is installed on the device.
+
+    Reads and writes are pipelined: one round trip lists the installed
+    scripts and running jobs, then every missing upload and stale-version
+    removal is sent before any reply is awaited. Nothing is sent when all
+    versions are known to be installed.
+
+    Returns, per entry, the installed name and id, whether it had to be
+    uploaded, and how many stale versions of it were removed.
+    """
+    names = [installed_name(entry) for entry in entries]
+    installs = {
+        name: {"name": name, "id": _installed.get((device.id, name)), "uploaded": False, "removed": 0}
+        for name in names
+    }
+    pending = [(name, entry) for name, entry in zip(names, entries) if not installs[name]["id"]]
+    if not pending:
+        return [installs[name] for name in names]
+
+    raw = pipelined_print(
+        api,
+        {"scripts": "/system/script", "jobs": "/system/script/job"},
+        {"scripts": [".id", "name"], "jobs": ["script"]}
+    )
+    existing = {s.get("name"): s.get("id") for s in raw["scripts"]}
+    running = {job.get("script") for job in raw["jobs"]}
+    system_script = api.get_resource("/system/script")
+
+    uploads = {}
+    for name, entry in pending:
+        if existing.get(name):
+            installs[name]["id"] = existing[name]
+        elif name not in uploads:
+            uploads[name] = system_script.call_async("add", {"name": name, "source": entry.content})
+
+    # Garbage-collect older versions of these scripts and legacy temporary scripts
+    removals = {}
+    for name, entry in pending:
+        for other_name, other_id in existing.items():
+            if not other_name or other_name in installs or other_name in running or other_id in removals:
+                continue
+            if is_version_of(other_name, entry) or _LEGACY_NAME.match(other_name):
+                removals[other_id] = (name, other_name, system_script.call_async("remove", {"id": other_id}))
+
+    for name, promise in uploads.items():
+        response = promise.get()
+        installs[name]["id"] = getattr(response, "done_message", {}).get("ret") or system_script.get(name=name)[0]["id"]
+        installs[name]["uploaded"] = True
+
+    for name, other_name, promise in removals.values():
+        try:
+            promise.get()
+            installs[name]["removed"] += 1
+        except Exception as e:
+            logger.warning(f"Failed to remove stale script {other_name} on {device.name}: {e}")
+    if removals:
+        logger.info(f"Removed {sum(i['removed'] for i in installs.values())} stale script version(s) on {device.name}")
+
+    for name in installs:
+        _installed.set((device.id, name), installs[name]["id"])
+    return [installs[name] for name in names]
+
+
+def install_script(api, device: Device, entry: ScriptEntry) -> Dict:
+    """Make sure the current version of one script is installed (see install_scripts)."""
+    return install_scripts(api, device, [entry])[0]
+
+
+def wait_for_job(api, name: str, timeout: float) -> bool:
+    """Poll /system/script/job until no job of `name` is left. False on timeout."""
+    jobs = api.get_resource("/system/script/job")
+    deadline = time.monotonic() + timeout
+    interval = config.SCRIPT_JOB_POLL_INTERVAL_SECONDS
+    while True:
+        if not jobs.get(script=name):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+        interval = min(interval * 2, 2.0)
+
+
+def run_script(api, device: Device, entry: ScriptEntry, timeout: Optional[float] = None, install: Optional[Dict] = None) -> Dict:
+    """
+    Install (if needed) and run a catalog script, then wait for it to finish.
+
+    Pass `install` from install_scripts to skip the install check.
+
+    Returns the install details, the run message and whether the job
+    completed within `timeout` seconds (SCRIPT_JOB_TIMEOUT_SECONDS by default).
+    Errors while running are reported in the message, not raised.
+    """
+    timeout = config.SCRIPT_JOB_TIMEOUT_SECONDS if timeout is None else timeout
+    started = time.monotonic()
+    install = install or install_script(api, device, entry)
+    system_script = api.get_resource("/system/script")
+
+    def run(script_id):
+        response = system_script.call("run", {"id": script_id})
+        # Only some RouterOS versions return anything from `run`
+        return getattr(response, "done_message", {}).get("ret")
+
+    message = "Script executed successfully."
+    completed = False
+    output = None
+    try:
+        try:
+            output = run(install["id"])
+        except Exception as e:
+            if "no such item" not in str(e).lower():
+                raise
+            # Removed on the router behind our back: install again and retry once
+            _installed.pop((device.id, install["name"]))
+            install = install_script(api, device, entry)
+            output = run(install["id"])
+        completed = wait_for_job(api, install["name"], timeout)
+        if not completed:
+            message = f"Script still running after {timeout:.0f}s."
+    except Exception as e:
+        # Scripts such as reboot.rsc may drop the session while running
+        message = f"Script execution triggered error (might be expected): {str(e)}"
+        logger.warning(message)
+
+    return {
+        "installed_as": install["name"],
+        "uploaded": install["uploaded"],
+        "stale_removed": install["removed"],
+        "completed": completed,
+        "message": message,
+        "output": output,
+        "duration": round(time.monotonic() - started, 3),
+    }
@@ -0,0 +1,251 @@
+"""
+Parameterized RouterOS script templates.
+
+A catalog script becomes a template by declaring parameters in its header
+and using {{name}} placeholders:
+
+    # @param community string default=public - SNMP community name
+    # @param addresses cidr_list default=0.0.0.0/0 - Allowed managers
+    /snmp community set [find default=yes] name="{{community}}" addresses={{addresses}}
+
+Templates are compiled once per content hash into literal and placeholder
+parts, so rendering a device variant is a validation pass plus a join.
+`string` values are escaped for RouterOS double-quoted strings and belong
+inside quotes; every other type is checked against a strict pattern.
+`device_name` and `device_ip` are always available.
+"""
+
+import ipaddress
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.models import Device
+from app.services.script_catalog import ScriptEntry
+
+
+class TemplateError(ValueError):
+    """Invalid template or parameter values. The message lists every problem."""
+
+
+def _string(value: Any) -> str:
+    text = str(value)
+    return (
+        text.replace("\\", "\\\\").replace('"', '\\"').replace("$", "\\$")
+        .replace("\r", "\\r").replace("\n", "\\n")
+    )
+
+
+def _int(value: Any) -> str:
+    if isinstance(value, bool) or not re.fullmatch(r"-?\d+", str(value)):
+        raise ValueError("expected an integer")
+    return str(int(value))
+
+
+def _no_scope(address):
+    # ipaddress accepts IPv6 scope ids ("fe80::1%eth0") made of almost any characters
+    if getattr(address, "scope_id", None) is not None:
+        raise ValueError("scoped IPv6 addresses are not supported")
+    return address
+
+
+def _ip(value: Any) -> str:
+    return str(_no_scope(ipaddress.ip_address(str(value))))
+
+
+def _cidr(value: Any) -> str:
+    text = str(value)
+    network = _no_scope(ipaddress.ip_interface(text).ip)
+    return text if "/" in text else str(network)
+
+
+def _cidr_list(value: Any) -> str:
+    items = value if isinstance(value, (list, tuple)) else str(value).split(",")
+    return ",".join(_cidr(item.strip() if isinstance(item, str) else item) for item in items)
+
+
+def _host(value: Any) -> str:
+    text = str(value)
+    if not re.fullmatch(r"[A-Za-z0-9]([A-Za-z0-9.-]{0,252}[A-Za-z0-9])?|[0-9A-Fa-f:.]+", text):
+        raise ValueError("expected a host name or address")
+    return text
+
+
+def _rate(value: Any) -> str:
+    if not re.fullmatch(r"\d+[kKMG]?", str(value)):
+        raise ValueError("expected a rate such as 512k or 10M")
+    return str(value)
+
+
+def _bool(value: Any) -> str:
+    text = str(value).lower()
+    if text in ("yes", "true", "1", "on"):
+        return "yes"
+    if text in ("no", "false", "0", "off"):
+        return "no"
+    raise ValueError("expected yes or no")
+
+
+def _name(value: Any) -> str:
+    if not re.fullmatch(r"[A-Za-z0-9_.-]+", str(value)):
+        raise ValueError("expected letters, digits, '_', '.' or '-'")
+    return str(value)
+
+
+# Parameter type -> converter returning the RouterOS text (raises ValueError)
+PARAM_TYPES: Dict[str, Callable[[Any], str]] = {
+    "string": _string,
+    "int": _int,
+    "ip": _ip,
+    "cidr": _cidr,
+    "cidr_list": _cidr_list,
+    "host": _host,
+    "rate": _rate,
+    "bool": _bool,
+    "name": _name,
+}
+
+# Filled from the device when not passed explicitly
+DEVICE_PARAMS = {
+    "device_name": ("string", lambda device: device.name),
+    "device_ip": ("host", lambda device: device.ip_address),
+}
+
+_PARAM_LINE = re.compile(r"^\s*#\s*@param\s+(\w+)\s+(\w+)((?:\s+default=\S+)?)\s*(?:-\s*(.*))?$")
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class ParamSpec:
+    __slots__ = ("name", "type", "default", "description")
+
+    def __init__(self, name: str, type: str, default: Optional[str], description: str):
+        self.name = name
+        self.type = type
+        self.default = default
+        self.description = description
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "type": self.type,
+            "required": self.default is None,
+            "default": self.default,
+            "description": self.description,
+        }
+
+
+class CompiledTemplate:
+    def __init__(self, params: Dict[str, ParamSpec], parts: List[str], slots: List[Tuple[int, str]]):
+        self.params = params
+        self._parts = parts  # Literal text, with an empty slot for each placeholder
+        self._slots = slots  # (index into parts, parameter name)
+
+    @property
+    def is_static(self) -> bool:
+        return not self._slots
+
+    def validate(self, values: Dict[str, Any], device: Optional[Device] = None) -> Dict[str, str]:
+        """Convert `values` (plus defaults and device params) to RouterOS text."""
+        unknown = [name for name in values if name not in self.params]
+        errors = [f"unknown parameter '{name}'" for name in unknown]
+        rendered = {}
+        for name, spec in self.params.items():
+            if name in values and values[name] is not None:
+                raw = values[name]
+            elif name in DEVICE_PARAMS and device is not None:
+                raw = DEVICE_PARAMS[name][1](device)
+            elif spec.default is not None:
+                raw = spec.default
+            elif name in DEVICE_PARAMS:
+                continue  # Filled in per device at render time
+            else:
+                errors.append(f"missing required parameter '{name}'")
+                continue
+            try:
+                rendered[name] = PARAM_TYPES[spec.type](raw)
+            except ValueError as e:
+                errors.append(f"parameter '{name}': {e}")
+        if errors:
+            raise TemplateError("; ".join(errors))
+        return rendered
+
+    def render(self, values: Dict[str, Any], device: Optional[Device] = None) -> str:
+        if self.is_static:
+            if values:
+                self.validate(values, device)  # Reports the unknown parameters
+            return "".join(self._parts)
+        converted = self.validate(values, device)
+        parts = list(self._parts)
+        for index, name in self._slots:
+            if name not in converted:
+                raise TemplateError(f"parameter '{name}' needs a device to render")
+            parts[index] = converted[name]
+        return "".join(parts)
+
+
+def compile_template(content: str) -> CompiledTemplate:
+    params: Dict[str, ParamSpec] = {}
+    errors = []
+    for line in content.splitlines():
+        match = _PARAM_LINE.match(line)
+        if not match:
+            continue
+        name, type_name, default, description = match.groups()
+        if type_name not in PARAM_TYPES:
+            errors.append(f"parameter '{name}' has unknown type '{type_name}'")
+        default = default.strip()[len("default="):] if default else None
+        params[name] = ParamSpec(name, type_name, default, (description or "").strip())
+
+    parts: List[str] = []
+    slots: List[Tuple[int, str]] = []
+    position = 0
+    for match in _PLACEHOLDER.finditer(content):
+        name = match.group(1)
+        if name not in params:
+            if name in DEVICE_PARAMS:
+                params[name] = ParamSpec(name, DEVICE_PARAMS[name][0], None, "Filled from the device")
+            else:
+                errors.append(f"placeholder '{{{{{name}}}}}' has no @param declaration")
+        parts.append(content[position:match.start()])
+        slots.append((len(parts), name))
+        parts.append("")
+        position = match.end()
+    parts.append(content[position:])
+
+    if errors:
+        raise TemplateError("; ".join(errors))
+    return CompiledTemplate(params, parts, slots)
+
+
+_compiled: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+_compiled_lock = threading.Lock()
+_COMPILED_MAX = 256
+
+
+def get_template(entry: ScriptEntry) -> CompiledTemplate:
+    """Compiled template for a catalog entry, cached by content hash."""
+    with _compiled_lock:
+        template = _compiled.get(entry.sha256)
+        if template is not None:
+            _compiled.move_to_end(entry.sha256)
+            return template
+    template = compile_template(entry.content)
+    with _compiled_lock:
+        _compiled[entry.sha256] = template
+        while len(_compiled) > _COMPILED_MAX:
+            _compiled.popitem(last=False)
+    return template
+
+
+def render_script(entry: ScriptEntry, params: Optional[Dict[str, Any]] = None, device: Optional[Device] = None) -> ScriptEntry:
+    """
+    Render a catalog script for one device.
+
+    Returns an entry with the rendered content (and its own hash), so each
+    distinct variant is installed under its own name. Raises TemplateError.
+    """
+    template = get_template(entry)
+    if template.is_static and not params:
+        return entry
+    content = template.render(params or {}, device)
+    return ScriptEntry(entry.name, content, len(content.encode()), entry.mtime)
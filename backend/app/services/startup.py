@@ -0,0 +1,185 @@
+"""
+Deferred application startup.
+
+Nothing touches the database while the app is imported or before the
+server binds. The startup hook only starts a background thread, which
+works through the stages below in order and records each one's outcome
+for /health. A failed stage is logged and does not stop the later
+stages, except that everything after a failed "database" stage is
+skipped. The app is ready once the required stages have succeeded; until
+then the stages that have not succeeded are retried with exponential
+backoff (STARTUP_RETRY_SECONDS doubling up to STARTUP_RETRY_MAX_SECONDS),
+so a database that comes up late or a transient failure does not leave
+the process unready for good.
+
+Database sessions wait for readiness (see wait_ready), so a request that
+arrives early blocks briefly instead of hitting a missing schema. If the
+startup hook did not run, as with a bare TestClient, the first such
+request starts the stages.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+from app import config, models  # noqa: F401 - registers every table on Base
+from app.database import Base, SessionLocal, engine, wait_for_db
+from app.services.change_feed import change_feed
+from app.services.inventory import start_inventory_collector
+from app.services.log_partitions import ensure_partitions, start_log_maintenance
+from app.services.log_rollups import backfill_rollups_if_empty
+from app.services.prometheus_sync import sync_prometheus_targets
+from app.services.replica import replica_guard
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _create_schema():
+    # In production, use Alembic
+    Base.metadata.create_all(bind=engine)
+
+
+def _ensure_log_partitions():
+    # Log writes fail without a partition for the current month
+    ensure_partitions()
+    start_log_maintenance()
+
+
+def _sync_prometheus_targets():
+    db = SessionLocal()
+    try:
+        result = sync_prometheus_targets(db)
+    finally:
+        db.close()
+    if not result["success"]:
+        raise RuntimeError(result.get("error") or result.get("message"))
+    logger.info(f"Startup: Synced {result['targets_count']} Prometheus targets")
+
+
+def _backfill_log_rollups():
+    db = SessionLocal()
+    try:
+        if backfill_rollups_if_empty(db):
+            logger.info("Startup: Backfilled log rollups")
+    finally:
+        db.close()
+
+
+# (name, function, required for readiness)
+STARTUP_STAGES: List[Tuple[str, Callable[[], None], bool]] = [
+    ("database", wait_for_db, True),
+    ("schema", _create_schema, True),
+    ("log_partitions", _ensure_log_partitions, True),
+    ("change_feed", change_feed.start, False),
+    ("prometheus_targets", _sync_prometheus_targets, False),
+    ("log_rollups", _backfill_log_rollups, False),
+    ("inventory_collector", start_inventory_collector, False),
+    ("replica_lag_guard", replica_guard.start, False),
+]
+
+
+class StartupState:
+    def __init__(self, stages, retry_seconds: float = config.STARTUP_RETRY_SECONDS,
+                 max_retry_seconds: float = config.STARTUP_RETRY_MAX_SECONDS):
+        self.stages = stages
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.started_at = datetime.utcnow()
+        self.finished_at = None
+        self.passes = 0
+        self.next_retry_at = None
+        self._status: Dict[str, Dict] = OrderedDict((name, {"status": "pending", "attempts": 0}) for name, _, _ in stages)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._settled = threading.Event()  # Ready, or the first pass is over
+
+    def _set(self, name: str, **values):
+        with self._lock:
+            values["attempts"] = self._status[name]["attempts"] + (values["status"] == "running")
+            self._status[name] = values
+        if self.ready:
+            self._settled.set()
+
+    def _run_pass(self):
+        """Run every stage that has not succeeded yet, in order."""
+        self.passes += 1
+        database_failed = False
+        for name, stage, _ in self.stages:
+            if self._status[name]["status"] == "ok":
+                continue
+            if database_failed:
+                self._set(name, status="skipped")
+                continue
+            self._set(name, status="running")
+            started = time.monotonic()
+            try:
+                stage()
+                self._set(name, status="ok", duration=round(time.monotonic() - started, 3))
+            except Exception as e:
+                logger.error(f"Startup stage {name} failed: {e}")
+                self._set(name, status="failed", error=str(e) or type(e).__name__, duration=round(time.monotonic() - started, 3))
+                database_failed = name == "database"
+
+    def run(self):
+        self._run_pass()
+        delay = self.retry_seconds
+        while not self.ready:
+            logger.warning(f"Startup not ready, retrying the failed stages in {delay:.0f}s")
+            self.next_retry_at = datetime.utcnow() + timedelta(seconds=delay)
+            self._settled.set()
+            time.sleep(delay)
+            self.next_retry_at = None
+            self._run_pass()
+            delay = min(delay * 2, self.max_retry_seconds)
+        self.finished_at = datetime.utcnow()
+        logger.info(f"Startup finished after {self.passes} pass(es)")
+
+    def start(self):
+        """Run the stages in a background thread (once)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, name="startup", daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout: float) -> bool:
+        """
+        Start the stages if needed and wait up to `timeout` seconds for
+        readiness. Once the first pass failed, returns at once until a retry
+        succeeds, so requests get their 503 without waiting.
+        """
+        if self._settled.is_set():
+            return self.ready
+        self.start()
+        self._settled.wait(timeout)
+        return self.ready
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(self._status[name]["status"] == "ok" for name, _, required in self.stages if required)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            stages = {name: dict(values) for name, values in self._status.items()}
+        ready = self.ready
+        if ready:
+            status = "ready"
+        elif self.passes > 1 or self.next_retry_at is not None:
+            status = "retrying"
+        else:
+            status = "starting"
+        return {
+            "status": status,
+            "ready": ready,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "passes": self.passes,
+            "next_retry_at": self.next_retry_at,
+            "stages": stages,
+        }
+
+
+startup = StartupState(STARTUP_STAGES)
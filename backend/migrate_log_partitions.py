@@ -0,0 +1,33 @@
+"""
+Log Partition Migration Script
+
+Converts a configuration_logs table created before log partitioning into
+the monthly-partitioned layout, so that log retention and archival work.
+Run it once per database, in a quiet period: log writes wait until the
+copy has finished. Tables that are already partitioned are left alone.
+
+Usage:
+    python migrate_log_partitions.py
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.log_partitions import migrate_to_partitioned
+
+
+def main():
+    result = migrate_to_partitioned()
+    if not result["migrated"]:
+        print("configuration_logs is already partitioned, nothing to do.")
+        return
+    print(f"Copied {result['rows']} log rows into {len(result['partitions'])} monthly partitions:")
+    for name in result["partitions"]:
+        print(f"  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import pytest
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.pool import StaticPool
+from app.database import SessionLocal
+from app.models import ConfigurationLog, ConfigurationLogRollup, Device, User
+
+
+@pytest.fixture
+def sqlite_db():
+    """A SessionLocal session on a private in-memory SQLite database holding the log, device and user tables."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    metadata = MetaData()
+    for model in (Device, User, ConfigurationLog, ConfigurationLogRollup):
+        model.__table__.to_metadata(metadata)
+    # SQLite cannot autoincrement part of a composite key; tests set log_id themselves
+    metadata.tables["configuration_logs"].c.log_id.autoincrement = False
+    metadata.create_all(engine)
+    # Through SessionLocal so its flush listeners (e.g. log rollups) apply
+    db = SessionLocal(bind=engine)
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from app import auth
+from app.database import SessionLocal
+from app.models import User
+
+
+@pytest.fixture
+def users(sqlite_db, monkeypatch):
+    """Point the token lookups at the test database and count them."""
+    lookups = []
+    engine = sqlite_db.get_bind()
+
+    def session():
+        lookups.append(1)
+        return SessionLocal(bind=engine)
+
+    monkeypatch.setattr(auth.database, "SessionLocal", session)
+    auth._user_cache.clear()
+    return lookups
+
+
+def current_user(token):
+    return asyncio.run(auth.get_current_user(token))
+
+
+def add_user(db, username, role="admin"):
+    user = User(username=username, password_hash="x", role=role)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_repeat_requests_are_answered_from_the_cache(sqlite_db, users):
+    add_user(sqlite_db, "cached")
+    token = auth.create_access_token({"sub": "cached"})
+
+    first = current_user(token)
+    assert current_user(token) is first
+    assert len(users) == 1
+
+
+def test_flushing_a_user_change_invalidates_their_token(sqlite_db, users):
+    user = add_user(sqlite_db, "demoted")
+    token = auth.create_access_token({"sub": "demoted"})
+    assert current_user(token).role == "admin"
+
+    user.role = "viewer"
+    sqlite_db.flush()  # The listener runs on flush, before commit
+    sqlite_db.commit()
+
+    assert current_user(token).role == "viewer"
+    assert len(users) == 2
+
+
+def test_full_invalidation_during_a_lookup_is_not_undone(sqlite_db, users, monkeypatch):
+    add_user(sqlite_db, "raced")
+    token = auth.create_access_token({"sub": "raced"})
+    engine = sqlite_db.get_bind()
+
+    def session_then_resync():
+        users.append(1)
+        # A resync lands after the lookup read the epoch, before it caches the user
+        auth.invalidate_user()
+        return SessionLocal(bind=engine)
+
+    monkeypatch.setattr(auth.database, "SessionLocal", session_then_resync)
+    current_user(token)
+    current_user(token)
+    assert len(users) == 2  # The entry stored by the first lookup was stale
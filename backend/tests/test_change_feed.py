@@ -0,0 +1,128 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from app import config
+from app.models import ConfigurationLog, Device, User
+from app.services import change_feed as feed
+from app.services.change_feed import ChangeFeed
+
+
+class PostgresLike:
+    """Wraps a session so the flush listener takes it for PostgreSQL and records its payloads."""
+
+    def __init__(self, session):
+        self.session = session
+        self.dialect = SimpleNamespace(name="postgresql")
+        self.published = []
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def connection(self):
+        return self
+
+    def execute(self, statement, params):
+        self.published.append(json.loads(params["payload"]))
+
+
+def published(session, monkeypatch):
+    """What the flush listener would NOTIFY for the session's pending changes, by table."""
+    monkeypatch.setattr(config, "CHANGE_NOTIFY_ENABLED", True)
+    postgres = PostgresLike(session)
+    feed._notify_flushed_changes(postgres, None)
+    return {change["table"]: change for change in postgres.published}
+
+
+def test_a_username_rename_publishes_old_and_new_keys(sqlite_db, monkeypatch):
+    user = User(username="alice", password_hash="x")
+    sqlite_db.add(user)
+    sqlite_db.commit()
+
+    user.username = "alicia"
+    change = published(sqlite_db, monkeypatch)["users"]
+    assert change["keys"] == ["alice", "alicia"]
+    assert change["deleted"] == []
+    assert change["origin"] == feed.ORIGIN
+
+
+def test_unchanged_dirty_objects_are_skipped(sqlite_db, monkeypatch):
+    device = Device(name="r1", ip_address="192.0.2.1")
+    sqlite_db.add(device)
+    sqlite_db.commit()
+
+    device.name = device.name  # Marks it dirty without changing anything
+    assert device in sqlite_db.dirty
+    assert published(sqlite_db, monkeypatch) == {}
+
+    device.name = "r2"
+    assert published(sqlite_db, monkeypatch)["devices"]["keys"] == [device.id]
+
+
+def test_deleted_rows_are_listed_as_deleted(sqlite_db, monkeypatch):
+    kept, removed = Device(name="kept"), Device(name="removed")
+    sqlite_db.add_all([kept, removed])
+    sqlite_db.commit()
+
+    kept.name = "renamed"
+    sqlite_db.delete(removed)
+    change = published(sqlite_db, monkeypatch)["devices"]
+    assert change["keys"] == sorted([kept.id, removed.id])
+    assert change["deleted"] == [removed.id]
+
+
+def test_configuration_logs_publish_no_keys(sqlite_db, monkeypatch):
+    sqlite_db.add(ConfigurationLog(log_id=1, timestamp=datetime(2026, 1, 1), action_type="deploy", status="Success"))
+    change = published(sqlite_db, monkeypatch)["configuration_logs"]
+    assert change["keys"] is None
+    assert change["deleted"] == []
+
+
+def test_nothing_is_published_when_disabled(sqlite_db, monkeypatch):
+    sqlite_db.add(Device(name="r1"))
+    monkeypatch.setattr(config, "CHANGE_NOTIFY_ENABLED", False)
+    postgres = PostgresLike(sqlite_db)
+    feed._notify_flushed_changes(postgres, None)
+    assert postgres.published == []
+
+
+def test_oversized_key_lists_fall_back_to_any_row():
+    small = json.loads(feed._payload("devices", {1, 2}, {2}))
+    assert small["keys"] == [1, 2]
+    assert small["deleted"] == [2]
+
+    keys = set(range(10000))
+    assert len(json.dumps(sorted(keys))) > feed._MAX_PAYLOAD
+    payload = feed._payload("devices", keys, {1})
+    assert len(payload.encode()) <= feed._MAX_PAYLOAD
+    assert json.loads(payload)["keys"] is None
+    assert json.loads(payload)["deleted"] == []
+
+
+def test_a_failing_handler_does_not_stop_the_others():
+    changes = ChangeFeed()
+    seen = []
+
+    def broken(change):
+        raise RuntimeError("handler bug")
+
+    changes.on_change("devices", broken)
+    changes.on_change("devices", seen.append)
+    change = {"table": "devices", "keys": [1], "deleted": [], "local": False}
+    changes.dispatch(change)
+
+    assert seen == [change]
+    assert changes.version("devices") == 1
+    assert changes.version("users") == 0
+
+
+def test_resync_reports_every_keyed_table_as_changed():
+    changes = ChangeFeed()
+    seen = []
+    for table in feed.KEYED_TABLES:
+        changes.on_change(table, seen.append)
+    changes._resync()
+
+    assert sorted(change["table"] for change in seen) == sorted(feed.KEYED_TABLES)
+    assert all(change["keys"] is None for change in seen)
+    assert changes.resyncs == 1
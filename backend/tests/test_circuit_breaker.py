@@ -0,0 +1,109 @@
+import pytest
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock=None, **options):
+    settings = {"window": 10, "min_calls": 3, "failure_rate": 0.5, "open_seconds": 30}
+    settings.update(options)
+    return CircuitBreaker(1, clock=clock or Clock(), **settings)
+
+
+def call(breaker, ok):
+    breaker.before_call()
+    if ok:
+        breaker.record_success()
+    else:
+        breaker.record_failure("timed out")
+
+
+def test_opens_only_after_min_calls_at_the_failure_rate():
+    breaker = make_breaker()
+    call(breaker, False)
+    call(breaker, False)
+    assert breaker.state == CLOSED  # 100% failures, but below min_calls
+
+    breaker = make_breaker()
+    for _ in range(5):
+        call(breaker, True)
+    for _ in range(4):
+        call(breaker, False)
+    assert breaker.state == CLOSED  # 4 of 9 failed
+    call(breaker, False)
+    assert breaker.state == OPEN  # 5 of 10
+    with pytest.raises(CircuitOpen) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.last_error == "timed out"
+    assert exc_info.value.retry_after == 30
+
+
+def test_old_outcomes_leave_the_window():
+    breaker = make_breaker(window=4, min_calls=2)
+    call(breaker, False)
+    for _ in range(4):
+        call(breaker, True)
+    call(breaker, False)
+    assert breaker.state == CLOSED  # The first failure has left the window: 1 of 4
+
+
+def test_half_open_after_open_seconds_with_one_trial_at_a_time():
+    clock = Clock()
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        call(breaker, False)
+    assert breaker.state == OPEN
+
+    clock.now += 29
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    assert breaker.status()["retry_after_seconds"] == 1.0
+
+    clock.now += 1
+    breaker.before_call()  # The trial
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()  # Others are refused while it runs
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.status()["recent_failures"] == 0
+    breaker.before_call()
+
+
+def test_failed_trial_opens_again():
+    clock = Clock()
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        call(breaker, False)
+    clock.now += 30
+    call(breaker, False)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    clock.now += 30
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_release_does_not_count():
+    clock = Clock()
+    breaker = make_breaker(clock)
+    breaker.before_call()
+    breaker.release()  # E.g. rejected credentials
+    assert breaker.status()["recent_calls"] == 0
+
+    for _ in range(3):
+        call(breaker, False)
+    clock.now += 30
+    breaker.before_call()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()  # The released trial lets the next one through
+    assert breaker.state == HALF_OPEN
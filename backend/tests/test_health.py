@@ -0,0 +1,25 @@
+from app.services import health
+
+
+def fake_checks(monkeypatch, **results):
+    for name in ("database", "targets_dir", "pollers", "replica", "log_partitions"):
+        ok = results.get(name, True)
+        monkeypatch.setattr(health, f"_check_{name}", lambda ok=ok: {"ok": ok})
+    monkeypatch.setattr(health.startup, "summary", lambda: {"ready": True, "status": "ready"})
+
+
+def test_stale_pollers_degrade_without_affecting_readiness(monkeypatch):
+    fake_checks(monkeypatch, pollers=False, log_partitions=False)
+    monitor = health.HealthMonitor(interval_seconds=10)
+    monitor.refresh()
+    assert monitor._status["ready"]
+    assert monitor._status["degraded"] == ["log_partitions", "pollers"]
+
+
+def test_database_and_targets_dir_decide_readiness(monkeypatch):
+    for failing in ("database", "targets_dir"):
+        fake_checks(monkeypatch, **{failing: False})
+        monitor = health.HealthMonitor(interval_seconds=10)
+        monitor.refresh()
+        assert not monitor._status["ready"]
+        assert monitor._status["degraded"] == []
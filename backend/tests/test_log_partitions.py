@@ -0,0 +1,38 @@
+from datetime import datetime
+from app.services.log_partitions import (
+    ARCHIVE_NAME_RE, add_months, archive_path, default_archive_path, expired_months, partition_name, retention_cutoff,
+)
+
+
+def test_partition_name():
+    assert partition_name(datetime(2024, 3, 1)) == "configuration_logs_p2024_03"
+    assert partition_name(datetime(987, 12, 1)) == "configuration_logs_p0987_12"
+
+
+def test_add_months_crosses_years():
+    assert add_months(datetime(2024, 11, 1), 1) == datetime(2024, 12, 1)
+    assert add_months(datetime(2024, 12, 1), 1) == datetime(2025, 1, 1)
+    assert add_months(datetime(2024, 1, 1), -1) == datetime(2023, 12, 1)
+    assert add_months(datetime(2024, 3, 1), -27) == datetime(2021, 12, 1)
+    assert add_months(datetime(2024, 3, 1), 0) == datetime(2024, 3, 1)
+
+
+def test_retention_cutoff_is_start_of_month():
+    assert retention_cutoff(12, datetime(2024, 3, 17, 8, 30)) == datetime(2023, 3, 1)
+    assert retention_cutoff(1, datetime(2024, 1, 1)) == datetime(2023, 12, 1)
+    assert retention_cutoff(3, datetime(2024, 2, 29, 23, 59)) == datetime(2023, 11, 1)
+
+
+def test_only_months_ending_by_the_cutoff_expire():
+    months = [datetime(2023, m, 1) for m in range(1, 13)] + [datetime(2024, 1, 1)]
+    cutoff = retention_cutoff(12, datetime(2024, 3, 17))  # 2023-03-01
+    assert expired_months(months, cutoff) == [datetime(2023, 1, 1), datetime(2023, 2, 1)]
+    assert expired_months(months, datetime(2023, 1, 15)) == []
+
+
+def test_archive_names_parse_back_to_their_month():
+    month = datetime(2023, 7, 1)
+    for path in (archive_path(month), default_archive_path(month, 1700000000)):
+        match = ARCHIVE_NAME_RE.match(path.name)
+        assert match and (int(match.group(1)), int(match.group(2))) == (2023, 7)
+    assert not ARCHIVE_NAME_RE.match("configuration_logs_p2023_07.ndjson.tmp")
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from app.models import ConfigurationLog
+from app.services.log_queries import decode_cursor, encode_cursor, paginate_logs
+
+
+def test_cursor_round_trip():
+    ts = datetime(2024, 3, 5, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(ts, 42)) == (ts, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "42", "not-a-date,1", "2024-03-05T12:00:00,abc", "2024-03-05T12:00:00"])
+def test_malformed_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor)
+    assert exc_info.value.status_code == 400
+
+
+def test_keyset_pages_break_timestamp_ties_on_log_id(sqlite_db):
+    same = datetime(2024, 3, 5, 12, 0, 0)
+    earlier = same - timedelta(minutes=1)
+    for log_id, ts in [(1, earlier), (2, same), (3, same), (4, same), (5, same), (6, earlier)]:
+        sqlite_db.add(ConfigurationLog(log_id=log_id, timestamp=ts, action_type="Test", status="Success"))
+    sqlite_db.commit()
+
+    seen = []
+    before = None
+    while True:
+        page = paginate_logs(sqlite_db.query(ConfigurationLog), before, 2).all()
+        seen.extend((log.timestamp, log.log_id) for log in page)
+        if len(page) < 2:
+            break
+        before = encode_cursor(page[-1].timestamp, page[-1].log_id)
+
+    assert [log_id for _, log_id in seen] == [5, 4, 3, 2, 6, 1]
+    assert seen == sorted(seen, reverse=True)
@@ -0,0 +1,78 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app.models import ConfigurationLog, ConfigurationLogRollup, Device
+from app.services.log_rollups import _apply_rollup_deltas_portably, count_logs, rebuild_rollups
+
+START = datetime(2024, 3, 5, 0, 0, 0)
+STATUSES = ["Success", "Failed", "Warning", None]
+
+
+def raw_counts(db, since, until, device_id=None):
+    query = db.query(
+        ConfigurationLog.device_id, ConfigurationLog.action_type, ConfigurationLog.status, func.count()
+    ).filter(ConfigurationLog.timestamp >= since, ConfigurationLog.timestamp < until)
+    if device_id is not None:
+        query = query.filter(ConfigurationLog.device_id == device_id)
+    query = query.group_by(ConfigurationLog.device_id, ConfigurationLog.action_type, ConfigurationLog.status)
+    return Counter({(d, a, s): n for d, a, s, n in query})
+
+
+def assert_counts_match(db, rng):
+    windows = [(START, START + timedelta(days=2)), (START + timedelta(minutes=17), START + timedelta(hours=30, minutes=5))]
+    for _ in range(20):
+        since = START + timedelta(minutes=rng.randrange(0, 48 * 60))
+        windows.append((since, since + timedelta(minutes=rng.randrange(1, 30 * 60))))
+    for since, until in windows:
+        for device_id in (None, 1):
+            assert +count_logs(db, since, until, device_id) == raw_counts(db, since, until, device_id), (since, until)
+
+
+def test_count_logs_matches_raw_counts(sqlite_db):
+    rng = random.Random(7)
+    sqlite_db.add_all([Device(id=1, name="r1"), Device(id=2, name="r2")])
+    logs = [
+        ConfigurationLog(
+            log_id=log_id,
+            timestamp=START + timedelta(seconds=rng.randrange(0, 48 * 3600)),
+            device_id=rng.choice([1, 2, None]),
+            action_type=rng.choice(["Deploy", "Device Created"]),
+            status=rng.choice(STATUSES),
+        )
+        for log_id in range(1, 301)
+    ]
+    sqlite_db.add_all(logs)
+    sqlite_db.commit()
+    assert_counts_match(sqlite_db, rng)
+
+    for log in rng.sample(logs, 60):
+        log.status = rng.choice(STATUSES)
+    for log in rng.sample(logs, 20):
+        log.timestamp = log.timestamp + timedelta(hours=rng.randrange(-5, 5))
+    sqlite_db.commit()
+    assert_counts_match(sqlite_db, rng)
+
+    for log in rng.sample(logs, 50):
+        sqlite_db.delete(log)
+    sqlite_db.commit()
+    assert_counts_match(sqlite_db, rng)
+
+    rebuild_rollups(sqlite_db)
+    assert_counts_match(sqlite_db, rng)
+
+
+def test_portable_deltas_update_existing_buckets(sqlite_db):
+    hour = datetime(2024, 3, 5, 12)
+    conn = sqlite_db.connection()
+    rows = [
+        {"hour": hour, "device_id": None, "action_type": "Deploy", "status": "Success", "count": 2},
+        {"hour": hour, "device_id": 1, "action_type": "Deploy", "status": None, "count": 1},
+    ]
+    _apply_rollup_deltas_portably(conn, rows)
+    _apply_rollup_deltas_portably(conn, [{**rows[0], "count": -1}, {**rows[1], "count": 3}])
+
+    buckets = sqlite_db.query(
+        ConfigurationLogRollup.device_id, ConfigurationLogRollup.status, ConfigurationLogRollup.count
+    ).order_by(ConfigurationLogRollup.device_id).all()
+    assert sorted(buckets, key=str) == sorted([(None, "Success", 1), (1, None, 4)], key=str)
@@ -0,0 +1,91 @@
+import ipaddress
+import random
+from app.models import InventoryItem
+from app.services.prefix_index import FleetPrefixIndex, PrefixTrie
+
+DEVICES = range(1, 6)
+
+
+def random_network(rng):
+    # A narrow address range, so that prefixes nest and overlap often
+    value = (10 << 24) | rng.getrandbits(12) << 4
+    return ipaddress.ip_network((value, rng.randint(8, 32)), strict=False)
+
+
+def build_index(rng, count):
+    networks = {}
+    index = FleetPrefixIndex()
+    for device_id in DEVICES:
+        rows = []
+        for i in range(count):
+            network = random_network(rng)
+            kind = rng.choice(["ips", "routes"])
+            field = "address" if kind == "ips" else "dst_address"
+            raw = f"{network.network_address}/{network.prefixlen}"
+            rows.append((InventoryItem(device_id=device_id, kind=kind, key=str(i), attributes={field: raw}), f"r{device_id}"))
+            networks[(device_id, kind, str(i))] = network
+        index._add_items(device_id, rows)
+    index._loaded = True  # No database: everything was added above
+    return index, networks
+
+
+def keys(entries):
+    return sorted((entry["device_id"], entry["prefix"]) for entry in entries)
+
+
+def expected(networks, predicate):
+    return sorted((key[0], str(network)) for key, network in networks.items() if predicate(network))
+
+
+def check_against_brute_force(rng, index, networks):
+    for _ in range(50):
+        address = ipaddress.ip_address((10 << 24) | rng.getrandbits(16))
+        result = index.lookup(str(address))
+        assert keys(result["matches"]) == expected(networks, lambda n: address in n)
+        covering = [n for n in networks.values() if address in n]
+        longest = max((n.prefixlen for n in covering), default=None)
+        assert keys(result["longest"]) == expected(networks, lambda n: address in n and n.prefixlen == longest)
+        assert [ipaddress.ip_network(e["prefix"]).prefixlen for e in result["matches"]] == \
+            sorted((n.prefixlen for n in covering), reverse=True)
+
+        query = random_network(rng)
+        assert keys(index.overlaps(str(query))) == expected(networks, query.overlaps)
+        trie = index._tries[4]
+        value, length = int(query.network_address), query.prefixlen
+        inside = [entry for node in trie.within(value, length) for entry in node.entries.values()]
+        assert keys(inside) == expected(networks, lambda n: n.subnet_of(query))
+
+
+def assert_compressed(trie: PrefixTrie):
+    stack = [trie.root]
+    while stack:
+        node = stack.pop()
+        children = [c for c in node.children if c is not None]
+        if node is not trie.root:
+            assert node.entries or len(children) == 2, "empty pass-through node left behind"
+        for child in children:
+            assert child.length > node.length
+            assert trie._mask(child.value, node.length) == node.value
+        stack.extend(children)
+
+
+def test_trie_matches_brute_force():
+    for seed in range(30):
+        rng = random.Random(seed)
+        index, networks = build_index(rng, count=20)
+        check_against_brute_force(rng, index, networks)
+        assert_compressed(index._tries[4])
+
+
+def test_retain_devices_removes_prefixes():
+    for seed in range(30):
+        rng = random.Random(seed)
+        index, networks = build_index(rng, count=20)
+        kept = set(rng.sample(list(DEVICES), 2))
+        index.retain_devices(kept)
+        networks = {key: network for key, network in networks.items() if key[0] in kept}
+        check_against_brute_force(rng, index, networks)
+        assert_compressed(index._tries[4])
+
+        index.retain_devices([])
+        assert index._tries[4].root.children == [None, None] and not index._tries[4].root.entries
@@ -0,0 +1,64 @@
+from app.services.rate_limit import TokenBucketLimiter, acquire_all
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_then_refill():
+    clock = Clock()
+    limiter = TokenBucketLimiter(rate=0.5, burst=3, clock=clock)
+    assert [limiter.acquire(["a"]) for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire(["a"]) == 2.0  # One token takes 2s at 0.5/s
+    assert limiter.acquire(["b"]) == 0  # Buckets are per key
+
+    clock.now += 1
+    assert limiter.acquire(["a"]) == 1.0
+    clock.now += 1
+    assert limiter.acquire(["a"]) == 0
+    clock.now += 100  # Refills up to the burst only
+    assert [limiter.acquire(["a"]) for _ in range(4)] == [0, 0, 0, 2.0]
+
+
+def test_all_or_none_across_keys():
+    clock = Clock()
+    limiter = TokenBucketLimiter(rate=1, burst=2, clock=clock)
+    limiter.acquire(["full"])
+    limiter.acquire(["full"])
+    assert limiter.acquire(["spare", "full"]) == 1.0
+    # The rejected call took nothing from "spare"
+    assert limiter.acquire(["spare"]) == 0
+    assert limiter.acquire(["spare"]) == 0
+    assert limiter.acquire(["spare"]) > 0
+
+
+def test_all_or_none_across_limiters():
+    clock = Clock()
+    per_ip = TokenBucketLimiter(rate=1, burst=5, clock=clock)
+    per_user = TokenBucketLimiter(rate=0.1, burst=1, clock=clock)
+    assert acquire_all([(per_ip, "10.0.0.1"), (per_user, "admin")]) == 0
+    assert acquire_all([(per_ip, "10.0.0.1"), (per_user, "admin")]) == 10.0
+    # The rejection spent no IP token: four are left of the burst of five
+    assert [per_ip.acquire(["10.0.0.1"]) for _ in range(5)] == [0, 0, 0, 0, 1.0]
+
+
+def test_least_recently_used_buckets_are_evicted():
+    clock = Clock()
+    limiter = TokenBucketLimiter(rate=0.001, burst=1, maxsize=2, clock=clock)
+    limiter.acquire(["a"])
+    limiter.acquire(["b"])
+    assert limiter.acquire(["a"]) > 0  # Touches nothing: a was refused
+    limiter.acquire(["c"])  # Evicts a, the least recently updated
+    assert list(limiter._buckets) == ["b", "c"]
+    assert limiter.acquire(["a"]) == 0  # Starts full again
+
+
+def test_reset_refills_a_bucket():
+    limiter = TokenBucketLimiter(rate=0.001, burst=1, clock=Clock())
+    limiter.acquire(["a"])
+    limiter.reset("a")
+    assert limiter.acquire(["a"]) == 0
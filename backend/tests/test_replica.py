@@ -0,0 +1,25 @@
+from collections import namedtuple
+import pytest
+from app.services.replica import ReplicaNotStreaming, replica_lag
+
+Row = namedtuple("Row", "in_recovery receiver_pid receiver_status caught_up replay_age")
+
+
+def test_primary_reports_no_lag():
+    assert replica_lag(Row(False, None, None, None, None)) == 0
+
+
+def test_streaming_replica_lag():
+    assert replica_lag(Row(True, 42, "streaming", True, 3600.0)) == 0  # Idle primary
+    assert replica_lag(Row(True, 42, "streaming", False, 2.5)) == 2.5
+    assert replica_lag(Row(True, 42, None, False, 2.5)) == 2.5  # Status hidden from unprivileged roles
+
+
+@pytest.mark.parametrize("row", [
+    Row(True, None, None, True, 3600.0),  # Receiver gone: replay has caught up with a stale stream
+    Row(True, 42, "waiting", True, 10.0),
+    Row(True, 42, "restarting", False, 1.0),
+])
+def test_replica_without_streaming_receiver_is_unusable(row):
+    with pytest.raises(ReplicaNotStreaming):
+        replica_lag(row)
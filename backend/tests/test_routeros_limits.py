@@ -0,0 +1,203 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from app.routers.routeros import connection as routeros_connection
+from app.services import routeros_limits
+from app.services.routeros_limits import COALESCED_READS, DeviceSessionLimiter, coalesced
+
+
+class FakeConnection:
+    def __init__(self):
+        self.disconnects = 0
+
+    def disconnect(self):
+        self.disconnects += 1
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def coalesced_count(device_id):
+    return COALESCED_READS.labels(str(device_id))._value.get()
+
+
+def run_concurrently(device_id, read, callers):
+    """Call coalesced from `callers` threads while the first read is held open."""
+    release = threading.Event()
+    started = coalesced_count(device_id)
+    outcomes = [None] * callers
+
+    def held_read():
+        release.wait(5)
+        return read()
+
+    def call(i):
+        try:
+            outcomes[i] = ("ok", coalesced(device_id, "key", held_read))
+        except Exception as e:
+            outcomes[i] = ("error", e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    # Everyone but the leader has joined the in-flight read
+    wait_until(lambda: coalesced_count(device_id) - started == callers - 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_reads_run_once_and_share_the_result():
+    calls = []
+
+    def read():
+        calls.append(1)
+        return [{"uptime": "1d"}]
+
+    outcomes = run_concurrently(101, read, callers=8)
+    assert len(calls) == 1
+    assert all(outcome == ("ok", [{"uptime": "1d"}]) for outcome in outcomes)
+    assert len({id(result) for _, result in outcomes}) == 1  # The very same object
+    assert routeros_limits._in_flight == {}
+
+
+def test_an_error_reaches_every_waiter():
+    calls = []
+    error = ConnectionError("router went away")
+
+    def read():
+        calls.append(1)
+        raise error
+
+    outcomes = run_concurrently(102, read, callers=5)
+    assert len(calls) == 1
+    assert outcomes == [("error", error)] * 5
+    assert routeros_limits._in_flight == {}
+
+    # Nothing is cached: the next read runs again
+    assert coalesced(102, "key", lambda: "fresh") == "fresh"
+
+
+def test_different_keys_and_devices_are_not_coalesced():
+    assert coalesced(103, "a", lambda: "a") == "a"
+    assert coalesced(103, "b", lambda: "b") == "b"
+    assert coalesced(104, "a", lambda: "other device") == "other device"
+    assert routeros_limits._in_flight == {}
+
+
+def test_read_system_resource_shares_one_session(monkeypatch):
+    sessions = []
+    release = threading.Event()
+
+    class Session:
+        def __init__(self, device, **options):
+            sessions.append(device.id)
+
+        def __enter__(self):
+            release.wait(5)
+            resource = SimpleNamespace(get=lambda: [{"cpu-load": "3"}])
+            return SimpleNamespace(get_resource=lambda path: resource)
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(routeros_connection, "routeros_session", Session)
+    device = SimpleNamespace(id=105)
+    started = coalesced_count(105)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(routeros_connection.read_system_resource(device)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: coalesced_count(105) - started == 3)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert sessions == [105]
+    assert results == [[{"cpu-load": "3"}]] * 4
+
+
+def test_acquire_times_out_at_max_sessions():
+    limiter = DeviceSessionLimiter(max_sessions=2)
+    assert limiter.acquire(1, timeout=0)
+    assert limiter.acquire(1, timeout=0)
+
+    started = time.monotonic()
+    assert not limiter.acquire(1, timeout=0.1)
+    assert time.monotonic() - started >= 0.1
+    assert limiter.acquire(2, timeout=0)  # Slots are per device
+    assert limiter.status()[1] == {"in_use": 2, "waiting": 0, "max_sessions": 2}
+
+    limiter.release(1)
+    assert limiter.acquire(1, timeout=0)
+
+
+def test_a_waiter_gets_the_slot_freed_by_disconnect():
+    limiter = DeviceSessionLimiter(max_sessions=1)
+    assert limiter.acquire(1, timeout=0)
+    connection = FakeConnection()
+    limiter.attach(connection, 1)
+
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(limiter.acquire(1, timeout=5)))
+    waiter.start()
+    wait_until(lambda: limiter.status()[1]["waiting"] == 1)
+    connection.disconnect()
+    waiter.join(5)
+
+    assert acquired == [True]
+    assert connection.disconnects == 1
+
+
+def test_disconnect_releases_the_slot_once():
+    limiter = DeviceSessionLimiter(max_sessions=1)
+    assert limiter.acquire(1, timeout=0)
+    connection = FakeConnection()
+    limiter.attach(connection, 1)
+
+    connection.disconnect()
+    connection.disconnect()
+    assert connection.disconnects == 2
+    assert limiter.status()[1]["in_use"] == 0
+
+
+def test_disconnect_releases_the_slot_even_if_it_fails():
+    class BrokenConnection(FakeConnection):
+        def disconnect(self):
+            raise OSError("socket already closed")
+
+    limiter = DeviceSessionLimiter(max_sessions=1)
+    assert limiter.acquire(1, timeout=0)
+    connection = BrokenConnection()
+    limiter.attach(connection, 1)
+
+    with pytest.raises(OSError):
+        connection.disconnect()
+    assert limiter.status()[1]["in_use"] == 0
+
+
+def test_get_routeros_connection_holds_a_slot_until_disconnect(monkeypatch):
+    limiter = DeviceSessionLimiter(max_sessions=1)
+    monkeypatch.setattr(routeros_connection, "session_limiter", limiter)
+    monkeypatch.setattr(routeros_connection.config, "ROUTEROS_SESSION_WAIT_SECONDS", 0.05)
+    monkeypatch.setattr(routeros_connection, "_connect", lambda *args: (FakeConnection(), object()))
+    device = SimpleNamespace(id=106, name="r1", ip_address="192.0.2.1")
+    routeros_connection.breakers.reset(106)
+
+    connection, _ = routeros_connection.get_routeros_connection(device)
+    with pytest.raises(routeros_connection.RouterOSBusyError):
+        routeros_connection.get_routeros_connection(device)
+
+    connection.disconnect()
+    connection, _ = routeros_connection.get_routeros_connection(device)
+    connection.disconnect()
+    assert limiter.status()[106]["in_use"] == 0
@@ -0,0 +1,17 @@
+from app.services.script_catalog import ScriptEntry, SCRIPT_EXTENSION
+from app.services.script_runner import installed_name, is_version_of
+
+
+def entry(stem: str, content: str = "/log info test") -> ScriptEntry:
+    return ScriptEntry(stem + SCRIPT_EXTENSION, content, len(content), 0.0)
+
+
+def test_versions_of_a_script_do_not_include_longer_stems():
+    backup, backup_full = entry("backup"), entry("backup_full")
+    old_backup = installed_name(entry("backup", "/log info old"))
+
+    assert is_version_of(installed_name(backup), backup)
+    assert is_version_of(old_backup, backup)
+    assert not is_version_of(installed_name(backup_full), backup)
+    assert not is_version_of(old_backup, backup_full)
+    assert not is_version_of(old_backup + "0", backup)
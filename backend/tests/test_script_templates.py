@@ -0,0 +1,126 @@
+import pytest
+from app.models import Device
+from app.services import script_templates
+from app.services.script_catalog import ScriptEntry
+from app.services.script_templates import PARAM_TYPES, TemplateError, compile_template, get_template, render_script
+
+TEMPLATE = """# @param community string default=public - SNMP community name
+# @param addresses cidr_list default=0.0.0.0/0 - Allowed managers
+# @param limit rate - Queue limit
+#@param  port int
+/snmp community set [find default=yes] name="{{community}}" addresses={{addresses}}
+/queue simple add max-limit={{ limit }} comment="{{device_name}}" port={{port}}
+"""
+
+
+def entry(content: str) -> ScriptEntry:
+    return ScriptEntry("snmp.rsc", content, len(content), 0.0)
+
+
+def test_param_lines_are_parsed():
+    params = compile_template(TEMPLATE).params
+    assert params["community"].to_dict() == {
+        "name": "community", "type": "string", "required": False, "default": "public", "description": "SNMP community name",
+    }
+    assert params["addresses"].default == "0.0.0.0/0"
+    assert params["limit"].to_dict()["required"] and params["limit"].description == "Queue limit"
+    assert params["port"].type == "int" and params["port"].default is None
+    assert params["device_name"].type == "string"  # Implicit device parameter
+
+
+def test_render_fills_placeholders():
+    device = Device(name='edge "1"', ip_address="10.0.0.1")
+    content = render_script(entry(TEMPLATE), {"limit": "10M", "port": 8, "addresses": ["10.0.0.0/8", "192.168.1.1"]}, device).content
+    assert 'name="public" addresses=10.0.0.0/8,192.168.1.1\n' in content
+    assert 'max-limit=10M comment="edge \\"1\\"" port=8\n' in content
+
+
+@pytest.mark.parametrize("raw, escaped", [
+    ('say "hi"', 'say \\"hi\\"'),
+    ("$(/system reset-configuration)", "\\$(/system reset-configuration)"),
+    ("back\\slash", "back\\\\slash"),
+    ('\\"', '\\\\\\"'),
+    ("two\nlines\r", "two\\nlines\\r"),
+])
+def test_strings_are_escaped(raw, escaped):
+    assert PARAM_TYPES["string"](raw) == escaped
+
+
+@pytest.mark.parametrize("type_name, value", [
+    ("ip", "10.0.0.1; /system reset-configuration"),
+    ("ip", "fe80::1%a;b\"c"),
+    ("ip", "10.0.0.0/8"),
+    ("ip", "999.0.0.1"),
+    ("cidr", "10.0.0.0/33"),
+    ("cidr", "fe80::1%x;/system/reset-configuration/64"),
+    ("cidr", "10.0.0.0/8 comment=x"),
+    ("cidr_list", "10.0.0.0/8,evil"),
+    ("rate", "10M;"),
+    ("rate", "10 M"),
+    ("rate", "1.5M"),
+    ("int", "1e3"),
+    ("int", True),
+    ("bool", "maybe"),
+    ("name", "ether1 disabled=yes"),
+    ("host", "host name"),
+    ("host", "$host"),
+])
+def test_invalid_values_are_rejected(type_name, value):
+    with pytest.raises(ValueError):
+        PARAM_TYPES[type_name](value)
+
+
+def test_valid_typed_values():
+    assert PARAM_TYPES["ip"]("2001:db8::1") == "2001:db8::1"
+    assert PARAM_TYPES["cidr"]("10.0.0.1/24") == "10.0.0.1/24"
+    assert PARAM_TYPES["cidr"]("10.0.0.1") == "10.0.0.1"
+    assert PARAM_TYPES["rate"]("512k") == "512k"
+    assert PARAM_TYPES["int"]("-3") == "-3"
+    assert PARAM_TYPES["bool"]("TRUE") == "yes"
+
+
+def test_missing_and_unknown_params_are_all_reported():
+    template = compile_template(TEMPLATE)
+    with pytest.raises(TemplateError) as exc_info:
+        template.render({"limit": "fast", "colour": "red"}, Device(name="r1", ip_address="10.0.0.1"))
+    message = str(exc_info.value)
+    assert "unknown parameter 'colour'" in message
+    assert "missing required parameter 'port'" in message
+    assert "parameter 'limit': expected a rate" in message
+
+    with pytest.raises(TemplateError, match="needs a device"):
+        template.render({"limit": "1M", "port": 1})
+
+
+def test_static_scripts_reject_params():
+    static = entry("/system identity print\n")
+    assert render_script(static) is static
+    with pytest.raises(TemplateError, match="unknown parameter 'x'"):
+        render_script(static, {"x": 1})
+
+
+@pytest.mark.parametrize("content, problem", [
+    ("/ip address add address={{addr}}\n", "placeholder '{{addr}}' has no @param declaration"),
+    ("# @param addr ipv4\n/ip address add address={{addr}}\n", "unknown type 'ipv4'"),
+])
+def test_invalid_templates(content, problem):
+    with pytest.raises(TemplateError, match=problem.replace("{", r"\{").replace("}", r"\}")):
+        compile_template(content)
+
+
+def test_compiled_templates_are_cached_by_content(monkeypatch):
+    monkeypatch.setattr(script_templates, "_compiled", type(script_templates._compiled)())
+    monkeypatch.setattr(script_templates, "_COMPILED_MAX", 2)
+    calls = []
+    compile_real = script_templates.compile_template
+    monkeypatch.setattr(script_templates, "compile_template", lambda content: calls.append(content) or compile_real(content))
+
+    first, second, third = entry(TEMPLATE), entry(TEMPLATE + "\n"), entry(TEMPLATE + "\n\n")
+    assert get_template(first) is get_template(entry(TEMPLATE))
+    assert len(calls) == 1
+    get_template(second)
+    get_template(first)  # Now the most recently used
+    get_template(third)  # Evicts second
+    assert list(script_templates._compiled) == [first.sha256, third.sha256]
+    get_template(second)
+    assert len(calls) == 4
@@ -0,0 +1,97 @@
+import threading
+import time
+from app.services.startup import StartupState
+
+
+class Stage:
+    """A startup stage recording its calls, failing its first `failures` runs."""
+
+    def __init__(self, name, calls, failures=0, gate=None):
+        self.name = name
+        self.calls = calls
+        self.failures = failures
+        self.gate = gate
+
+    def __call__(self):
+        self.calls.append(self.name)
+        if self.gate is not None:
+            self.gate.wait()
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError(f"{self.name} failed")
+
+
+def make_state(calls, failures=None, required=("database", "schema"), **options):
+    failures = failures or {}
+    names = ["database", "schema", "extras"]
+    stages = [(name, Stage(name, calls, failures.get(name, 0)), name in required) for name in names]
+    options.setdefault("retry_seconds", 0.01)
+    options.setdefault("max_retry_seconds", 0.02)
+    return StartupState(stages, **options)
+
+
+def test_stages_run_in_order_and_become_ready():
+    calls = []
+    state = make_state(calls)
+    assert not state.ready and state.summary()["status"] == "starting"
+    state.run()
+    assert calls == ["database", "schema", "extras"]
+    assert state.ready
+    summary = state.summary()
+    assert summary["status"] == "ready" and summary["passes"] == 1
+    assert all(stage["status"] == "ok" and stage["attempts"] == 1 for stage in summary["stages"].values())
+
+
+def test_optional_failures_do_not_block_readiness():
+    calls = []
+    state = make_state(calls, failures={"extras": 5})
+    state.run()
+    assert state.ready
+    assert state.summary()["stages"]["extras"]["status"] == "failed"
+    assert calls == ["database", "schema", "extras"]  # Not retried once ready
+
+
+def test_database_failure_skips_later_stages_then_retries():
+    calls = []
+    state = make_state(calls, failures={"database": 2})
+    state.run()
+    assert state.ready
+    # Two passes stop at the database; the third runs everything
+    assert calls == ["database", "database", "database", "schema", "extras"]
+    stages = state.summary()["stages"]
+    assert stages["database"]["attempts"] == 3 and stages["schema"]["attempts"] == 1
+    assert state.summary()["passes"] == 3
+
+
+def test_only_stages_not_yet_ok_are_retried():
+    calls = []
+    state = make_state(calls, failures={"schema": 1, "extras": 1})
+    state.run()
+    assert calls == ["database", "schema", "extras", "schema", "extras"]
+    assert state.ready
+
+
+def test_summary_while_retrying():
+    calls = []
+    state = make_state(calls, failures={"database": 1000}, retry_seconds=60, max_retry_seconds=60)
+    state.start()
+    assert not state.wait_ready(5)  # Returns after the first pass, not after the timeout
+    summary = state.summary()
+    assert summary["status"] == "retrying" and not summary["ready"]
+    assert summary["next_retry_at"] is not None
+    assert summary["stages"]["database"]["status"] == "failed"
+    assert summary["stages"]["schema"]["status"] == "skipped"
+    assert summary["stages"]["schema"]["attempts"] == 0
+
+
+def test_wait_ready_times_out():
+    gate = threading.Event()
+    calls = []
+    state = StartupState([("database", Stage("database", calls, gate=gate), True)], retry_seconds=0.01)
+    started = time.monotonic()
+    assert not state.wait_ready(0.1)  # Starts the stages
+    assert 0.1 <= time.monotonic() - started < 2
+    assert state.summary()["stages"]["database"]["status"] == "running"
+    gate.set()
+    assert state.wait_ready(2)
+    assert calls == ["database"]